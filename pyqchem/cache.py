@@ -0,0 +1,478 @@
+import os
+import copy
+import time
+import pickle
+import uuid
+import re
+import warnings
+import zlib
+import numpy as np
+from contextlib import contextmanager
+
+try:
+    from urllib.parse import quote, unquote
+except ImportError:
+    from urllib import quote, unquote
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+try:
+    import lzma
+except ImportError:
+    lzma = None
+
+
+# headers of compressed entries (pickled data starts with b'\x80')
+_COMPRESSION_HEADERS = {'lzma': b'XZ', 'zlib': b'ZL', 'zstd': b'ZS'}
+
+# minimum number of elements of a list of floats to be stored as binary buffer
+_MIN_ARRAY_SIZE = 16
+
+
+def _compress(data, compression):
+    if compression is None:
+        return data
+    if compression == 'lzma':
+        return _COMPRESSION_HEADERS['lzma'] + lzma.compress(data, preset=1)
+    if compression == 'zlib':
+        return _COMPRESSION_HEADERS['zlib'] + zlib.compress(data, 6)
+    if compression == 'zstd':
+        import zstandard
+        return _COMPRESSION_HEADERS['zstd'] + zstandard.ZstdCompressor(level=3).compress(data)
+
+    raise ValueError('compression {} not available'.format(compression))
+
+
+def _decompress(data):
+    header = data[:2]
+    if header == _COMPRESSION_HEADERS['lzma']:
+        return lzma.decompress(data[2:])
+    if header == _COMPRESSION_HEADERS['zlib']:
+        return zlib.decompress(data[2:])
+    if header == _COMPRESSION_HEADERS['zstd']:
+        import zstandard
+        return zstandard.ZstdDecompressor().decompress(data[2:])
+
+    # uncompressed entry
+    return data
+
+
+def _get_array_shape(value):
+    """
+    get the shape of a (nested) list that only contains floats
+
+    :return: shape tuple or None if the list is not a regular array of floats
+    """
+    if len(value) == 0:
+        return None
+
+    if all([type(element) is float for element in value]):
+        return (len(value),)
+
+    if not all([type(element) is list for element in value]):
+        return None
+
+    shape = _get_array_shape(value[0])
+    if shape is None:
+        return None
+    for element in value[1:]:
+        if len(element) != shape[0] or _get_array_shape(element) != shape:
+            return None
+
+    return (len(value),) + shape
+
+
+class _PackedArray:
+    """
+    list of floats stored as a binary buffer
+    """
+    def __init__(self, value, shape):
+        self.shape = shape
+        self.buffer = np.array(value, dtype='<f8').tobytes()
+
+    def unpack(self):
+        return np.frombuffer(self.buffer, dtype='<f8').reshape(self.shape).tolist()
+
+
+def _pack_arrays(value):
+    """
+    replace the lists of floats in (nested) dictionaries, lists and tuples by binary buffers
+    """
+    if isinstance(value, dict):
+        # copy to keep the type of dictionary (e.g. defaultdict, OrderedDict and other subclasses)
+        value_copy = copy.copy(value)
+        for key, element in value.items():
+            value_copy[key] = _pack_arrays(element)
+        return value_copy
+
+    if type(value) is list:
+        if len(value) > 0 and type(value[0]) in (float, list):
+            shape = _get_array_shape(value)
+            if shape is not None and np.prod(shape) >= _MIN_ARRAY_SIZE:
+                return _PackedArray(value, shape)
+        return [_pack_arrays(element) for element in value]
+
+    if type(value) is tuple:
+        return tuple([_pack_arrays(element) for element in value])
+
+    return value
+
+
+def _unpack_arrays(value):
+    """
+    restore the lists of floats packed with _pack_arrays
+    """
+    if isinstance(value, _PackedArray):
+        return value.unpack()
+
+    if isinstance(value, dict):
+        # copy to keep the type of dictionary (e.g. defaultdict, OrderedDict and other subclasses)
+        value_copy = copy.copy(value)
+        for key, element in value.items():
+            value_copy[key] = _unpack_arrays(element)
+        return value_copy
+
+    if type(value) is list:
+        return [_unpack_arrays(element) for element in value]
+
+    if type(value) is tuple:
+        return tuple([_unpack_arrays(element) for element in value])
+
+    return value
+
+
+def _get_default_compression():
+    return 'lzma' if lzma is not None else 'zlib'
+
+
+def _makedirs(directory):
+    # directory may be created at the same time by other processes
+    try:
+        os.makedirs(directory)
+    except OSError:
+        if not os.path.isdir(directory):
+            raise
+
+
+def _atomic_write(filename, data):
+    """
+    write data to a temporary file in the same directory and rename it, so readers never see
+    a partially written file (rename is atomic in POSIX file systems, including NFS)
+    """
+    temp_filename = os.path.join(os.path.dirname(filename),
+                                 '.{}.{}.tmp'.format(os.path.basename(filename), uuid.uuid4().hex))
+    try:
+        with open(temp_filename, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.rename(temp_filename, filename)
+    except BaseException:
+        if os.path.exists(temp_filename):
+            os.remove(temp_filename)
+        raise
+
+
+def _policy_keyword(keyword, policy):
+    # entries of parsers that only read some fields (parser_name[field1,...]) or that use other data format
+    # (parser_name:parameter) follow the policy of the parser
+    if keyword not in policy:
+        return re.split(r'[\[:]', keyword, 1)[0]
+    return keyword
+
+
+class CalculationData:
+    """
+    On-disk storage of calculation data. Each entry (hash, keyword) is stored in a separate file inside
+    a directory, so reading or writing an entry does not depend on the total size of the stored data.
+    This object can be used as a dictionary.
+
+    Entries are compressed and lists of floats (e.g. molecular orbital coefficients) are stored as
+    binary buffers. Both are transparent: the data is restored to the original form when read.
+
+    The size of the storage can be limited. When the limit is exceeded the least recently used entries
+    are removed until the size is below 90% of the limit. Entries of each keyword can also expire after
+    some time (time to live).
+    """
+    def __init__(self, directory, legacy_filename=None, protocol=pickle.HIGHEST_PROTOCOL,
+                 max_size=None, ttl=None, keep=(), compression='default'):
+        """
+        :param directory: directory where the data is stored
+        :param legacy_filename: pickle file containing a dictionary of calculation data (old format).
+                                If present, the data is imported in the first use of the directory
+                                (and imported again if the file is modified later)
+        :param protocol: pickle protocol
+        :param max_size: maximum size of the stored data in bytes (None: no limit)
+        :param ttl: dictionary {keyword: seconds} with the time to live of the entries of each keyword
+        :param keep: list of keywords whose entries are never removed to fit max_size
+        :param compression: compression of the entries: 'lzma', 'zlib', 'zstd' (requires zstandard module)
+                            or None. By default lzma if available, otherwise zlib
+        """
+        self._directory = directory
+        self._protocol = protocol
+        self._compression = _get_default_compression() if compression == 'default' else compression
+
+        # nothing is read from disk until the data is accessed
+        self._legacy_filename = legacy_filename
+
+        self.set_policy(max_size=max_size, ttl=ttl, keep=keep)
+
+        self._size = None
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def set_policy(self, max_size=None, ttl=None, keep=()):
+        """
+        Set the eviction policy of the storage (see __init__)
+        """
+        self._max_size = max_size
+        self._ttl = dict(ttl) if ttl is not None else {}
+        self._keep = list(keep)
+
+    @property
+    def directory(self):
+        return self._directory
+
+    def _get_entry_path(self, key):
+        input_hash, keyword = key
+        hash_txt = '{:x}'.format(input_hash)
+        name = '{}_{}'.format(hash_txt, quote(keyword, safe=''))
+        return os.path.join(self._directory, hash_txt[-2:], name + '.pkl')
+
+    @contextmanager
+    def lock(self):
+        """
+        Lock the storage for operations that involve more than one entry (shared between processes).
+        Writing and reading single entries do not require the lock.
+        """
+        _makedirs(self._directory)
+        with open(os.path.join(self._directory, 'lock'), 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.lockf(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.lockf(lock_file, fcntl.LOCK_UN)
+
+    def _check_migration(self):
+        if self._legacy_filename is None:
+            return
+
+        legacy_filename = self._legacy_filename
+        self._legacy_filename = None
+
+        # the data is imported again if the pickle file is modified after the import
+        migrated_mark = os.path.join(self._directory, 'migrated')
+
+        def is_migrated():
+            return (os.path.isfile(migrated_mark) and
+                    os.path.getmtime(migrated_mark) >= os.path.getmtime(legacy_filename))
+
+        if not os.path.isfile(legacy_filename) or is_migrated():
+            return
+
+        # only one process imports the data
+        with self.lock():
+            if is_migrated():
+                return
+
+            with open(legacy_filename, 'rb') as f:
+                legacy_data = pickle.load(f)
+
+            for key, value in legacy_data.items():
+                # only (hash, keyword) entries can be stored
+                if isinstance(key[0], int):
+                    self[key] = value
+
+            open(migrated_mark, 'w').close()
+            print('Imported data from {}'.format(legacy_filename))
+
+    def __contains__(self, key):
+        self._check_migration()
+        try:
+            return not self._is_expired(key[1], os.stat(self._get_entry_path(key)).st_mtime)
+        except OSError:
+            return False
+
+    def __getitem__(self, key):
+        self._check_migration()
+        entry_path = self._get_entry_path(key)
+        try:
+            with open(entry_path, 'rb') as f:
+                if self._is_expired(key[1], os.fstat(f.fileno()).st_mtime):
+                    raise IOError('expired entry')
+                data = f.read()
+        except IOError:
+            self._misses += 1
+            raise KeyError(key)
+
+        try:
+            data = _unpack_arrays(pickle.loads(_decompress(data)))
+        except Exception:
+            # incomplete entry (e.g. written without atomic write or interrupted copy)
+            warnings.warn('corrupted calculation data entry {} ignored'.format(key))
+            self._misses += 1
+            raise KeyError(key)
+
+        self._hits += 1
+        # the access time is used to determine the least recently used entries
+        try:
+            os.utime(entry_path, (time.time(), os.stat(entry_path).st_mtime))
+        except OSError:
+            pass
+
+        return data
+
+    def __setitem__(self, key, value):
+        self._check_migration()
+        entry_path = self._get_entry_path(key)
+        data = _compress(pickle.dumps(_pack_arrays(value), self._protocol), self._compression)
+
+        # size of the entry that is replaced
+        previous_size = 0
+        if self._size is not None:
+            try:
+                previous_size = os.path.getsize(entry_path)
+            except OSError:
+                pass
+
+        _makedirs(os.path.dirname(entry_path))
+        _atomic_write(entry_path, data)
+
+        if self._max_size is not None:
+            if self._size is None:
+                self._size = sum([entry_stat.st_size for _, _, entry_stat in self._scan()])
+            else:
+                self._size += len(data) - previous_size
+
+            if self._size > self._max_size:
+                self.evict()
+
+    def __delitem__(self, key):
+        self._check_migration()
+        entry_path = self._get_entry_path(key)
+        try:
+            size = os.path.getsize(entry_path)
+            os.remove(entry_path)
+        except OSError:
+            raise KeyError(key)
+
+        if self._size is not None:
+            self._size -= size
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def update(self, dictionary):
+        for key, value in dictionary.items():
+            self[key] = value
+
+    def _is_expired(self, keyword, modification_time):
+        keyword = _policy_keyword(keyword, self._ttl)
+        return keyword in self._ttl and time.time() - modification_time > self._ttl[keyword]
+
+    def _scan(self):
+        """
+        iterate over all the entries in the storage
+
+        :return: iterator of (key, entry_path, os.stat of the entry)
+        """
+        if not os.path.isdir(self._directory):
+            return
+
+        for shard in sorted(os.listdir(self._directory)):
+            if not os.path.isdir(os.path.join(self._directory, shard)):
+                continue
+            for name in sorted(os.listdir(os.path.join(self._directory, shard))):
+                if name.endswith('.pkl'):
+                    entry_path = os.path.join(self._directory, shard, name)
+                    try:
+                        entry_stat = os.stat(entry_path)
+                    except OSError:
+                        # removed by other process
+                        continue
+                    input_hash, keyword = name[:-4].split('_', 1)
+                    yield (int(input_hash, 16), unquote(keyword)), entry_path, entry_stat
+
+    def evict(self):
+        """
+        Remove the expired entries and, if the storage exceeds max_size, the least recently used entries
+        until the size is below 90% of max_size
+        """
+        with self.lock():
+            entries = []
+            for key, entry_path, entry_stat in self._scan():
+                if self._is_expired(key[1], entry_stat.st_mtime):
+                    self._remove_entry(entry_path)
+                else:
+                    entries.append((entry_stat.st_atime, entry_stat.st_size, key[1], entry_path))
+
+            self._size = sum([size for _, size, _, _ in entries])
+
+            if self._max_size is None or self._size <= self._max_size:
+                return
+
+            for _, size, keyword, entry_path in sorted(entries):
+                if self._size <= self._max_size * 0.9:
+                    break
+                if _policy_keyword(keyword, self._keep) in self._keep:
+                    continue
+                self._remove_entry(entry_path)
+                self._size -= size
+
+    def _remove_entry(self, entry_path):
+        try:
+            os.remove(entry_path)
+            self._evictions += 1
+        except OSError:
+            pass
+
+    def get_stats(self):
+        """
+        Get the usage statistics of the storage. Hits, misses and evictions are counted
+        for this object (current process)
+
+        :return: dictionary with the statistics
+        """
+        keywords = {}
+        for key, _, entry_stat in self._scan():
+            keyword_stats = keywords.setdefault(key[1], {'entries': 0, 'bytes': 0})
+            keyword_stats['entries'] += 1
+            keyword_stats['bytes'] += entry_stat.st_size
+
+        n_access = self._hits + self._misses
+
+        return {'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': self._hits / float(n_access) if n_access > 0 else None,
+                'evictions': self._evictions,
+                'entries': sum([k['entries'] for k in keywords.values()]),
+                'bytes': sum([k['bytes'] for k in keywords.values()]),
+                'max_size': self._max_size,
+                'keywords': keywords}
+
+    def keys(self):
+        self._check_migration()
+        return [key for key, _, _ in self._scan()]
+
+    def items(self):
+        for key in self.keys():
+            # entries may be removed by other processes
+            try:
+                yield key, self[key]
+            except KeyError:
+                pass
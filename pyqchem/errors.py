@@ -1,5 +1,6 @@
 class ParserError(Exception):
     def __init__(self, parser_name, message):
+        super(ParserError, self).__init__(parser_name, message)
         self.parser_name = parser_name
         self.message = message
 
@@ -9,6 +10,7 @@ class ParserError(Exception):
 
 class OutputError(Exception):
     def __init__(self, output, error_output):
+        super(OutputError, self).__init__(output, error_output)
         self.full_output = output
         self.error_lines = error_output + '\n'.join(output.split('\n')[-20:])
 
@@ -16,6 +18,14 @@ class OutputError(Exception):
         return 'Error in Q-Chem calculation:\n{}'.format(self.error_lines)
 
 
+class SchedulerError(Exception):
+    def __init__(self, message):
+        self._message = message
+
+    def __str__(self):
+        return 'Error in batch scheduler:\n{}'.format(self._message)
+
+
 class StructureError(Exception):
     def __init__(self, message):
         self._message = message
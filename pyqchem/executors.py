@@ -0,0 +1,273 @@
+from pyqchem.qchem_core import local_run, remote_run
+from pyqchem.errors import SchedulerError
+from subprocess import Popen, PIPE
+import uuid
+import shutil
+import time
+import os
+
+
+class Executor(object):
+    """
+    Base class of the executors: objects that run Q-Chem calculations whose input files have been written
+    in their work directories. An executor can be passed to get_output_from_qchem and run_batch
+    (executor argument) to choose where and how the calculations run.
+
+    Subclasses have to implement run or iterate_jobs (run several calculations at once).
+    """
+
+    # if True run_batch submits all the calculations to iterate_jobs at once
+    batch_submission = False
+
+    def run(self, input_file_name, work_dir, fchk_file, use_mpi=False, processors=1):
+        """
+        Run a Q-Chem calculation
+
+        :param input_file_name: Q-Chem input file name (in work_dir)
+        :param work_dir: directory where the calculation runs
+        :param fchk_file: name of the FCHK file (in work_dir)
+        :param use_mpi: use mpi instead of openmp
+        :param processors: number of threads/processors to use
+        :return: output, err: Q-Chem standard output and standard error
+        """
+        for _, result in self.iterate_jobs([(input_file_name, work_dir, fchk_file)],
+                                           use_mpi=use_mpi, processors=processors):
+            return result
+
+    def iterate_jobs(self, jobs, use_mpi=False, processors=1):
+        """
+        Run a list of Q-Chem calculations
+
+        :param jobs: list of (input_file_name, work_dir, fchk_file)
+        :param use_mpi: use mpi instead of openmp
+        :param processors: number of threads/processors to use in each calculation
+        :return: iterator that yields (index, (output, err)) as calculations finish
+        """
+        for i, job in enumerate(jobs):
+            yield i, self.run(*job, use_mpi=use_mpi, processors=processors)
+
+
+class LocalExecutor(Executor):
+    """
+    Run the calculations in this machine (same as get_output_from_qchem without executor)
+    """
+
+    def __init__(self, stream_output=False, stream_callbacks=None, abort_on_scf_failure=True):
+        """
+        :param stream_output: follow the output while the calculation is running (see local_run)
+        :param stream_callbacks: functions called when each section of the output is complete (see local_run)
+        :param abort_on_scf_failure: abort the followed calculations if SCF does not converge (see local_run)
+        """
+        self._stream_output = stream_output
+        self._stream_callbacks = stream_callbacks
+        self._abort_on_scf_failure = abort_on_scf_failure
+
+    def run(self, input_file_name, work_dir, fchk_file, use_mpi=False, processors=1):
+        return local_run(input_file_name, work_dir, fchk_file, use_mpi=use_mpi, processors=processors,
+                         stream_output=self._stream_output, stream_callbacks=self._stream_callbacks,
+                         abort_on_scf_failure=self._abort_on_scf_failure)
+
+
+class RemoteExecutor(Executor):
+    """
+    Run the calculations in a remote machine using SSH (same as get_output_from_qchem with remote)
+    """
+
+    def __init__(self, remote_params):
+        """
+        :param remote_params: connection parameters for paramiko (see remote_run)
+        """
+        self._remote_params = remote_params
+
+    def run(self, input_file_name, work_dir, fchk_file, use_mpi=False, processors=1):
+        return remote_run(input_file_name, work_dir, fchk_file, self._remote_params,
+                          use_mpi=use_mpi, processors=processors)
+
+
+# commands and job script directives of each batch scheduler ({job_id}, {last_task} and {processors} are replaced)
+SCHEDULERS = {'slurm': {'submit': 'sbatch',
+                        'status': 'squeue -h -j {job_id}',
+                        'cancel': 'scancel {job_id}',
+                        'directive': '#SBATCH',
+                        'options': ['--job-name=pyqchem', '--cpus-per-task={processors}'],
+                        'array_option': '--array=0-{last_task}',
+                        'task_id': 'SLURM_ARRAY_TASK_ID'},
+              'pbs': {'submit': 'qsub',
+                      'status': 'qstat -t {job_id}',
+                      'cancel': 'qdel {job_id}',
+                      'directive': '#PBS',
+                      'options': ['-N pyqchem', '-l ncpus={processors}', '-j oe'],
+                      'array_option': '-J 0-{last_task}',
+                      'task_id': 'PBS_ARRAY_INDEX'}}
+
+
+def _execute(command, cwd=None):
+    process = Popen(command, stdout=PIPE, stderr=PIPE, shell=True, cwd=cwd)
+    output, err = process.communicate()
+    return process.returncode, output.decode(), err.decode()
+
+
+class QueueExecutor(Executor):
+    """
+    Run the calculations through a batch scheduler (SLURM or PBS). A job script is generated and submitted
+    for each group of calculations (array job, one task per calculation), then the status of the job is polled
+    until all the calculations have finished. The scheduler commands are executed in this machine and the
+    scratch directory must be accessible from the compute nodes (shared file system).
+
+    Example: scan of 1000 points submitted as one array job
+        executor = QueueExecutor('slurm', options=['--partition=short', '--time=02:00:00'],
+                                 precommand=['module load qchem'])
+        outputs = run_batch(input_list, executor=executor, parser=basic_cis)
+
+    The commands of the scheduler can be replaced to use other schedulers or a stand-in scheduler for tests.
+    """
+
+    batch_submission = True
+
+    def __init__(self, scheduler='slurm', options=(), precommand=(), poll_interval=30,
+                 submit_command=None, status_command=None, cancel_command=None):
+        """
+        :param scheduler: 'slurm' or 'pbs'
+        :param options: list of additional options of the job script (e.g. ['--partition=short'])
+        :param precommand: list of commands executed in the job before Q-Chem (e.g. ['module load qchem'])
+        :param poll_interval: time (seconds) between checks of the status of the job
+        :param submit_command: command to submit the job script (the name of the script is appended)
+        :param status_command: command that shows the job if it is in the queue ({job_id} is replaced)
+        :param cancel_command: command to cancel the job ({job_id} is replaced)
+        """
+        if scheduler not in SCHEDULERS:
+            raise SchedulerError('Scheduler {} not supported (available: {})'.format(scheduler,
+                                                                                    ', '.join(sorted(SCHEDULERS))))
+        self._scheduler = dict(SCHEDULERS[scheduler])
+        for key, command in [('submit', submit_command), ('status', status_command), ('cancel', cancel_command)]:
+            if command is not None:
+                self._scheduler[key] = command
+
+        self._options = list(options)
+        self._precommand = list(precommand)
+        self._poll_interval = poll_interval
+
+    def get_job_script(self, jobs, use_mpi=False, processors=1):
+        """
+        Generate the job script that runs a list of calculations (one task for each calculation)
+
+        :param jobs: list of (input_file_name, work_dir, fchk_file)
+        :param use_mpi: use mpi instead of openmp
+        :param processors: number of threads/processors to use in each calculation
+        :return: job script
+        """
+        directive = self._scheduler['directive']
+        options = [option.format(processors=processors) for option in self._scheduler['options']] + self._options
+        if len(jobs) > 1:
+            options.append(self._scheduler['array_option'].format(last_task=len(jobs) - 1))
+
+        flag = '-np' if use_mpi else '-nt'
+
+        lines = ['#!/bin/bash']
+        lines += ['{} {}'.format(directive, option) for option in options]
+        lines += self._precommand
+        lines += ['INPUTS=({})'.format(' '.join(["'{}'".format(job[0]) for job in jobs])),
+                  'WORK_DIRS=({})'.format(' '.join(["'{}'".format(job[1]) for job in jobs])),
+                  'FCHK_FILES=({})'.format(' '.join(["'{}'".format(job[2]) for job in jobs])),
+                  'TASK_ID=${{{}:-0}}'.format(self._scheduler['task_id']),
+                  'INPUT="${INPUTS[$TASK_ID]}"',
+                  'cd "${WORK_DIRS[$TASK_ID]}"',
+                  'export GUIFILE="${FCHK_FILES[$TASK_ID]}"',
+                  'qchem {} {} "$INPUT" > "$INPUT.out" 2> "$INPUT.err"'.format(flag, processors),
+                  # the exit status file marks the end of the calculation
+                  'echo $? > "$INPUT.exit.tmp"',
+                  'mv "$INPUT.exit.tmp" "$INPUT.exit"',
+                  '']
+
+        return '\n'.join(lines)
+
+    def submit(self, job_script, directory):
+        """
+        Submit a job script
+
+        :param job_script: job script
+        :param directory: directory where the job script is written (and the job is submitted from)
+        :return: job id
+        """
+        script_file_name = os.path.join(directory, 'pyqchem_job.sh')
+        with open(script_file_name, 'w') as f:
+            f.write(job_script)
+
+        returncode, output, err = _execute('{} {}'.format(self._scheduler['submit'], script_file_name), cwd=directory)
+        if returncode != 0 or len(output.split()) == 0:
+            raise SchedulerError('Job submission failed: {}{}'.format(output, err))
+
+        # e.g. "Submitted batch job 1234" (sbatch), "1234.server" (qsub)
+        return output.split()[-1].split(';')[0]
+
+    def is_queued(self, job_id):
+        """
+        check if a job is still in the queue (pending or running)
+
+        :param job_id: job id
+        :return: True if the job is in the queue
+        """
+        returncode, output, _ = _execute(self._scheduler['status'].format(job_id=job_id))
+        return returncode == 0 and job_id.split('.')[0].split('[')[0] in output
+
+    def cancel(self, job_id):
+        """
+        cancel a job
+
+        :param job_id: job id
+        """
+        _execute(self._scheduler['cancel'].format(job_id=job_id))
+
+    @staticmethod
+    def _is_finished(job):
+        input_file_name, work_dir, _ = job
+        return os.path.isfile(os.path.join(work_dir, input_file_name + '.exit'))
+
+    @staticmethod
+    def _read_results(job):
+        input_file_name, work_dir, fchk_file = job
+
+        results = []
+        for extension in ['.out', '.err']:
+            file_name = os.path.join(work_dir, input_file_name + extension)
+            if os.path.isfile(file_name):
+                with open(file_name) as f:
+                    results.append(f.read())
+            else:
+                results.append('')
+
+        # Rename fchk file to match expected name
+        if os.path.isfile(os.path.join(work_dir, input_file_name + '.fchk')):
+            os.rename(os.path.join(work_dir, input_file_name + '.fchk'), os.path.join(work_dir, fchk_file))
+
+        return tuple(results)
+
+    def iterate_jobs(self, jobs, use_mpi=False, processors=1):
+        # the job script is written in the scratch directory (parent of the work directories)
+        directory = os.path.join(os.path.dirname(os.path.normpath(jobs[0][1])),
+                                 'qchem_job_{}'.format(uuid.uuid4().hex[:12]))
+        os.makedirs(directory)
+
+        remaining = list(range(len(jobs)))
+        job_id = None
+        try:
+            job_id = self.submit(self.get_job_script(jobs, use_mpi=use_mpi, processors=processors), directory)
+
+            while len(remaining) > 0:
+                finished = [i for i in remaining if self._is_finished(jobs[i])]
+
+                if len(finished) == 0 and not self.is_queued(job_id):
+                    # the calculations that have not finished were killed (e.g. time limit)
+                    finished = list(remaining)
+
+                for i in finished:
+                    remaining.remove(i)
+                    yield i, self._read_results(jobs[i])
+
+                if len(finished) == 0:
+                    time.sleep(self._poll_interval)
+
+        finally:
+            if len(remaining) > 0 and job_id is not None:
+                self.cancel(job_id)
+            shutil.rmtree(directory, ignore_errors=True)
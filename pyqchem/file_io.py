@@ -1,58 +1,88 @@
 from pyqchem.structure import atom_data, Structure
 
 import numpy as np
+import json
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
 angstrom_to_bohr = 1/0.529177249
 
-def get_array_txt(label, type, array, row_size=5):
+def write_array_fchk(f, label, type, array, row_size=5, chunk_rows=10000):
+    """
+    write an array section in FCHK format to a file object. The rows are formatted in chunks
+    with a single format operation
 
-    formats = {'R': '15.8e',
-               'I': '11'}
+    :param f: file object (text mode)
+    :param label: section name
+    :param type: 'R' (real) or 'I' (integer)
+    :param array: array data (it is flattened)
+    :param row_size: number of elements per row
+    :param chunk_rows: number of rows formatted at once
+    """
 
+    # printf-style format (faster than str.format for large number of elements)
+    formats = {'R': ' %15.8e',
+               'I': ' %11d'}
+
+    array = np.asarray(array, dtype=float if type == 'R' else int).flatten()
     n_elements = len(array)
-    rows = int(np.ceil(n_elements/row_size))
 
-    txt_fchk = '{:40}   {}   N=       {:5}\n'.format(label, type, n_elements)
+    f.write('{:40}   {}   N=       {:5}\n'.format(label, type, n_elements))
 
-    # print(rows)
-    for i in range(rows):
-        if (i+1)*row_size > n_elements:
-            txt_fchk += (' {:{fmt}}'* (n_elements - i*row_size) + '\n').format(*array[i * row_size:n_elements],
-                                                                               fmt=formats[type])
-        else:
-            txt_fchk += (' {:{fmt}}'* row_size  + '\n').format(*array[i * row_size: (i+1)*row_size],
-                                                               fmt=formats[type])
+    row_format = formats[type] * row_size + '\n'
+    n_full_rows = n_elements // row_size
 
-    return txt_fchk
+    for i in range(0, n_full_rows, chunk_rows):
+        n_rows = min(chunk_rows, n_full_rows - i)
+        f.write((row_format * n_rows) % tuple(array[i * row_size: (i + n_rows) * row_size].tolist()))
 
+    # last incomplete row
+    if n_elements % row_size > 0:
+        f.write((formats[type] * (n_elements % row_size) + '\n') % tuple(array[n_full_rows * row_size:].tolist()))
 
-def build_fchk(parsed_data):
+
+def get_array_txt(label, type, array, row_size=5):
+
+    f = StringIO()
+    write_array_fchk(f, label, type, array, row_size=row_size)
+
+    return f.getvalue()
+
+
+def _lower_triangle(matrix):
+    # FCHK symmetric matrices are stored as the lower triangle by rows
+    matrix = np.asarray(matrix, dtype=float)
+    if matrix.ndim == 1:
+        return matrix
+    return matrix[np.tril_indices(len(matrix))]
+
+
+def write_fchk(parsed_data, f):
+    """
+    Write the electronic structure in FCHK format to a file object.
+    Optional sections are written if present in the electronic structure: beta MO coefficients and
+    energies, overlap ('overlap'), SCF density ('scf_density') and core Hamiltonian ('core_hamiltonian')
+
+    :param parsed_data: electronic structure dictionary (as returned by parser_fchk)
+    :param f: file object (text mode)
+    """
 
     structure = parsed_data['structure']
     basis = parsed_data['basis']
     alpha_mo_coeff = parsed_data['coefficients']['alpha']
     alpha_mo_energies = parsed_data['mo_energies']['alpha']
 
-    #overlap = parsed_data['overlap']
-    #coor_shell = parsed_data['coor_shell']
-    #core_hamiltonian = parsed_data['core_hamiltonian']
-    #scf_density = parsed_data['scf_density']
-
     number_of_basis_functions = len(alpha_mo_coeff)
     number_of_electrons = np.sum(structure.get_atomic_numbers()) - structure.charge
-    if structure.multiplicity > 1:
-        # raise Exception('1> multiplicity not yet implemented')
-        pass
-    alpha_electrons = number_of_electrons // 2
-    beta_electrons = number_of_electrons // 2
-    #print(alpha_electrons)
-    #print(number_of_electrons)
-
-    alpha_mo_coeff = np.array(alpha_mo_coeff).flatten().tolist()
-
-    if 'beta' in parsed_data['coefficients']:
-        beta_mo_coeff = parsed_data['coefficients']['beta']
-        beta_mo_coeff = np.array(beta_mo_coeff).flatten().tolist()
-        beta_mo_energies = parsed_data['mo_energies']['beta']
+    if 'number_of_electrons' in parsed_data:
+        alpha_electrons = parsed_data['number_of_electrons']['alpha']
+        beta_electrons = parsed_data['number_of_electrons']['beta']
+    else:
+        alpha_electrons = (number_of_electrons + structure.multiplicity - 1) // 2
+        beta_electrons = number_of_electrons - alpha_electrons
 
     shell_type_list = {'s':  {'type':  0, 'angular_momentum': 0},
                        'p':  {'type':  1, 'angular_momentum': 1},
@@ -86,50 +116,259 @@ def build_fchk(parsed_data):
             if len(shell['con_coefficients']) > largest_degree_of_contraction:
                     largest_degree_of_contraction = len(shell['con_coefficients'])
 
-            for p in shell['p_exponents']:
-                p_exponents.append(p)
-            for c in shell['con_coefficients']:
-                c_coefficients.append(c)
-            for pc in shell['p_con_coefficients']:
-                p_c_coefficients.append(pc)
+            p_exponents += list(shell['p_exponents'])
+            c_coefficients += list(shell['con_coefficients'])
+            p_c_coefficients += list(shell['p_con_coefficients'])
 
     coordinates_list = angstrom_to_bohr*np.array(structure.get_coordinates()).flatten()
 
-    txt_fchk = '{}\n'.format('filename')
-    txt_fchk += 'SP        R                             {}\n'.format(basis['name'] if 'name' in basis else 'no_name')
-    txt_fchk += 'Number of atoms                            I               {}\n'.format(structure.get_number_of_atoms())
-    txt_fchk += 'Charge                                     I               {}\n'.format(structure.charge)
-    txt_fchk += 'Multiplicity                               I               {}\n'.format(structure.multiplicity)
-    txt_fchk += 'Number of electrons                        I               {}\n'.format(number_of_electrons)
-    txt_fchk += 'Number of alpha electrons                  I               {}\n'.format(alpha_electrons)
-    txt_fchk += 'Number of beta electrons                   I               {}\n'.format(beta_electrons)
-
-    txt_fchk += get_array_txt('Atomic numbers', 'I', structure.get_atomic_numbers(), row_size=6)
-    txt_fchk += get_array_txt('Current cartesian coordinates', 'R', coordinates_list)
-    txt_fchk += get_array_txt('Nuclear charges', 'R', structure.get_atomic_numbers())
-
-    txt_fchk += 'Number of basis functions                  I               {}\n'.format(number_of_basis_functions)
-    txt_fchk += 'Number of contracted shells                I               {}\n'.format(number_of_contracted_shells)
-    txt_fchk += 'Number of primitive shells                 I               {}\n'.format(np.sum(n_primitives))
-    txt_fchk += 'Highest angular momentum                   I               {}\n'.format(highest_angular_momentum)
-    txt_fchk += 'Largest degree of contraction              I               {}\n'.format(largest_degree_of_contraction)
-
-    txt_fchk += get_array_txt('Shell types', 'I', shell_type, row_size=6)
-    txt_fchk += get_array_txt('Number of primitives per shell', 'I', n_primitives, row_size=6)
-    txt_fchk += get_array_txt('Shell to atom map', 'I', atom_map, row_size=6)
-    txt_fchk += get_array_txt('Primitive exponents', 'R', p_exponents)
-    txt_fchk += get_array_txt('Contraction coefficients', 'R', c_coefficients)
-    txt_fchk += get_array_txt('P(S=P) Contraction coefficients', 'R', p_c_coefficients)
-    # txt_fchk += get_array_txt('Coordinates of each shell', 'R', coor_shell) #
-    # txt_fchk += get_array_txt('Overlap Matrix', 'R', overlap)
-    #txt_fchk += get_array_txt('Core Hamiltonian Matrix', 'R', core_hamiltonian)
-    txt_fchk += get_array_txt('Alpha Orbital Energies', 'R', alpha_mo_energies)
-    # txt_fchk += get_array_txt('Beta Orbital Energies', 'R', beta_mo_energies)
-    # txt_fchk += get_array_txt('Total SCF Density', 'R', scf_density)
-    txt_fchk += get_array_txt('Alpha MO coefficients', 'R', alpha_mo_coeff)
-    # txt_fchk += get_array_txt('Beta MO coefficients', 'R', beta_mo_coeff)
-
-    return txt_fchk
+    f.write('{}\n'.format('filename'))
+    f.write('SP        R                             {}\n'.format(basis['name'] if 'name' in basis else 'no_name'))
+    f.write('Number of atoms                            I               {}\n'.format(structure.get_number_of_atoms()))
+    f.write('Charge                                     I               {}\n'.format(structure.charge))
+    f.write('Multiplicity                               I               {}\n'.format(structure.multiplicity))
+    f.write('Number of electrons                        I               {}\n'.format(number_of_electrons))
+    f.write('Number of alpha electrons                  I               {}\n'.format(alpha_electrons))
+    f.write('Number of beta electrons                   I               {}\n'.format(beta_electrons))
+
+    write_array_fchk(f, 'Atomic numbers', 'I', structure.get_atomic_numbers(), row_size=6)
+    write_array_fchk(f, 'Current cartesian coordinates', 'R', coordinates_list)
+    write_array_fchk(f, 'Nuclear charges', 'R', structure.get_atomic_numbers())
+
+    f.write('Number of basis functions                  I               {}\n'.format(number_of_basis_functions))
+    f.write('Number of contracted shells                I               {}\n'.format(number_of_contracted_shells))
+    f.write('Number of primitive shells                 I               {}\n'.format(np.sum(n_primitives)))
+    f.write('Highest angular momentum                   I               {}\n'.format(highest_angular_momentum))
+    f.write('Largest degree of contraction              I               {}\n'.format(largest_degree_of_contraction))
+
+    write_array_fchk(f, 'Shell types', 'I', shell_type, row_size=6)
+    write_array_fchk(f, 'Number of primitives per shell', 'I', n_primitives, row_size=6)
+    write_array_fchk(f, 'Shell to atom map', 'I', atom_map, row_size=6)
+    write_array_fchk(f, 'Primitive exponents', 'R', p_exponents)
+    write_array_fchk(f, 'Contraction coefficients', 'R', c_coefficients)
+    write_array_fchk(f, 'P(S=P) Contraction coefficients', 'R', p_c_coefficients)
+
+    if 'overlap' in parsed_data:
+        write_array_fchk(f, 'Overlap Matrix', 'R', _lower_triangle(parsed_data['overlap']))
+    if 'core_hamiltonian' in parsed_data:
+        write_array_fchk(f, 'Core Hamiltonian Matrix', 'R', _lower_triangle(parsed_data['core_hamiltonian']))
+
+    write_array_fchk(f, 'Alpha Orbital Energies', 'R', alpha_mo_energies)
+    if 'beta' in parsed_data['mo_energies']:
+        write_array_fchk(f, 'Beta Orbital Energies', 'R', parsed_data['mo_energies']['beta'])
+
+    if 'scf_density' in parsed_data:
+        write_array_fchk(f, 'Total SCF Density', 'R', _lower_triangle(parsed_data['scf_density']))
+
+    write_array_fchk(f, 'Alpha MO coefficients', 'R', alpha_mo_coeff)
+    if 'beta' in parsed_data['coefficients']:
+        write_array_fchk(f, 'Beta MO coefficients', 'R', parsed_data['coefficients']['beta'])
+
+
+def build_fchk(parsed_data):
+    """
+    Get the electronic structure in FCHK format (see write_fchk)
+
+    :param parsed_data: electronic structure dictionary (as returned by parser_fchk)
+    :return: FCHK file in plain text
+    """
+
+    f = StringIO()
+    write_fchk(parsed_data, f)
+
+    return f.getvalue()
+
+
+# values without array representation (stored as text)
+_NONE_VALUE = '__none__'
+_EMPTY_DICT_VALUE = '__empty_dict__'
+
+
+def _flatten_electronic_structure(electronic_structure):
+    """
+    convert the electronic structure dictionary to a flat dictionary of numpy arrays.
+    Nested dictionaries and lists of dictionaries are represented by paths (lists indices as #n).
+    None values and empty dictionaries are stored as text markers
+    """
+
+    def flatten(path, value):
+        if value is None:
+            data[path] = np.array(_NONE_VALUE)
+        elif isinstance(value, dict) and len(value) == 0:
+            data[path] = np.array(_EMPTY_DICT_VALUE)
+        elif isinstance(value, dict):
+            for key, element in value.items():
+                flatten('{}/{}'.format(path, key), element)
+        elif isinstance(value, (list, tuple)) and any([isinstance(element, dict) for element in value]):
+            for i, element in enumerate(value):
+                flatten('{}/#{}'.format(path, i), element)
+        else:
+            array = np.asarray(value)
+            if array.dtype == object:
+                raise ValueError('{} cannot be stored in binary format'.format(path))
+            data[path] = array
+
+    data = {}
+    for key, value in electronic_structure.items():
+        if key == 'structure':
+            data['structure/coordinates'] = np.array(value.get_coordinates(), dtype=float)
+            data['structure/atomic_numbers'] = np.array(value.get_atomic_numbers(), dtype=int)
+            data['structure/charge'] = np.array(value.charge)
+            data['structure/multiplicity'] = np.array(value.multiplicity)
+        elif key == 'basis':
+            # the basis is small and irregular (stored as JSON text)
+            data['basis'] = np.array(json.dumps(value))
+        else:
+            flatten(key, value)
+
+    return data
+
+
+def _unflatten_electronic_structure(data, as_arrays=False):
+    """
+    inverse of _flatten_electronic_structure
+    """
+
+    electronic_structure = {}
+    for path, array in data.items():
+        if path.startswith('structure/'):
+            continue
+        if path == 'basis':
+            electronic_structure['basis'] = json.loads(array.item())
+            continue
+
+        if array.ndim == 0:
+            value = array.item()
+            if value == _NONE_VALUE:
+                value = None
+            elif value == _EMPTY_DICT_VALUE:
+                value = {}
+        else:
+            value = np.ascontiguousarray(array) if as_arrays else array.tolist()
+
+        keys = path.split('/')
+        node = electronic_structure
+        for key, next_key in zip(keys[:-1], keys[1:]):
+            if key.startswith('#'):
+                key = int(key[1:])
+                while len(node) <= key:
+                    node.append(None)
+                if node[key] is None:
+                    node[key] = [] if next_key.startswith('#') else {}
+            elif key not in node:
+                node[key] = [] if next_key.startswith('#') else {}
+            node = node[key]
+
+        if keys[-1].startswith('#'):
+            # element of a list of dictionaries (None or empty)
+            index = int(keys[-1][1:])
+            while len(node) <= index:
+                node.append(None)
+            node[index] = value
+        else:
+            node[keys[-1]] = value
+
+    if 'structure/coordinates' in data:
+        electronic_structure['structure'] = Structure(coordinates=data['structure/coordinates'],
+                                                      atomic_numbers=data['structure/atomic_numbers'].tolist(),
+                                                      charge=data['structure/charge'].item(),
+                                                      multiplicity=data['structure/multiplicity'].item())
+
+    return electronic_structure
+
+
+def _is_hdf5(filename):
+    return filename.lower().endswith(('.h5', '.hdf5'))
+
+
+def write_electronic_structure(filename, electronic_structure, compress=True):
+    """
+    Write the electronic structure dictionary (as returned by parser_fchk) in binary format.
+    The format is chosen from the file extension: HDF5 (.h5, .hdf5, requires h5py) or NPZ (otherwise)
+
+    :param filename: file name
+    :param electronic_structure: electronic structure dictionary
+    :param compress: if True, compress the arrays (HDF5 arrays are also stored in chunks)
+    """
+
+    data = _flatten_electronic_structure(electronic_structure)
+
+    if _is_hdf5(filename):
+        import h5py
+
+        with h5py.File(filename, 'w') as f:
+            for path, array in data.items():
+                if array.dtype.kind == 'U':
+                    f[path] = array.item()
+                elif compress and array.ndim > 0 and array.size > 0:
+                    f.create_dataset(path, data=array, compression='gzip', chunks=True)
+                else:
+                    f.create_dataset(path, data=array)
+        return
+
+    # write to file object (np.savez adds .npz extension to file names)
+    with open(filename, 'wb') as f:
+        if compress:
+            np.savez_compressed(f, **data)
+        else:
+            np.savez(f, **data)
+
+
+def read_electronic_structure(filename, as_arrays=False):
+    """
+    Read the electronic structure dictionary from a binary file written by write_electronic_structure
+
+    :param filename: file name
+    :param as_arrays: if True, return numeric data as numpy arrays instead of lists
+    :return: electronic structure dictionary
+    """
+
+    data = {}
+    if _is_hdf5(filename):
+        import h5py
+
+        def read_dataset(path, item):
+            if isinstance(item, h5py.Dataset):
+                value = item[()]
+                data[path] = np.array(value.decode() if isinstance(value, bytes) else value)
+
+        with h5py.File(filename, 'r') as f:
+            f.visititems(read_dataset)
+    else:
+        with np.load(filename) as f:
+            for path in f.files:
+                data[path] = f[path]
+
+    return _unflatten_electronic_structure(data, as_arrays=as_arrays)
+
+
+def fchk_to_binary(fchk_filename, filename, compress=True):
+    """
+    Convert a text FCHK file to binary format (see write_electronic_structure)
+
+    :param fchk_filename: FCHK file name
+    :param filename: binary file name
+    :param compress: if True, compress the arrays
+    """
+    from pyqchem.parsers.parser_fchk import parser_fchk
+
+    with open(fchk_filename, 'r') as f:
+        electronic_structure = parser_fchk(f.read(), as_arrays=True)
+
+    write_electronic_structure(filename, electronic_structure, compress=compress)
+
+
+def binary_to_fchk(filename, fchk_filename):
+    """
+    Convert a binary file written by write_electronic_structure to text FCHK
+
+    :param filename: binary file name
+    :param fchk_filename: FCHK file name
+    """
+
+    with open(fchk_filename, 'w') as f:
+        write_fchk(read_electronic_structure(filename, as_arrays=True), f)
+
 
 if __name__ == '__main__':
     from pyqchem.parsers.parser_fchk import parser_fchk
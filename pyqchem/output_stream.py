@@ -0,0 +1,66 @@
+# Sections of the Q-Chem output that can be followed while the calculation is running
+# name: [start marker, end marker] (if end marker is None the section is the start line)
+STREAM_SECTIONS = {'scf': ['SCF   energy in the final basis set', None],
+                   'rasci_state': ['RAS-CI total energy for state', '********'],
+                   'optimization_cycle': ['Optimization Cycle', 'Energy change']}
+
+# Lines that indicate that the calculation will not finish correctly
+SCF_FAILURE_MARKERS = ['SCF failed to converge']
+
+
+class OutputStream:
+    """
+    Follows the Q-Chem output line by line while the calculation is running. The output is written
+    to a file and the callback functions are called with the text of each section once it is complete.
+    """
+    def __init__(self, output_file, callbacks=None, abort_on_scf_failure=True):
+        """
+        :param output_file: file object where the output is written
+        :param callbacks: dictionary {section name: function(section_text)} (see STREAM_SECTIONS)
+        :param abort_on_scf_failure: if True the calculation is aborted if SCF does not converge
+        """
+
+        if callbacks is None:
+            callbacks = {}
+
+        for name in callbacks:
+            if name not in STREAM_SECTIONS:
+                raise KeyError('{} is not a valid output section. Use: {}'.format(name, list(STREAM_SECTIONS)))
+
+        self._output_file = output_file
+        self._callbacks = callbacks
+        self._abort_on_scf_failure = abort_on_scf_failure
+        self._open_sections = {}
+        self._abort = False
+
+    def feed(self, line):
+        """
+        process a new line of the output
+
+        :param line: line of the output (including the new line character)
+        :return: True if the calculation should be aborted
+        """
+
+        self._output_file.write(line)
+
+        # close finished sections (the end line is included in the section)
+        for name in list(self._open_sections):
+            self._open_sections[name].append(line)
+            if STREAM_SECTIONS[name][1] in line:
+                self._callbacks[name](''.join(self._open_sections.pop(name)))
+
+        for name, callback in self._callbacks.items():
+            start, end = STREAM_SECTIONS[name]
+            if start in line:
+                if end is None:
+                    callback(line)
+                else:
+                    self._open_sections[name] = [line]
+
+        if self._abort_on_scf_failure:
+            for marker in SCF_FAILURE_MARKERS:
+                if marker in line:
+                    self._abort = True
+
+        return self._abort
+
@@ -26,7 +26,7 @@ def basic_parser_qchem(output):
 
     # Orbitals energy
     enum = output.find('Orbital Energies (a.u.)')
-    bars = search_bars(output, from_position=enum, bar_type='----')
+    bars = search_bars(output, from_position=enum, bar_type='----', n_bars=2)
     orbitals_section = output[enum:bars[1]]
 
     alpha_mos = orbitals_section.find('Alpha MOs')
@@ -45,13 +45,13 @@ def basic_parser_qchem(output):
 
     # Mulliken Net Atomic Charges
     enum = output.find('Ground-State Mulliken Net Atomic Charges')
-    bars = search_bars(output, from_position=enum, bar_type='----')
+    bars = search_bars(output, from_position=enum, bar_type='----', n_bars=2)
     mulliken_section = output[bars[0]:bars[1]]
     data_dict['mulliken_charges'] = [float(line.split()[2]) for line in mulliken_section.split('\n')[1:-1]]
 
     # Multipole Moments
     enum = output.find('Cartesian Multipole Moments')
-    bars = search_bars(output, from_position=enum, bar_type='----')
+    bars = search_bars(output, from_position=enum, bar_type='----', n_bars=2)
     multipole_section = output[bars[0]: bars[1]]
     multipole_lines =  multipole_section.split('\n')[1:-1]
 
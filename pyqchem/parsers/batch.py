@@ -0,0 +1,293 @@
+from pyqchem.structure import Structure
+from pyqchem.errors import ParserError
+from pyqchem.parsers.support import ConfigurationTable
+from contextlib import closing
+import numpy as np
+import mmap
+import json
+import time
+import os
+
+
+def read_output(filename):
+    """
+    Read a Q-Chem output file. The text is decoded directly from a memory map of the file
+    (the content is not copied to an intermediate bytes object)
+
+    :param filename: output file name
+    :return: output text
+    """
+    with open(filename, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return ''
+        with closing(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)) as output_map:
+            return str(output_map, 'utf-8', 'replace')
+
+
+def _flatten_parsed_data(parsed_data):
+    """
+    convert the dictionary returned by a parser to a flat dictionary of numpy arrays.
+    Nested dictionaries and lists of dictionaries are represented by paths (lists indices as #n)
+    """
+
+    def flatten(path, value):
+        if value is None:
+            return
+        if isinstance(value, Structure):
+            data[path + '/coordinates'] = np.array(value.get_coordinates(), dtype=float)
+            data[path + '/atomic_numbers'] = np.array(value.get_atomic_numbers(), dtype=int)
+            data[path + '/charge'] = np.array(value.charge)
+            data[path + '/multiplicity'] = np.array(value.multiplicity)
+        elif isinstance(value, ConfigurationTable):
+            for name in ['hole', 'part', 'alpha', 'beta', 'amplitude', 'occupations_alpha', 'occupations_beta']:
+                data['{}/{}'.format(path, name)] = getattr(value, name)
+        elif isinstance(value, dict):
+            for key, element in value.items():
+                # interstate properties use tuples of states as keys
+                key = '_'.join([str(k) for k in key]) if isinstance(key, tuple) else str(key)
+                flatten('{}/{}'.format(path, key), element)
+        elif isinstance(value, (list, tuple)) and len(value) > 0 and isinstance(value[0], dict):
+            for i, element in enumerate(value):
+                flatten('{}/#{}'.format(path, i), element)
+        else:
+            array = np.asarray(value)
+            if array.dtype == object:
+                # irregular data (e.g. lists containing None) is kept as text
+                array = np.array(json.dumps(value, default=str))
+            data[path] = array
+
+    data = {}
+    for key, value in parsed_data.items():
+        flatten(str(key), value)
+
+    return data
+
+
+def _parse_file(filename, parser, parser_parameters):
+    """
+    parse one output file (executed in the worker processes)
+
+    :return: filename, size in bytes, flat dictionary of arrays (None if error), ParserError (None if success)
+    """
+    try:
+        size = os.path.getsize(filename)
+        output = read_output(filename)
+    except (IOError, OSError) as e:
+        return filename, 0, None, ParserError(parser.__name__, 'Error reading {}: {}'.format(filename, e))
+
+    try:
+        data = _flatten_parsed_data(parser(output, **parser_parameters))
+    except ParserError as e:
+        return filename, size, None, e
+    except Exception as e:
+        return filename, size, None, ParserError(parser.__name__, '{}: {}'.format(type(e).__name__, e))
+
+    return filename, size, data, None
+
+
+class ParsedOutputs:
+    """
+    Columnar store of the data parsed from a list of Q-Chem outputs. Each field of the parsed data
+    is a column (nested fields are written as paths, e.g. 'excited_states/#0/total_energy') that contains
+    the value of the field in each output.
+    """
+    def __init__(self):
+        self.filenames = []
+        self.errors = {}
+        self.stats = {}
+        self._columns = {}
+
+    def append(self, filename, data):
+        """
+        add the data of an output
+
+        :param filename: output file name
+        :param data: flat dictionary of arrays (see _flatten_parsed_data)
+        """
+        n = len(self.filenames)
+        self.filenames.append(filename)
+        for name, array in data.items():
+            self._columns.setdefault(name, [None] * n).append(array)
+        for column in self._columns.values():
+            if len(column) == n:
+                column.append(None)
+
+    def __len__(self):
+        return len(self.filenames)
+
+    def keys(self):
+        """
+        :return: list of column names
+        """
+        return sorted(self._columns.keys())
+
+    def get_column(self, name):
+        """
+        get the values of a field in all the outputs
+
+        :param name: column name
+        :return: numpy array (number of outputs x shape of the field) if the field has the same shape in all
+                 the outputs, otherwise list of numpy arrays (None for the outputs without the field)
+        """
+        column = self._columns[name]
+        if all([array is not None for array in column]) and len(set([array.shape for array in column])) == 1:
+            return np.array(column)
+        return list(column)
+
+    def __getitem__(self, name):
+        return self.get_column(name)
+
+    def save(self, filename, compress=True):
+        """
+        write the columns to a NPZ file. Columns with different shapes in each output (or missing in some
+        outputs) are stored as the concatenated values, the shape of the field in each output and a mask of
+        the outputs that contain the field. Columns that cannot be concatenated (different number of dimensions
+        or types in each output) are stored as the JSON text of the field in each output
+
+        :param filename: file name
+        :param compress: if True, compress the arrays
+        """
+        data = {'filenames': np.array(self.filenames, dtype=str),
+                'errors/filenames': np.array(sorted(self.errors.keys()), dtype=str),
+                'errors/parsers': np.array([self.errors[f].parser_name for f in sorted(self.errors.keys())], dtype=str),
+                'errors/messages': np.array([self.errors[f].message for f in sorted(self.errors.keys())], dtype=str)}
+
+        for name, column in self._columns.items():
+            values = self.get_column(name)
+            if isinstance(values, np.ndarray):
+                data['columns/' + name] = values
+                continue
+
+            present = [array for array in column if array is not None]
+            if len(set([(array.ndim, array.dtype.kind) for array in present])) > 1:
+                data['json/' + name] = np.array([json.dumps(None if array is None else array.tolist())
+                                                 for array in column], dtype=str)
+                continue
+
+            ndim = present[0].ndim
+            shapes = np.zeros((len(column), ndim), dtype=int)
+            for i, array in enumerate(column):
+                if array is not None:
+                    shapes[i] = array.shape
+            data['ragged/{}/values'.format(name)] = np.concatenate([array.ravel() for array in present])
+            data['ragged/{}/shapes'.format(name)] = shapes
+            data['ragged/{}/present'.format(name)] = np.array([array is not None for array in column])
+
+        with open(filename, 'wb') as f:
+            if compress:
+                np.savez_compressed(f, **data)
+            else:
+                np.savez(f, **data)
+
+    @classmethod
+    def load(cls, filename):
+        """
+        read the columns written by save
+
+        :param filename: file name
+        :return: ParsedOutputs
+        """
+        parsed_outputs = cls()
+
+        with np.load(filename) as f:
+            parsed_outputs.filenames = f['filenames'].tolist()
+            for error_filename, parser_name, message in zip(f['errors/filenames'].tolist(),
+                                                            f['errors/parsers'].tolist(),
+                                                            f['errors/messages'].tolist()):
+                parsed_outputs.errors[error_filename] = ParserError(parser_name, message)
+
+            for key in f.files:
+                if key.startswith('columns/'):
+                    parsed_outputs._columns[key[8:]] = list(f[key])
+                elif key.startswith('ragged/') and key.endswith('/values'):
+                    name = key[7:-7]
+                    values = f[key]
+                    column = []
+                    position = 0
+                    for shape, present in zip(f['ragged/{}/shapes'.format(name)],
+                                              f['ragged/{}/present'.format(name)]):
+                        if not present:
+                            column.append(None)
+                            continue
+                        shape = tuple([int(n) for n in shape])
+                        size = int(np.prod(shape))
+                        column.append(values[position:position + size].reshape(shape))
+                        position += size
+                    parsed_outputs._columns[name] = column
+                elif key.startswith('json/'):
+                    parsed_outputs._columns[key[5:]] = [None if value is None else np.array(value)
+                                                        for value in [json.loads(text) for text in f[key]]]
+
+        return parsed_outputs
+
+
+def parse_outputs(filenames, parser, parser_parameters=None, workers=None, filename=None, print_stats=True):
+    """
+    Parse a list of Q-Chem output files in a pool of processes. Errors found in an output
+    do not stop the parsing of the others: they are recorded as ParserError in the errors attribute
+    of the returned object
+
+    Example: energies of the first excited state of all the outputs of a directory
+        parsed_outputs = parse_outputs(glob.glob('outputs/*.out'), parser_rasci, workers=8,
+                                       parser_parameters={'fields': ['excited_states.total_energy']})
+        energies = parsed_outputs['excited_states/#0/total_energy']
+
+    :param filenames: list of output file names
+    :param parser: function to use to parse the outputs (e.g. parser_rasci, basic_cis)
+    :param parser_parameters: additional parameters that parser function may have
+    :param workers: number of processes (default: number of cores). If 1 the outputs are parsed in this process
+    :param filename: if present, write the parsed data to this file (see ParsedOutputs.save)
+    :param print_stats: if True, print the number of files and the throughput
+    :return: ParsedOutputs object
+    """
+    from multiprocessing import cpu_count
+
+    if parser_parameters is None:
+        parser_parameters = {}
+
+    if workers is None:
+        workers = cpu_count()
+
+    filenames = list(filenames)
+    parsed_outputs = ParsedOutputs()
+
+    def add_results(results):
+        total_bytes = 0
+        for output_filename, size, data, error in results:
+            total_bytes += size
+            if error is None:
+                parsed_outputs.append(output_filename, data)
+            else:
+                parsed_outputs.errors[output_filename] = error
+        return total_bytes
+
+    initial_time = time.time()
+    if workers == 1 or len(filenames) < 2:
+        total_bytes = add_results([_parse_file(output_filename, parser, parser_parameters)
+                                   for output_filename in filenames])
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+
+        workers = min(workers, len(filenames))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            total_bytes = add_results(executor.map(_parse_file, filenames,
+                                                   [parser] * len(filenames),
+                                                   [parser_parameters] * len(filenames),
+                                                   chunksize=max(len(filenames) // (workers * 4), 1)))
+    total_time = max(time.time() - initial_time, 1e-9)
+
+    parsed_outputs.stats = {'files': len(filenames),
+                            'errors': len(parsed_outputs.errors),
+                            'bytes': total_bytes,
+                            'time': total_time,
+                            'files_per_second': len(filenames) / total_time,
+                            'mb_per_second': total_bytes / total_time / 1024**2}
+
+    if print_stats:
+        print('Parsed {files} files ({errors} errors) in {time:.2f} s: '
+              '{files_per_second:.1f} files/s, {mb_per_second:.1f} MB/s'.format(**parsed_outputs.stats))
+
+    if filename is not None:
+        parsed_outputs.save(filename)
+
+    return parsed_outputs
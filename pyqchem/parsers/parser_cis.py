@@ -3,7 +3,16 @@ __author__ = 'Abel Carreras'
 import re
 from pyqchem.utils import search_bars, standardize_vector
 from pyqchem.errors import ParserError
-from pyqchem.parsers.support import read_basic_info, get_cis_occupations_list
+from pyqchem.parsers.support import read_basic_info, get_cis_occupations_list, OutputIndex
+from pyqchem.parsers.support import check_fields, is_field_requested
+
+
+# fields that can be requested to the parser
+_fields = ['scf_energy', 'excited_states',
+           'excited_states.total_energy', 'excited_states.total_energy_units',
+           'excited_states.excitation_energy', 'excited_states.excitation_energy_units',
+           'excited_states.multiplicity', 'excited_states.transition_moment', 'excited_states.strength',
+           'excited_states.configurations', 'interstate_properties']
 
 
 def _list_to_complex(list):
@@ -19,41 +28,54 @@ def _list_to_complex(list):
     return float(real) + opera * float(imag) * 1.j
 
 
-def basic_cis(output):
+def basic_cis(output, fields=None):
     """
     Parser for CIS/TD-DFT calculations
 
     :param output:
+    :param fields: list of fields to parse (None: all). Fields of the excited states can be selected
+                   as 'excited_states.<field>' (e.g. ['excited_states.excitation_energy'])
     :return:
     """
 
-    data_dict = {}
+    check_fields('basic_cis', fields, _fields)
 
-    # scf_energy
-    enum = output.find('Total energy in the final basis set')
-    try:
-        data_dict['scf_energy'] = float(output[enum:enum+100].split()[8])
-    except IndexError:
-        pass
+    def requested(field):
+        return is_field_requested(fields, field)
 
-    enum = output.find('Molecular Point Group')
-    basic_data = read_basic_info(output[enum:enum + 5000])
+    data_dict = {}
 
-    # CIS excited states
+    # scf_energy
+    if requested('scf_energy'):
+        enum = output.find('Total energy in the final basis set')
+        try:
+            data_dict['scf_energy'] = float(output[enum:enum+100].split()[8])
+        except IndexError:
+            pass
+
+    if requested('excited_states.configurations'):
+        enum = output.find('Molecular Point Group')
+        basic_data = read_basic_info(output[enum:enum + 5000])
+
+    # CIS excited states (also needed to label the states in SOC)
     # enum = output.find('CIS Excitation Energies')
-    try:
-        enum = list(re.finditer('CIS Excitation Energies', output))[-1].end()
-    except IndexError:
-        enum = list(re.finditer('TDDFT/TDA Excitation Energies', output))[-1].end()
+    enum = -1
+    if requested('excited_states') or requested('interstate_properties'):
+        try:
+            enum = list(re.finditer('CIS Excitation Energies', output))[-1].end()
+        except IndexError:
+            enum = list(re.finditer('TDDFT/TDA Excitation Energies', output))[-1].end()
 
     excited_states = []
     if enum > 0:
-        bars = search_bars(output, from_position=enum)
+        bars = search_bars(output, from_position=enum, n_bars=2)
 
         output_cis = output[bars[0]:bars[1]]
 
-        for m in re.finditer('Excited state ', output_cis):
-            state_cis_section = output_cis[m.end():]
+        # each state section ends at the beginning of the next state
+        index = OutputIndex(output_cis, ['Excited state '])
+        for ini_state, end_state in index.sections('Excited state '):
+            state_cis_section = output_cis[ini_state:end_state]
             state_cis_lines = state_cis_section.split('\n')
 
             exc_energy = float(state_cis_lines[0].split()[5])
@@ -70,7 +92,7 @@ def basic_cis(output):
                 strength = float(state_cis_lines[4].split()[2])
             except ValueError:
                 # old version of qchem (< 5.01)
-                state_cis_words = output_cis[m.end():].split()
+                state_cis_words = state_cis_section.split()
                 tot_energy_units = 'au'
                 mul = state_cis_words[13]
                 trans_mom = [float(mom) for mom in [state_cis_words[16],
@@ -79,7 +101,7 @@ def basic_cis(output):
                 strength = float(state_cis_words[24])
 
             transitions = []
-            for line in state_cis_lines[5:]:
+            for line in state_cis_lines[5:] if requested('excited_states.configurations') else []:
                 if line.find('-->') > 0:
                     origin = int(line[5:10].strip('(').strip(')'))
                     target = int(line[16:20].strip('(').strip(')'))
@@ -120,11 +142,17 @@ def basic_cis(output):
                                    'strength': strength,
                                    'configurations': transitions})
 
-    data_dict['excited_states'] = excited_states
+    if requested('excited_states'):
+        data_dict['excited_states'] = [dict([(name, value) for name, value in state.items()
+                                             if requested('excited_states.' + name)])
+                                       for state in excited_states]
 
     # Spin-Orbit coupling
-    initial = output.find('*********SPIN-ORBIT COUPLING JOB BEGINS HERE*********')
-    final = output.find('*********SOC CODE ENDS HERE*********')
+    if requested('interstate_properties'):
+        initial = output.find('*********SPIN-ORBIT COUPLING JOB BEGINS HERE*********')
+        final = output.find('*********SOC CODE ENDS HERE*********')
+    else:
+        initial = -1
 
     data_interstate = {}
     if initial > 0:
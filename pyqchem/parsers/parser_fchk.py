@@ -1,6 +1,13 @@
 import numpy as np
+import mmap
+import re
 from pyqchem.structure import Structure
 
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+
 
 def basis_format(basis_set_name,
                  atomic_numbers,
@@ -101,115 +108,194 @@ def _reformat_input(array):
 def vect_to_mat(vector):
     n = int(np.sqrt(0.25 + 2 * len(vector)) - 0.5)
 
-    k = 0
+    # vector contains the lower triangle of the matrix by rows
     matrix = np.zeros([n, n])
-    for i in range(n):
-        for j in range(0, i+1):
-            matrix[i, j] = vector[k + j]
-            matrix[j, i] = vector[k + j]
-        k += i+1
+    matrix[np.tril_indices(n)] = vector
+    matrix.T[np.tril_indices(n)] = vector
 
     return matrix
 
 
-def _get_all_nato(output):
-    import re
+def _get_fchk_index(lines):
+    """
+    get the position of all the sections of a FCHK file. Each header line is read only once
+
+    :param lines: list of lines of the FCHK file
+    :return: dictionary {section name: [(type, number of elements or scalar value, first line, last line), ...]}
+             (one element for each occurrence of the section in the file, lines are None for scalar values)
+    """
+
+    headers = []
+    # the first 2 lines contain the title and the type of calculation
+    for i, line in enumerate(lines[2:], start=2):
+        # data lines start with blank spaces
+        if len(line) > 40 and not line[0].isspace():
+            fields = line[40:].split()
+            if len(fields) == 3 and fields[1] == 'N=':
+                headers.append((i, line[:40].strip(), fields[0], True, int(fields[2])))
+            elif len(fields) == 2:
+                headers.append((i, line[:40].strip(), fields[0], False, fields[1]))
+
+    index = {}
+    for j, (i, name, item_type, array, value) in enumerate(headers):
+        if array:
+            end = headers[j+1][0] if j+1 < len(headers) else len(lines)
+            index.setdefault(name, []).append((item_type, value, i+1, end))
+        else:
+            index.setdefault(name, []).append((item_type, value, None, None))
+
+    return index
+
+
+def _read_fchk_section(lines, section):
+    """
+    decode the data of a section of the FCHK file
+
+    :param lines: list of lines of the FCHK file
+    :param section: section position as returned by _get_fchk_index
+    :return: numpy array or scalar value
+    """
+    item_types = {'I': int,
+                  'R': float}
+
+    item_type, value, first, last = section
+
+    if first is None:
+        return item_types[item_type](value)
+
+    # decode the full data block at once
+    return np.array(' '.join(lines[first:last]).split()[:value], dtype=item_types[item_type])
+
+
+def _format_array(array, as_arrays=False, square=False):
+    """
+    give the format of the electronic structure to a numeric array
+
+    :param array: numpy array
+    :param as_arrays: if True return a contiguous float64 numpy array, else (nested) lists
+    :param square: if True reshape the array as a square matrix
+    :return: array in the requested format
+    """
+    if square:
+        nbas = int(np.sqrt(len(array)))
+        array = array.reshape(nbas, nbas)
+
+    if as_arrays:
+        return np.ascontiguousarray(array, dtype=float)
+
+    return array.tolist()
+
+
+# fields of the electronic structure given as lists or numpy arrays (see parser_fchk)
+_array_fields = ['coefficients', 'mo_energies', 'overlap', 'nato_coefficients', 'nato_occupancies',
+                 'nato_coefficients_multi', 'nato_occupancies_multi']
+
+
+def _format_electronic_structure(electronic_structure, as_arrays=False):
+    """
+    give the format of parser_fchk (lists or numpy arrays) to an electronic structure dictionary
+    parsed with any format (data in the requested format is not copied)
+
+    :param electronic_structure: electronic structure dictionary
+    :param as_arrays: if True return float64 numpy arrays, else (nested) lists
+    :return: electronic structure dictionary
+    """
+    def convert(value):
+        if isinstance(value, dict):
+            return {key: convert(element) for key, element in value.items()}
+        if isinstance(value, list) and len(value) > 0 and isinstance(value[0], dict):
+            return [convert(element) for element in value]
+        if isinstance(value, np.ndarray) == as_arrays:
+            return value
+        return _format_array(np.asarray(value, dtype=float), as_arrays)
+
+    electronic_structure = dict(electronic_structure)
+    for field in _array_fields:
+        if field in electronic_structure:
+            electronic_structure[field] = convert(electronic_structure[field])
+
+    return electronic_structure
+
+
+def _get_all_nato(lines, index, as_arrays=False):
 
     nato_coefficients_list = []
     nato_occupancies_list = []
 
-    for m in re.finditer('Alpha NATO coefficients', output):
-        n_elements = int(output[m.end():m.end() + 100].replace('\n', ' ').split()[2])
-        nbas = int(np.sqrt(n_elements))
-        data = output[m.end(): m.end() + n_elements*50].split()[3:n_elements+3]
-        nato_coefficients_list.append({'alpha': np.array(data, dtype=float).reshape(nbas, nbas).tolist()})
+    for section in index.get('Alpha NATO coefficients', []):
+        data = _read_fchk_section(lines, section)
+        nato_coefficients_list.append({'alpha': _format_array(data, as_arrays, square=True)})
 
-    for m in re.finditer('Alpha Natural Orbital occupancies', output):
-        n_elements = int(output[m.end():m.end() + 100].replace('\n', ' ').split()[2])
-        data = output[m.end(): m.end() + n_elements*50].split()[3:n_elements+3]
-        nato_occupancies_list.append({'alpha': np.array(data, dtype=float).tolist()})
+    for section in index.get('Alpha Natural Orbital occupancies', []):
+        nato_occupancies_list.append({'alpha': _format_array(_read_fchk_section(lines, section), as_arrays)})
 
-    for i, m in enumerate(re.finditer('Beta NATO coefficients', output)):
-        n_elements = int(output[m.end():m.end() + 100].replace('\n', ' ').split()[2])
-        nbas = int(np.sqrt(n_elements))
-        data = output[m.end(): m.end() + n_elements*50].split()[3:n_elements+3]
-        nato_coefficients_list[i]['beta'] = np.array(data, dtype=float).reshape(nbas, nbas).tolist()
+    for i, section in enumerate(index.get('Beta NATO coefficients', [])):
+        data = _read_fchk_section(lines, section)
+        nato_coefficients_list[i]['beta'] = _format_array(data, as_arrays, square=True)
 
-    for i, m in enumerate(re.finditer('Beta Natural Orbital occupancies', output)):
-        n_elements = int(output[m.end():m.end() + 100].replace('\n', ' ').split()[2])
-        data = output[m.end(): m.end() + n_elements*50].split()[3:n_elements+3]
-        nato_occupancies_list[i]['beta'] = np.array(data, dtype=float).tolist()
+    for i, section in enumerate(index.get('Beta Natural Orbital occupancies', [])):
+        nato_occupancies_list[i]['beta'] = _format_array(_read_fchk_section(lines, section), as_arrays)
 
     return nato_coefficients_list, nato_occupancies_list
 
 
-def parser_fchk(output):
-
-    def convert_to_type(item_type, item):
-        item_types = {'I': int,
-                      'R': float}
+def parser_fchk(output, as_arrays=False):
+    """
+    Parser for FCHK files
 
-        if type(item) is list:
-            return [item_types[item_type](e) for e in item]
-        else:
-            return item_types[item_type](item)
+    :param output: FCHK file in plain text
+    :param as_arrays: if True, MO coefficients and energies, overlap and NATO data are returned as
+                      float64 numpy arrays instead of lists
+    :return: electronic structure dictionary
+    """
 
     key_list = ['Charge', 'Multiplicity', 'Number of alpha electrons', 'Number of beta electrons',
                 'Atomic numbers', 'Current cartesian coordinates', 'Shell types',
                 'Number of primitives per shell', 'Shell to atom map', 'Primitive exponents',
                 'Contraction coefficients', 'P(S=P) Contraction coefficients', 'Alpha MO coefficients',
-                'Beta MO coefficients', 'Coordinates of each shell', 'Overlap Matrix',
-                'Core Hamiltonian Matrix', 'Alpha Orbital Energies', 'Beta Orbital Energies',
-                'Total SCF Density', 'Alpha NATO coefficients', 'Beta NATO coefficients',
+                'Beta MO coefficients', 'Overlap Matrix', 'Alpha Orbital Energies', 'Beta Orbital Energies',
+                'Alpha NATO coefficients', 'Beta NATO coefficients',
                 'Alpha Natural Orbital occupancies', 'Beta Natural Orbital occupancies'
                 ]
 
-    basis_set = output.split('\n')[1].split()[-1]
-    words_output = output.replace('\n', ' ').split()
+    lines = output.split('\n')
+    basis_set = lines[1].split()[-1]
+
+    index = _get_fchk_index(lines)
 
+    # only the first occurrence of each section is used
     data = {}
-    nw = len(words_output)
     for key in key_list:
-        wc = len(key.split())
-        for i in range(nw):
-            word = ' '.join(words_output[i:i+wc])
-            if word == key:
-                item_type = words_output[i+wc]
-                if words_output[i + wc + 1] == 'N=':
-                    n_elements = int(words_output[i + wc + 2])
-                    data[word] = convert_to_type(item_type, words_output[i + wc + 3: i + wc + n_elements + 3])
-                else:
-                    data[word] = convert_to_type(item_type, words_output[i + wc + 1])
-                break
+        if key in index:
+            data[key] = _read_fchk_section(lines, index[key][0])
 
     bohr_to_angstrom = 0.529177249
 
     coordinates = np.array(data['Current cartesian coordinates']).reshape(-1, 3) * bohr_to_angstrom
     structure = Structure(coordinates=coordinates,
-                          atomic_numbers=data['Atomic numbers'],
+                          atomic_numbers=data['Atomic numbers'].tolist(),
                           multiplicity=data['Multiplicity'],
                           charge=data['Charge'])
 
     if not 'P(S=P) Contraction coefficients' in data:
-        data['P(S=P) Contraction coefficients'] = np.zeros_like(data['Contraction coefficients']).tolist()
+        data['P(S=P) Contraction coefficients'] = np.zeros_like(data['Contraction coefficients'])
 
     basis = basis_format(basis_set_name=basis_set,
                          atomic_numbers=structure.get_atomic_numbers(),
                          atomic_symbols=structure.get_symbols(),
-                         shell_type=data['Shell types'],
-                         n_primitives=data['Number of primitives per shell'],
-                         atom_map=data['Shell to atom map'],
-                         p_exponents=data['Primitive exponents'],
-                         c_coefficients=data['Contraction coefficients'],
-                         p_c_coefficients=data['P(S=P) Contraction coefficients'])
+                         shell_type=data['Shell types'].tolist(),
+                         n_primitives=data['Number of primitives per shell'].tolist(),
+                         atom_map=data['Shell to atom map'].tolist(),
+                         p_exponents=data['Primitive exponents'].tolist(),
+                         c_coefficients=data['Contraction coefficients'].tolist(),
+                         p_c_coefficients=data['P(S=P) Contraction coefficients'].tolist())
 
-    nbas = int(np.sqrt(len(data['Alpha MO coefficients'])))
-    mo_coeff = {'alpha': np.array(data['Alpha MO coefficients']).reshape(nbas, nbas).tolist()}
-    mo_energy = {'alpha': data['Alpha Orbital Energies']}
+    mo_coeff = {'alpha': _format_array(data['Alpha MO coefficients'], as_arrays, square=True)}
+    mo_energy = {'alpha': _format_array(data['Alpha Orbital Energies'], as_arrays)}
 
     if 'Beta MO coefficients' in data:
-        mo_coeff['beta'] = np.array(data['Beta MO coefficients']).reshape(nbas, nbas).tolist()
-        mo_energy['beta'] = data['Beta Orbital Energies']
+        mo_coeff['beta'] = _format_array(data['Beta MO coefficients'], as_arrays, square=True)
+        mo_energy['beta'] = _format_array(data['Beta Orbital Energies'], as_arrays)
 
     final_dict = {'structure': structure,
                   'basis': basis,
@@ -220,22 +306,234 @@ def parser_fchk(output):
                   }
 
     if 'Overlap Matrix' in data:
-        final_dict['overlap'] = vect_to_mat(data['Overlap Matrix']).tolist()
+        final_dict['overlap'] = _format_array(vect_to_mat(data['Overlap Matrix']), as_arrays)
 
     if 'Alpha NATO coefficients' in data:
-        final_dict['nato_coefficients'] = {'alpha': np.array(data['Alpha NATO coefficients']).reshape(nbas, nbas).tolist()}
-        final_dict['nato_occupancies'] = {'alpha': data['Alpha Natural Orbital occupancies']}
+        final_dict['nato_coefficients'] = {'alpha': _format_array(data['Alpha NATO coefficients'], as_arrays,
+                                                                  square=True)}
+        final_dict['nato_occupancies'] = {'alpha': _format_array(data['Alpha Natural Orbital occupancies'],
+                                                                 as_arrays)}
 
     if 'Beta NATO coefficients' in data:
         final_dict['nato_coefficients'].update({
-            'beta': np.array(data['Beta NATO coefficients']).reshape(nbas, nbas).tolist()})
-        final_dict['nato_occupancies'].update({'beta': data['Beta Natural Orbital occupancies']})
+            'beta': _format_array(data['Beta NATO coefficients'], as_arrays, square=True)})
+        final_dict['nato_occupancies'].update({'beta': _format_array(data['Beta Natural Orbital occupancies'],
+                                                                     as_arrays)})
 
     # check multiple NATO (may be improved)
     if 'Alpha NATO coefficients' in data:
-        nato_coefficients_list, nato_occupancies_list = _get_all_nato(output)
+        nato_coefficients_list, nato_occupancies_list = _get_all_nato(lines, index, as_arrays)
         if len(nato_occupancies_list) > 1:
             final_dict['nato_coefficients_multi'] = nato_coefficients_list
             final_dict['nato_occupancies_multi'] = nato_occupancies_list
 
     return final_dict
+
+
+class FchkFile(Mapping):
+    """
+    FCHK file read on demand. The file is mapped in memory and the position of each section is
+    indexed once when the object is created. The data of the sections is only decoded when accessed.
+
+    This object can be used as the dictionary returned by parser_fchk (same keys and format).
+    The file stays open until close is called. Use it as a context manager to close it when it is not needed:
+
+        with FchkFile('molecule.fchk') as electronic_structure:
+            coefficients = electronic_structure['coefficients']
+    """
+
+    _header = re.compile(br'^(\S[^\n]{39})[ \t]*([IRCL])[ \t]+(N=[ \t]*)?(\S+)[ \t\r]*$', re.MULTILINE)
+    _item_types = {'I': int, 'R': float}
+
+    def __init__(self, filename, as_arrays=False):
+        """
+        :param filename: FCHK file name
+        :param as_arrays: if True, MO coefficients and energies, overlap and NATO data are returned as
+                          float64 numpy arrays instead of lists
+        """
+        self._filename = filename
+        self._as_arrays = as_arrays
+        self._data = {}
+        self._open()
+
+    def _open(self):
+        self._file = open(self._filename, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        # the first 2 lines contain the title and the type of calculation
+        title_end = self._mmap.find(b'\n')
+        data_start = self._mmap.find(b'\n', title_end + 1) + 1
+        self._basis_set = self._mmap[title_end + 1:data_start].split()[-1].decode()
+
+        headers = []
+        for match in self._header.finditer(self._mmap, data_start):
+            name, item_type, array, value = match.groups()
+            headers.append((name.strip().decode(), item_type.decode(), array is not None,
+                            value.decode(), match.start(), match.end()))
+
+        # {section name: [(type, number of elements or scalar value, data start, data end), ...]}
+        self._index = {}
+        for j, (name, item_type, array, value, start, end) in enumerate(headers):
+            if array:
+                data_end = headers[j+1][4] if j+1 < len(headers) else len(self._mmap)
+                self._index.setdefault(name, []).append((item_type, int(value), end, data_end))
+            else:
+                self._index.setdefault(name, []).append((item_type, value, None, None))
+
+    def close(self):
+        """
+        close the file (the data of the sections that have not been read is not accessible anymore)
+        """
+        self._mmap.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    # the file is opened again when unpickled (e.g. when returned from other processes)
+    def __getstate__(self):
+        return {'_filename': self._filename, '_as_arrays': self._as_arrays, '_data': self._data}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._open()
+
+    @property
+    def filename(self):
+        return self._filename
+
+    def get_section_names(self):
+        """
+        get the names of all the sections in the FCHK file
+        """
+        return list(self._index.keys())
+
+    def get_section(self, name, occurrence=0):
+        """
+        decode the data of a section of the FCHK file
+
+        :param name: name of the section (e.g. 'Alpha MO coefficients')
+        :param occurrence: index of the occurrence of the section in the file (if repeated)
+        :return: numpy array or scalar value
+        """
+        item_type, value, start, end = self._index[name][occurrence]
+        dtype = self._item_types.get(item_type, str)
+
+        if start is None:
+            return dtype(value)
+
+        data = self._mmap[start:end].split()[:value]
+        if dtype is str:
+            return ''.join([word.decode() for word in data])
+
+        return np.array(data, dtype=dtype)
+
+    def _get_array(self, name, occurrence=0, square=False):
+        return _format_array(self.get_section(name, occurrence), self._as_arrays, square=square)
+
+    def _get_nato_list(self, name, square=False):
+        return [self._get_array(name, i, square=square) for i in range(len(self._index.get(name, [])))]
+
+    def keys(self):
+        keys = ['structure', 'basis', 'coefficients', 'mo_energies', 'number_of_electrons']
+
+        if 'Overlap Matrix' in self._index:
+            keys.append('overlap')
+
+        if 'Alpha NATO coefficients' in self._index:
+            keys += ['nato_coefficients', 'nato_occupancies']
+            if len(self._index.get('Alpha Natural Orbital occupancies', [])) > 1:
+                keys += ['nato_coefficients_multi', 'nato_occupancies_multi']
+
+        return keys
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def __getitem__(self, key):
+        if key not in self._data:
+            if key not in self.keys():
+                raise KeyError(key)
+            self._data[key] = getattr(self, '_get_' + key)()
+
+        return self._data[key]
+
+    def _get_structure(self):
+        bohr_to_angstrom = 0.529177249
+
+        coordinates = self.get_section('Current cartesian coordinates').reshape(-1, 3) * bohr_to_angstrom
+        return Structure(coordinates=coordinates,
+                         atomic_numbers=self.get_section('Atomic numbers').tolist(),
+                         multiplicity=self.get_section('Multiplicity'),
+                         charge=self.get_section('Charge'))
+
+    def _get_basis(self):
+        structure = self['structure']
+        c_coefficients = self.get_section('Contraction coefficients').tolist()
+        if 'P(S=P) Contraction coefficients' in self._index:
+            p_c_coefficients = self.get_section('P(S=P) Contraction coefficients').tolist()
+        else:
+            p_c_coefficients = np.zeros_like(c_coefficients).tolist()
+
+        return basis_format(basis_set_name=self._basis_set,
+                            atomic_numbers=structure.get_atomic_numbers(),
+                            atomic_symbols=structure.get_symbols(),
+                            shell_type=self.get_section('Shell types').tolist(),
+                            n_primitives=self.get_section('Number of primitives per shell').tolist(),
+                            atom_map=self.get_section('Shell to atom map').tolist(),
+                            p_exponents=self.get_section('Primitive exponents').tolist(),
+                            c_coefficients=c_coefficients,
+                            p_c_coefficients=p_c_coefficients)
+
+    def _get_coefficients(self):
+        coefficients = {'alpha': self._get_array('Alpha MO coefficients', square=True)}
+        if 'Beta MO coefficients' in self._index:
+            coefficients['beta'] = self._get_array('Beta MO coefficients', square=True)
+        return coefficients
+
+    def _get_mo_energies(self):
+        mo_energies = {'alpha': self._get_array('Alpha Orbital Energies')}
+        if 'Beta MO coefficients' in self._index:
+            mo_energies['beta'] = self._get_array('Beta Orbital Energies')
+        return mo_energies
+
+    def _get_number_of_electrons(self):
+        return {'alpha': self.get_section('Number of alpha electrons'),
+                'beta': self.get_section('Number of beta electrons')}
+
+    def _get_overlap(self):
+        return _format_array(vect_to_mat(self.get_section('Overlap Matrix')), self._as_arrays)
+
+    def _get_nato_coefficients(self):
+        nato_coefficients = {'alpha': self._get_array('Alpha NATO coefficients', square=True)}
+        if 'Beta NATO coefficients' in self._index:
+            nato_coefficients['beta'] = self._get_array('Beta NATO coefficients', square=True)
+        return nato_coefficients
+
+    def _get_nato_occupancies(self):
+        nato_occupancies = {'alpha': self._get_array('Alpha Natural Orbital occupancies')}
+        if 'Beta NATO coefficients' in self._index:
+            nato_occupancies['beta'] = self._get_array('Beta Natural Orbital occupancies')
+        return nato_occupancies
+
+    def _get_nato_coefficients_multi(self):
+        nato_coefficients_list = [{'alpha': coefficients} for coefficients
+                                  in self._get_nato_list('Alpha NATO coefficients', square=True)]
+        for nato_coefficients, coefficients in zip(nato_coefficients_list,
+                                                   self._get_nato_list('Beta NATO coefficients', square=True)):
+            nato_coefficients['beta'] = coefficients
+        return nato_coefficients_list
+
+    def _get_nato_occupancies_multi(self):
+        nato_occupancies_list = [{'alpha': occupancies} for occupancies
+                                 in self._get_nato_list('Alpha Natural Orbital occupancies')]
+        for nato_occupancies, occupancies in zip(nato_occupancies_list,
+                                                 self._get_nato_list('Beta Natural Orbital occupancies')):
+            nato_occupancies['beta'] = occupancies
+        return nato_occupancies_list
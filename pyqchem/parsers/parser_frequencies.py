@@ -2,6 +2,16 @@ import re
 import numpy as np
 
 
+def _get_line_values(section, label):
+    # values (up to 3) written after each occurrence of label until the end of the line
+    values = []
+    for m in re.finditer(label, section):
+        end_line = section.find('\n', m.end())
+        if end_line > -1:
+            values += section[m.end():end_line].split()[:3]
+    return values
+
+
 # parser for frequencies calculations
 def basic_frequencies(output, print_data=False):
     """
@@ -27,36 +37,12 @@ def basic_frequencies(output, print_data=False):
     n = output.find('VIBRATIONAL ANALYSIS')
     vibration_section = output[n:]
 
-    frequencies = []
-    force_constants = []
-    red_mass = []
-    ir_active = []
-    ir_intens = []
-    raman_active = []
-
-    for m in re.finditer('Frequency:', vibration_section):
-        end_line = vibration_section[m.end():].find('\n')
-        frequencies += vibration_section[m.end():m.end()+end_line].split()[:3]
-
-    for m in re.finditer('Force Cnst:', vibration_section):
-        end_line = vibration_section[m.end():].find('\n')
-        force_constants += vibration_section[m.end():m.end()+end_line].split()[:3]
-
-    for m in re.finditer('Red. Mass:', vibration_section):
-        end_line = vibration_section[m.end():].find('\n')
-        red_mass += vibration_section[m.end():m.end()+end_line].split()[:3]
-
-    for m in re.finditer('IR Active:', vibration_section):
-        end_line = vibration_section[m.end():].find('\n')
-        ir_active += vibration_section[m.end():m.end()+end_line].split()[:3]
-
-    for m in re.finditer('IR Intens:', vibration_section):
-        end_line = vibration_section[m.end():].find('\n')
-        ir_intens += vibration_section[m.end():m.end()+end_line].split()[:3]
-
-    for m in re.finditer('Raman Active:', vibration_section):
-        end_line = vibration_section[m.end():].find('\n')
-        raman_active += vibration_section[m.end():m.end()+end_line].split()[:3]
+    frequencies = _get_line_values(vibration_section, 'Frequency:')
+    force_constants = _get_line_values(vibration_section, 'Force Cnst:')
+    red_mass = _get_line_values(vibration_section, 'Red. Mass:')
+    ir_active = _get_line_values(vibration_section, 'IR Active:')
+    ir_intens = _get_line_values(vibration_section, 'IR Intens:')
+    raman_active = _get_line_values(vibration_section, 'Raman Active:')
 
     frequencies = [float(n) for n in frequencies]
     force_constants = [float(n) for n in force_constants]
@@ -66,11 +52,12 @@ def basic_frequencies(output, print_data=False):
     raman_active = [bool(n) for n in raman_active]
 
     displacements = []
-    for i, line in enumerate(vibration_section.split('\n')):
+    vibration_lines = vibration_section.split('\n')
+    for i, line in enumerate(vibration_lines):
         if 'X      Y      Z' in line:
             disp_coordinate = []
             for j in range(n_atoms):
-                coor_lines = vibration_section.split('\n')[j+ i+ 1]
+                coor_lines = vibration_lines[j+ i+ 1]
                 disp_coordinate.append(coor_lines.split()[1:])
 
             disp_coordinate = np.array(disp_coordinate, dtype=float)#.reshape(n_atoms, -1)
@@ -1,6 +1,6 @@
 from pyqchem.structure import Structure
+from pyqchem.parsers.support import OutputIndex
 import numpy as np
-import re
 
 
 def basic_optimization(output, print_data=False):
@@ -18,11 +18,11 @@ def basic_optimization(output, print_data=False):
 
     # Optimization steps
     optimization_steps = []
-    list_iterations = [l.end() for l in re.finditer('Optimization Cycle', output)]
-    for ini, fin in zip(list_iterations, list_iterations[1:] + [len(output)]):
+    index = OutputIndex(output, ['Optimization Cycle'])
+    for ini, fin in index.sections('Optimization Cycle'):
         step_section = output[ini:fin]
         enum = step_section.find('Coordinates (Angstroms)')
-        atoms_list = step_section[enum:].split('\n')[2:n_atoms+2]
+        atoms_list = step_section[enum:].split('\n', n_atoms+2)[2:n_atoms+2]
         coordinates_step = np.array([atom.split()[2:] for atom in atoms_list], dtype=float).tolist()
 
         step_molecule = Structure(coordinates=coordinates_step,
@@ -51,7 +51,7 @@ def basic_optimization(output, print_data=False):
 
         final_energy = float(output[ne+enum-200: enum].split()[3])
         optimization_section = output[enum:]
-        coordinates_section = optimization_section.split('\n')
+        coordinates_section = optimization_section.split('\n', 5+n_atoms)
         coordinates_final = [line.split()[2:5] for line in coordinates_section[5:5+n_atoms]]
 
         optimized_molecule = Structure(coordinates=np.array(coordinates_final, dtype=float).tolist(),
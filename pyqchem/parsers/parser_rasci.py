@@ -5,7 +5,27 @@ import operator
 from pyqchem.utils import standardize_vector
 from pyqchem.structure import Structure
 from pyqchem.utils import search_bars
-from pyqchem.parsers.support import read_basic_info, get_rasci_occupations_list
+from pyqchem.parsers.support import read_basic_info, get_rasci_occupations_list, OutputIndex
+from pyqchem.parsers.support import check_fields, is_field_requested, ConfigurationTable
+
+
+# fields that can be requested to the parser
+_fields = ['structure', 'scf_energy', 'rasci_dimensions', 'diabatization', 'excited_states',
+           'excited_states.total_energy', 'excited_states.total_energy_units',
+           'excited_states.excitation_energy', 'excited_states.excitation_energy_units',
+           'excited_states.multiplicity', 'excited_states.dipole_moment', 'excited_states.transition_moment',
+           'excited_states.dipole_moment_units', 'excited_states.oscillator_strength',
+           'excited_states.configurations', 'excited_states.contributions_fwn', 'interstate_properties']
+
+# markers of the output sections needed by each field
+_markers = {'structure': ['$molecule', '$end', 'Standard Nuclear Orientation'],
+            'scf_energy': ['SCF   energy in the final basis set'],
+            'rasci_dimensions': ['SCF   energy in the final basis set', 'RAS-CI Dimensions'],
+            'diabatization': ['$molecule', '$end', 'RASCI DIABATIZATION'],
+            'excited_states': ['RAS-CI total energy for state', '********'],
+            'excited_states.configurations': ['$molecule', '$end', 'Standard Nuclear Orientation',
+                                              'Molecular Point Group'],
+            'interstate_properties': ['Interstate Transition Properties']}
 
 
 def _read_simple_matrix(header, output, maxchar=10000, foot='-------'):
@@ -36,62 +56,11 @@ def _read_soc_matrix(lines, dimensions):
     return matrix
 
 
-def parser_rasci(output):
-    """
-    Parser for RAS-CI calculations
-    Include:
-    - Diabatization scheme data
-    - Structure
-    - Adiabatic states
-    - SOC
-
-    :param output:
-    :return:
-    """
-
-    data_dict = {}
-    # Molecule
-    n = output.find('$molecule')
-    n2 = output[n:].find('$end')
-
-    molecule_region = output[n:n+n2-1].replace('\t', ' ').split('\n')[1:]
-    charge, multiplicity = [int(num) for num in molecule_region[0].split()]
-    coordinates = [[float(l) for l in line.split()[1:4]] for line in molecule_region[1:]]
-    symbols = [line.split()[0].capitalize() for line in molecule_region[1:]]
-    n_atoms = len(symbols)
-
-    # structure
-    structure_input = Structure(coordinates=coordinates,
-                                symbols=symbols,
-                                charge=charge,
-                                multiplicity=multiplicity)
-
-    enum = output.find('Standard Nuclear Orientation')
-    section_structure = output[enum:enum + 200*structure_input.get_number_of_atoms()].split('\n')
-    section_structure = section_structure[3:structure_input.get_number_of_atoms()+3]
-    coordinates = [[float(num) for num in s.split()[2:]] for s in section_structure]
-
-    data_dict['structure'] = Structure(coordinates=coordinates,
-                                       symbols=symbols,
-                                       charge=charge,
-                                       multiplicity=multiplicity)
-
-    # basic info
-    enum = output.find('Molecular Point Group')
-    basic_data = read_basic_info(output[enum:enum + 5000])
-
-    # scf_energy
-    enum = output.find('SCF   energy in the final basis set')
-    scf_energy = float(output[enum:enum+100].split()[8])
-
-    data_dict['scf_energy'] = scf_energy
-    # total energy
-    # enum = output.find('Total energy in the final basis set')
-    # total_energy = float(output[enum:enum+100].split()[8])
-
+def _read_rasci_dimensions(output, index):
     # RASCI dimensions
-    ini_section = output.find('RAS-CI Dimensions')
-    end_section = search_bars(output, from_position=enum, bar_type='\*\*\*')[1]
+    enum = index.find('SCF   energy in the final basis set')
+    ini_section = index.find('RAS-CI Dimensions')
+    end_section = search_bars(output, from_position=enum, bar_type='\*\*\*', n_bars=2)[1]
     dimension_section = output[ini_section: end_section]
 
     enum = dimension_section.find('Doubly Occ')
@@ -121,10 +90,90 @@ def parser_rasci(output):
                         'hole_configurations': hole_conf,
                         'particle_configurations': particle_conf}
 
-    data_dict.update({'rasci_dimensions': rasci_dimensions})
+    return rasci_dimensions
+
+
+def parser_rasci(output, fields=None, configuration_table=False):
+    """
+    Parser for RAS-CI calculations
+    Include:
+    - Diabatization scheme data
+    - Structure
+    - Adiabatic states
+    - SOC
+
+    :param output:
+    :param fields: list of fields to parse (None: all). The sections of the output that are not needed
+                   are not read. Fields of the excited states can be selected as 'excited_states.<field>'
+                   (e.g. ['excited_states.total_energy', 'excited_states.transition_moment'])
+    :param configuration_table: if True the configurations of each state are returned as a ConfigurationTable
+                                (NumPy arrays) instead of a list of dictionaries
+    :return:
+    """
+
+    check_fields('parser_rasci', fields, _fields)
+
+    def requested(field):
+        return is_field_requested(fields, field)
+
+    data_dict = {}
+    markers = []
+    for field, field_markers in _markers.items():
+        if requested(field):
+            markers += [marker for marker in field_markers if marker not in markers]
+    index = OutputIndex(output, markers)
+
+    if requested('structure') or requested('diabatization') or requested('excited_states.configurations'):
+        # Molecule
+        n = index.find('$molecule')
+        n2 = index.find('$end', n)
+
+        molecule_region = output[n:n2-1].replace('\t', ' ').split('\n')[1:]
+        charge, multiplicity = [int(num) for num in molecule_region[0].split()]
+        coordinates = [[float(l) for l in line.split()[1:4]] for line in molecule_region[1:]]
+        symbols = [line.split()[0].capitalize() for line in molecule_region[1:]]
+        n_atoms = len(symbols)
+
+    if requested('structure') or requested('excited_states.configurations'):
+        # structure
+        structure_input = Structure(coordinates=coordinates,
+                                    symbols=symbols,
+                                    charge=charge,
+                                    multiplicity=multiplicity)
+
+        enum = index.find('Standard Nuclear Orientation')
+        section_structure = output[enum:enum + 200*structure_input.get_number_of_atoms()].split('\n')
+        section_structure = section_structure[3:structure_input.get_number_of_atoms()+3]
+        coordinates = [[float(num) for num in s.split()[2:]] for s in section_structure]
+
+        structure = Structure(coordinates=coordinates,
+                              symbols=symbols,
+                              charge=charge,
+                              multiplicity=multiplicity)
+
+        if requested('structure'):
+            data_dict['structure'] = structure
+
+    if requested('excited_states.configurations'):
+        # basic info
+        enum = index.find('Molecular Point Group')
+        basic_data = read_basic_info(output[enum:enum + 5000])
+
+    # scf_energy
+    if requested('scf_energy'):
+        enum = index.find('SCF   energy in the final basis set')
+        scf_energy = float(output[enum:enum+100].split()[8])
+
+        data_dict['scf_energy'] = scf_energy
+    # total energy
+    # enum = output.find('Total energy in the final basis set')
+    # total_energy = float(output[enum:enum+100].split()[8])
+
+    if requested('rasci_dimensions'):
+        data_dict.update({'rasci_dimensions': _read_rasci_dimensions(output, index)})
 
     # Diabatization scheme
-    done_diabat = bool(output.find('RASCI DIABATIZATION')+1)
+    done_diabat = requested('diabatization') and bool(index.find('RASCI DIABATIZATION')+1)
     if done_diabat:
         rot_matrix = _read_simple_matrix('showmatrix final adiabatic -> diabatic', output)[-1]
         adiabatic_matrix = _read_simple_matrix('showing H in adiabatic representation: NO coupling elements', output)[-1]
@@ -175,92 +224,122 @@ def parser_rasci(output):
                                       'mulliken_adiabatic': mulliken_adiabatic}
 
     # excited states data
-    excited_states = []
-    for m in re.finditer('RAS-CI total energy for state', output):
-        # print('ll found', m.start(), m.end())
-
-        section_state = output[m.end():m.end() + 10000]  # 10000: assumed to max of section
-        section_state = section_state[:section_state.find('********')]
-
-        enum = section_state.find('RAS-CI total energy for state')
-        section_state = section_state[:enum]
-
-        # energies
-        tot_energy = float(section_state.split()[1])
-        exc_energy_units = section_state.split()[4][1:-1]
-        exc_energy = float(section_state.split()[6])
-        state_multiplicity = section_state.split()[8] if section_state.split()[8] != ':' else section_state.split()[9]
-
-        # dipole moment
-        enum = section_state.find('Dipole Moment')
-        dipole_mom = [float(section_state[enum:].split()[2]) + 0.0,
-                      float(section_state[enum:].split()[4]) + 0.0,
-                      float(section_state[enum:].split()[6]) + 0.0]
-
-        # Transition moment
-        enum = section_state.find('Trans. Moment')
-        if enum > -1:
-            trans_mom = [float(section_state[enum:].split()[2]) + 0.0,
-                         float(section_state[enum:].split()[4]) + 0.0,
-                         float(section_state[enum:].split()[6]) + 0.0]
-            trans_mom = standardize_vector(trans_mom)
-            strength = float(section_state[enum:].split()[10])
-        else:
-            trans_mom = None
-            strength = None
-
-        # configurations table
-        enum = section_state.find('AMPLITUDE')
-        enum2 = section_state.find('Contributions')
-        section_table = section_state[enum: enum2].split('\n')[2:-2]
-
-        # ' HOLE  | ALPHA | BETA  | PART | AMPLITUDE'
-        table = []
-        for row in section_table:
-            table.append({'hole': row.split('|')[1].strip(),
-                          'alpha': row.split('|')[2].strip(),
-                          'beta': row.split('|')[3].strip(),
-                          'part': row.split('|')[4].strip(),
-                          'amplitude': float(row.split('|')[5]) + 0.0})
-            table[-1]['occupations'] = get_rasci_occupations_list(table[-1],
-                                                                  data_dict['structure'],
-                                                                  basic_data['n_basis_functions'])
-
-        table = sorted(table, key=operator.itemgetter('hole', 'alpha', 'beta', 'part'))
-
-        # Contributions RASCI wfn
-        contributions_section = section_state[enum2:]
-        contributions = {'active' : float(contributions_section.split()[4]),
-                         'hole': float(contributions_section.split()[6]),
-                         'part': float(contributions_section.split()[8])}
-
-        # complete dictionary
-        tot_energy_units = 'au'
-        excited_states.append({'total_energy': tot_energy,
-                               'total_energy_units': tot_energy_units,
-                               'excitation_energy': exc_energy,
-                               'excitation_energy_units': exc_energy_units,
-                               'multiplicity': state_multiplicity,
-                               'dipole_moment': dipole_mom,
-                               'transition_moment': trans_mom,
-                               'dipole_moment_units': 'ua',
-                               'oscillator_strength': strength,
-                               'configurations': table,
-                               'contributions_fwn': contributions})
-
-    data_dict.update({'excited_states': excited_states})
+    if requested('excited_states'):
+        excited_states = []
+        occupations_list = {}
+        for ini_state, end_state in index.sections('RAS-CI total energy for state', end_markers=['********']):
+
+            section_state = output[ini_state:end_state]
+
+            # header of the state (before the configurations table)
+            enum = section_state.find('AMPLITUDE')
+            section_header = section_state[:enum]
+            header_words = section_header.split()
+
+            # energies
+            tot_energy = float(header_words[1])
+            exc_energy_units = header_words[4][1:-1]
+            exc_energy = float(header_words[6])
+            state_multiplicity = header_words[8] if header_words[8] != ':' else header_words[9]
+
+            # dipole moment
+            dipole_words = section_header[section_header.find('Dipole Moment'):].split()
+            dipole_mom = [float(dipole_words[2]) + 0.0,
+                          float(dipole_words[4]) + 0.0,
+                          float(dipole_words[6]) + 0.0]
+
+            # Transition moment
+            enum_trans = section_header.find('Trans. Moment')
+            if enum_trans > -1:
+                trans_words = section_header[enum_trans:].split()
+                trans_mom = [float(trans_words[2]) + 0.0,
+                             float(trans_words[4]) + 0.0,
+                             float(trans_words[6]) + 0.0]
+                trans_mom = standardize_vector(trans_mom)
+                strength = float(trans_words[10])
+            else:
+                trans_mom = None
+                strength = None
+
+            # configurations table
+            enum2 = section_state.find('Contributions')
+            if requested('excited_states.configurations'):
+                section_table = section_state[enum: enum2].split('\n')[2:-2]
+            else:
+                section_table = []
+
+            # ' HOLE  | ALPHA | BETA  | PART | AMPLITUDE'
+            rows = []
+            for row in section_table:
+                cells = row.split('|')
+                rows.append((cells[1].strip(), cells[2].strip(), cells[3].strip(), cells[4].strip(),
+                             float(cells[5]) + 0.0))
+
+            rows = sorted(rows, key=operator.itemgetter(0, 1, 2, 3))
+
+            # the same configurations appear in all the states
+            for row in rows:
+                if row[:4] not in occupations_list:
+                    configuration = {'hole': row[0], 'alpha': row[1], 'beta': row[2], 'part': row[3]}
+                    occupations_list[row[:4]] = get_rasci_occupations_list(configuration,
+                                                                           structure,
+                                                                           basic_data['n_basis_functions'])
+
+            if configuration_table:
+                configurations = ConfigurationTable([row[0] for row in rows],
+                                                    [row[1] for row in rows],
+                                                    [row[2] for row in rows],
+                                                    [row[3] for row in rows],
+                                                    [row[4] for row in rows],
+                                                    [occupations_list[row[:4]]['alpha'] for row in rows],
+                                                    [occupations_list[row[:4]]['beta'] for row in rows])
+            else:
+                # list of dictionaries built directly (without the arrays of the table)
+                configurations = [{'hole': row[0], 'alpha': row[1], 'beta': row[2], 'part': row[3],
+                                   'amplitude': row[4],
+                                   'occupations': {'alpha': list(occupations_list[row[:4]]['alpha']),
+                                                   'beta': list(occupations_list[row[:4]]['beta'])}}
+                                  for row in rows]
+
+            # Contributions RASCI wfn
+            if requested('excited_states.contributions_fwn'):
+                contributions_words = section_state[enum2:].split()
+                contributions = {'active' : float(contributions_words[4]),
+                                 'hole': float(contributions_words[6]),
+                                 'part': float(contributions_words[8])}
+            else:
+                contributions = None
+
+            # complete dictionary
+            tot_energy_units = 'au'
+            state = {'total_energy': tot_energy,
+                     'total_energy_units': tot_energy_units,
+                     'excitation_energy': exc_energy,
+                     'excitation_energy_units': exc_energy_units,
+                     'multiplicity': state_multiplicity,
+                     'dipole_moment': dipole_mom,
+                     'transition_moment': trans_mom,
+                     'dipole_moment_units': 'ua',
+                     'oscillator_strength': strength,
+                     'configurations': configurations,
+                     'contributions_fwn': contributions}
+
+            excited_states.append(dict([(name, value) for name, value in state.items()
+                                        if requested('excited_states.' + name)]))
+
+        data_dict.update({'excited_states': excited_states})
 
     # Interstate transition properties
-    done_interstate = bool(output.find('Interstate Transition Properties')+1)
+    done_interstate = requested('interstate_properties') and bool(index.find('Interstate Transition Properties')+1)
     if done_interstate:
-        ini_section = output.find('Interstate Transition Properties')
-        end_section = search_bars(output, from_position=ini_section)[1]
+        ini_section = index.find('Interstate Transition Properties')
+        end_section = search_bars(output, from_position=ini_section, n_bars=2)[1]
         interstate_section = output[ini_section: end_section]
 
         interstate_dict = {}
         for m in re.finditer('State A: Root', interstate_section):
-            section_pair = interstate_section[m.start():m.start() + 10000]
-            section_pair = section_pair[:section_pair.find('********')]
+            end_pair = interstate_section.find('********', m.start())
+            section_pair = interstate_section[m.start():end_pair if end_pair > -1 else None]
             # print(section_pair)
             lines = section_pair.split('\n')
 
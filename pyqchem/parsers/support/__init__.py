@@ -1,6 +1,149 @@
 import numpy as np
 import re
+from bisect import bisect_left
 from pyqchem.utils import get_occupied_electrons
+from pyqchem.errors import ParserError
+from pyqchem.parsers.support.configurations import ConfigurationTable
+
+
+class OutputIndex:
+    """
+    Positions of a list of markers (plain text) in a Q-Chem output. The positions of all the markers
+    are located once when the index is created and then used to delimit the sections of the output
+    without searching (or copying) the output again.
+    """
+
+    def __init__(self, output, markers):
+        """
+        :param output: Q-Chem output
+        :param markers: list of markers
+        """
+
+        # str.find is much faster than a regular expression alternation of all the markers
+        self._output = output
+        self._positions = {}
+        for marker in markers:
+            positions = []
+            n = output.find(marker)
+            while n > -1:
+                positions.append(n)
+                n = output.find(marker, n + len(marker))
+            self._positions[marker] = positions
+
+    @property
+    def output(self):
+        return self._output
+
+    def positions(self, marker, start=0, end=None):
+        """
+        get the positions of all the occurrences of a marker
+
+        :param marker: marker
+        :param start: initial position of the search
+        :param end: final position of the search (None: end of the output)
+        :return: list of positions (start of the marker)
+        """
+        positions = self._positions[marker]
+        i = bisect_left(positions, start)
+        j = len(positions) if end is None else bisect_left(positions, end)
+        return positions[i:j]
+
+    def find(self, marker, start=0, end=None):
+        """
+        equivalent to str.find for a marker
+
+        :return: position of the first occurrence of the marker after start or -1 if not found
+        """
+        positions = self._positions[marker]
+        i = bisect_left(positions, start)
+        if i < len(positions) and (end is None or positions[i] + len(marker) <= end):
+            return positions[i]
+        return -1
+
+    def sections(self, marker, end_markers=(), start=0, end=None):
+        """
+        get the limits of the sections that start with a marker. Each section ends at the next
+        occurrence of the marker or one of end_markers
+
+        :param marker: marker of the beginning of the section
+        :param end_markers: list of markers of the end of the section
+        :param start: initial position of the search
+        :param end: final position of the search (None: end of the output)
+        :return: list of (start, end) of each section (start of the section is the end of marker)
+        """
+        if end is None:
+            end = len(self._output)
+
+        sections = []
+        for position in self.positions(marker, start, end):
+            section_start = position + len(marker)
+            section_end = end
+            for end_marker in (marker,) + tuple(end_markers):
+                end_position = self.find(end_marker, section_start, end)
+                if -1 < end_position < section_end:
+                    section_end = end_position
+            sections.append((section_start, section_end))
+
+        return sections
+
+
+def check_fields(parser_name, fields, available_fields):
+    """
+    check that the requested fields can be produced by the parser
+
+    :param parser_name: name of the parser (for the error message)
+    :param fields: list of requested fields (None: all fields)
+    :param available_fields: list of fields of the parser. Fields of the elements of a list are written
+                             as 'list_field.element_field' (e.g. 'excited_states.total_energy')
+    """
+    if fields is None:
+        return
+
+    for field in fields:
+        if field not in available_fields:
+            raise ParserError(parser_name, 'Unknown field "{}", available fields: {}'.format(field, ', '.join(available_fields)))
+
+
+def is_field_requested(fields, field):
+    """
+    check if a field (or any of its sub-fields) is requested
+
+    :param fields: list of requested fields (None: all fields)
+    :param field: field name
+    :return: True if the field has to be parsed
+    """
+    if fields is None:
+        return True
+
+    for requested in fields:
+        if requested == field or requested.startswith(field + '.') or field.startswith(requested + '.'):
+            return True
+    return False
+
+
+def select_fields(parsed_data, fields):
+    """
+    get the requested fields from the data returned by a parser with all the fields
+
+    :param parsed_data: dictionary with the parsed data
+    :param fields: list of requested fields (None: all fields)
+    :return: dictionary with the requested fields
+    """
+    if fields is None:
+        return parsed_data
+
+    selected_data = {}
+    for field, value in parsed_data.items():
+        if not is_field_requested(fields, field):
+            continue
+        if field in fields or not isinstance(value, list):
+            selected_data[field] = value
+        else:
+            selected_data[field] = [dict([(name, element_value) for name, element_value in element.items()
+                                          if is_field_requested(fields, field + '.' + name)])
+                                    for element in value]
+
+    return selected_data
 
 
 def read_basic_info(output):
@@ -59,13 +202,13 @@ def get_rasci_occupations_list(configuration, structure, total_orbitals):
     vector_beta = [1] * occupied_orbitals + [int(c) for c in configuration['beta']] + [0] * n_extra
 
     if configuration['hole'] is not '':
-        if np.sum(vector_alpha) > np.sum(vector_beta):
+        if sum(vector_alpha) > sum(vector_beta):
             vector_alpha[int(configuration['hole']) - 1] = 0
         else:
             vector_beta[int(configuration['hole']) - 1] = 0
 
     if configuration['part'] is not '':
-        if np.sum(vector_alpha) < np.sum(vector_beta):
+        if sum(vector_alpha) < sum(vector_beta):
             vector_alpha[int(configuration['part']) - 1] = 1
         else:
             vector_beta[int(configuration['part']) - 1] = 1
@@ -0,0 +1,166 @@
+import numpy as np
+
+
+_BITS = np.arange(64, dtype=np.uint64)
+
+
+def _pack_occupations(occupations):
+    """
+    pack the occupations (0/1) of the orbitals in bitsets of 64 orbitals (uint64 words)
+
+    :param occupations: array of occupations (n_configurations x n_orbitals)
+    :return: array of words (n_configurations x n_words)
+    """
+    occupations = np.asarray(occupations, dtype=np.uint64)
+    n_configurations, n_orbitals = occupations.shape
+    n_words = (n_orbitals + 63) // 64
+
+    padded = np.zeros((n_configurations, n_words * 64), dtype=np.uint64)
+    padded[:, :n_orbitals] = occupations
+
+    return np.bitwise_or.reduce(padded.reshape(n_configurations, n_words, 64) << _BITS, axis=2)
+
+
+def _unpack_occupations(words, n_orbitals):
+    """
+    inverse of _pack_occupations
+
+    :return: array of occupations (n_configurations x n_orbitals)
+    """
+    bits = (words[:, :, None] >> _BITS) & np.uint64(1)
+    return bits.reshape(len(words), -1)[:, :n_orbitals].astype(np.uint8)
+
+
+class ConfigurationTable(object):
+    """
+    Table of the configurations of a RAS-CI state stored in NumPy arrays (parser_rasci with
+    configuration_table=True):
+
+    - hole, part: index of the hole/particle orbital (0: no hole/particle)
+    - alpha, beta: occupations of the active orbitals (strings)
+    - amplitude: amplitudes
+    - occupations_alpha, occupations_beta: occupations of all the orbitals packed in bitsets of
+      64 orbitals (uint64 words)
+
+    The table can also be used as the list of configuration dictionaries:
+    {'hole': '', 'alpha': '1100', 'beta': '1010', 'part': '', 'amplitude': 0.68,
+     'occupations': {'alpha': [1, 1, 0, ...], 'beta': [1, 0, 1, ...]}}
+    The dictionaries are created when they are accessed, so modifying them does not modify the table
+    (use to_list to get a list of dictionaries that can be modified or serialized).
+    """
+
+    def __init__(self, hole, alpha, beta, part, amplitude, occupations_alpha, occupations_beta):
+        """
+        :param hole: list of hole orbitals ('' if no hole)
+        :param alpha: list of occupations of the alpha active orbitals (e.g. '1100')
+        :param beta: list of occupations of the beta active orbitals
+        :param part: list of particle orbitals ('' if no particle)
+        :param amplitude: list of amplitudes
+        :param occupations_alpha: occupations of the alpha orbitals (n_configurations x n_orbitals)
+        :param occupations_beta: occupations of the beta orbitals (n_configurations x n_orbitals)
+        """
+        n_configurations = len(amplitude)
+        occupations_alpha = np.asarray(occupations_alpha, dtype=np.uint8).reshape(n_configurations, -1) \
+            if n_configurations > 0 else np.zeros((0, 0), dtype=np.uint8)
+        occupations_beta = np.asarray(occupations_beta, dtype=np.uint8).reshape(n_configurations, -1) \
+            if n_configurations > 0 else np.zeros((0, 0), dtype=np.uint8)
+
+        self.hole = np.array([int(h) if h != '' else 0 for h in hole], dtype=np.int32)
+        self.part = np.array([int(p) if p != '' else 0 for p in part], dtype=np.int32)
+        self.alpha = np.array(alpha, dtype=bytes).reshape(n_configurations)
+        self.beta = np.array(beta, dtype=bytes).reshape(n_configurations)
+        self.amplitude = np.array(amplitude, dtype=float).reshape(n_configurations)
+        self.n_orbitals = occupations_alpha.shape[1]
+        self.occupations_alpha = _pack_occupations(occupations_alpha)
+        self.occupations_beta = _pack_occupations(occupations_beta)
+
+    @classmethod
+    def from_list(cls, configurations):
+        """
+        create the table from a list of configuration dictionaries
+
+        :param configurations: list of configurations (dictionaries)
+        :return: ConfigurationTable
+        """
+        return cls([c['hole'] for c in configurations],
+                   [c['alpha'] for c in configurations],
+                   [c['beta'] for c in configurations],
+                   [c['part'] for c in configurations],
+                   [c['amplitude'] for c in configurations],
+                   [c['occupations']['alpha'] for c in configurations],
+                   [c['occupations']['beta'] for c in configurations])
+
+    def get_occupations(self, spin='alpha'):
+        """
+        get the occupations of all the orbitals
+
+        :param spin: 'alpha' or 'beta'
+        :return: array of occupations (n_configurations x n_orbitals)
+        """
+        words = self.occupations_alpha if spin == 'alpha' else self.occupations_beta
+        return _unpack_occupations(words, self.n_orbitals)
+
+    @property
+    def nbytes(self):
+        """
+        memory used by the arrays of the table in bytes
+        """
+        return sum([array.nbytes for array in [self.hole, self.part, self.alpha, self.beta, self.amplitude,
+                                                self.occupations_alpha, self.occupations_beta]])
+
+    def to_list(self):
+        """
+        :return: list of configuration dictionaries
+        """
+        return [self[i] for i in range(len(self))]
+
+    def _subset(self, index):
+        subset = self.__class__.__new__(self.__class__)
+        subset.__dict__.update(self.__dict__)
+        for name in ['hole', 'part', 'alpha', 'beta', 'amplitude', 'occupations_alpha', 'occupations_beta']:
+            setattr(subset, name, getattr(self, name)[index])
+        return subset
+
+    def __len__(self):
+        return len(self.amplitude)
+
+    def __getitem__(self, index):
+        if not isinstance(index, (int, np.integer)):
+            return self._subset(index)
+
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('configuration index out of range')
+
+        occupations_alpha = _unpack_occupations(self.occupations_alpha[index:index+1], self.n_orbitals)[0]
+        occupations_beta = _unpack_occupations(self.occupations_beta[index:index+1], self.n_orbitals)[0]
+
+        return {'hole': str(self.hole[index]) if self.hole[index] != 0 else '',
+                'alpha': self.alpha[index].decode(),
+                'beta': self.beta[index].decode(),
+                'part': str(self.part[index]) if self.part[index] != 0 else '',
+                'amplitude': float(self.amplitude[index]),
+                'occupations': {'alpha': occupations_alpha.tolist(),
+                                'beta': occupations_beta.tolist()}}
+
+    def __delitem__(self, index):
+        keep = np.ones(len(self), dtype=bool)
+        keep[index] = False
+        subset = self._subset(keep)
+        self.__dict__.update(subset.__dict__)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def __eq__(self, other):
+        if isinstance(other, ConfigurationTable):
+            other = other.to_list()
+        return self.to_list() == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return '<ConfigurationTable: {} configurations, {} orbitals>'.format(len(self), self.n_orbitals)
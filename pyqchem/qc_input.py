@@ -5,6 +5,16 @@ import hashlib, json
 import warnings
 from pyqchem.errors import QchemInputWarning, QchemInputError
 
+# keywords that do not affect the results (ignored in the hash)
+_hash_ignored_keywords = ['_mem_total', '_mem_static', '_gui', '_set_iter', '_max_scf_cycles',
+                          '_geom_opt_max_cycles', '_max_cis_cycles']
+
+
+def _read_only_array(array):
+    array = np.array(array, dtype=float)
+    array.flags.writeable = False
+    return array
+
 
 class QchemInput:
     """
@@ -152,21 +162,50 @@ class QchemInput:
         else:
             self._ras_srdft = False
 
+    def __setattr__(self, name, value):
+        # any change of the input invalidates the stored hash. The values are stored as private copies
+        # (guess orbitals as read-only arrays) so the input can only change through assignments
+        self.__dict__.pop('_hash_cache', None)
+        if name == '_mo_coefficients' and value is not None:
+            value = {spin: _read_only_array(coefficients) for spin, coefficients in value.items()}
+        elif isinstance(value, (dict, list)):
+            value = deepcopy(value)
+        object.__setattr__(self, name, value)
+
+    def __setstate__(self, state):
+        # copies (deepcopy, pickle) also keep private read-only values
+        for name, value in state.items():
+            if name != '_hash_cache':
+                setattr(self, name, value)
+
     def __hash__(self):
 
+        # the hash is stored and only recalculated if the input (or the molecule) changes
+        molecule_hash = hash(self._molecule)
+        hash_cache = self.__dict__.get('_hash_cache')
+        if hash_cache is not None and hash_cache[0] == molecule_hash:
+            return hash_cache[1]
+
         # take all keywords defined in input
         keywords = dict(self.__dict__)
+        keywords.pop('_hash_cache', None)
 
         # remove keywords that not affect the results (these keywords will be ignored in hash)
-        for key in ['_mem_total', '_mem_static', '_gui', '_set_iter', '_max_scf_cycles',
-                    '_geom_opt_max_cycles', '_max_cis_cycles']:
+        for key in _hash_ignored_keywords:
             keywords.pop(key, None)
 
         # Change molecule object by molecule coordinates (Structure class too complex for JSON)
-        keywords['_molecule'] = hash(keywords['_molecule'])
+        keywords['_molecule'] = molecule_hash
+
+        # guess orbitals are hashed from the raw data (faster than JSON)
+        if keywords.get('_mo_coefficients') is not None:
+            keywords['_mo_coefficients'] = {spin: hashlib.md5(coefficients).hexdigest()
+                                            for spin, coefficients in keywords['_mo_coefficients'].items()}
 
         digest = hashlib.md5(json.dumps(keywords, sort_keys=True).encode()).hexdigest()
-        return int(digest, 16)
+
+        self.__dict__['_hash_cache'] = (molecule_hash, int(digest, 16))
+        return self.__dict__['_hash_cache'][1]
 
     def get_txt(self):
         """
@@ -434,7 +473,8 @@ class QchemInput:
     # Access to properties (only a reduced set should be accessible/editable)
     @property
     def mo_coefficients(self):
-        return self._mo_coefficients
+        # the guess orbitals are read-only arrays (set a new guess with update_input)
+        return dict(self._mo_coefficients) if self._mo_coefficients is not None else None
 
     @property
     def gui(self):
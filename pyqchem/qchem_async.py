@@ -0,0 +1,140 @@
+import os
+import signal
+import shutil
+import asyncio
+from pyqchem.qchem_core import get_qchem_environment, get_qchem_binary, create_work_dir
+from pyqchem.qchem_core import _check_stored_calculation, _write_input_files, _process_output
+
+
+def _kill_process_group(process):
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+async def alocal_run(input_file_name, work_dir, fchk_file, use_mpi=False, processors=1):
+    """
+    Run Q-Chem locally as an asyncio subprocess.
+    If the task is cancelled the full Q-Chem process tree is killed
+
+    :param input_file_name: Q-Chem input file in plain text format
+    :param work_dir:  Scratch directory where calculation run
+    :param fchk_file: filename of fchk
+    :param use_mpi: use mpi instead of openmp
+
+    :return: output, err: Q-Chem standard output and standard error
+    """
+
+    environment = get_qchem_environment(fchk_file, use_mpi=use_mpi, processors=processors)
+    binary = get_qchem_binary(environment)
+
+    # run in a new session to be able to kill all the processes created by Q-Chem
+    qchem_process = await asyncio.create_subprocess_exec(binary,
+                                                         os.path.join(work_dir, input_file_name),
+                                                         work_dir,
+                                                         stdin=asyncio.subprocess.DEVNULL,
+                                                         stdout=asyncio.subprocess.PIPE,
+                                                         stderr=asyncio.subprocess.PIPE,
+                                                         cwd=work_dir,
+                                                         env=environment,
+                                                         start_new_session=True)
+
+    try:
+        output, err = await qchem_process.communicate()
+    except asyncio.CancelledError:
+        _kill_process_group(qchem_process)
+        await qchem_process.wait()
+        raise
+
+    return output.decode(), err.decode()
+
+
+async def aget_output_from_qchem(input_qchem,
+                                 processors=1,
+                                 use_mpi=False,
+                                 scratch=None,
+                                 read_fchk=False,
+                                 parser=None,
+                                 parser_parameters=None,
+                                 force_recalculation=False,
+                                 fchk_only=False,
+                                 store_full_output=False,
+                                 keep_scratch=False,
+                                 semaphore=None,
+                                 fchk_file=None,
+                                 as_arrays=False):
+    """
+    asyncio version of get_output_from_qchem. Runs qchem and returns the output in the same format
+    as get_output_from_qchem. The parsers are executed in the default executor of the event loop
+    to not block other tasks.
+
+    :param input_qchem: QcInput object containing the Q-Chem input
+    :param processors: number of threads/processors to use in the calculation
+    :param use_mpi: If False use OpenMP (threads) else use MPI (processors)
+    :param scratch: Full Q-Chem scratch directory path. If None read from $QCSCRATCH
+    :param read_fchk: if True, generate and parse the FCHK file containing the electronic structure
+    :param parser: function to use to parse the Q-Chem output
+    :param parser_parameters: additional parameters that parser function may have
+    :param force_recalculation: Force to recalculate even identical calculation has already performed
+    :param fchk_only: If true, returns only the electronic structure data parsed from FCHK file
+    :param keep_scratch: If True, do not remove the work directory of the calculation from scratch
+    :param semaphore: asyncio.Semaphore shared between calls to bound the number of concurrent Q-Chem processes
+    :param fchk_file: if present (and read_fchk is True), the FCHK file is kept in this path and the electronic
+                      structure is returned as a FchkFile object that reads the data on demand. The FchkFile
+                      keeps the file open: close it (or use it in a with statement) when it is not needed
+    :param as_arrays: if True, MO coefficients and energies, overlap and NATO data of the electronic structure
+                      are returned as float64 numpy arrays instead of lists (see parser_fchk)
+
+    :return: output [, fchk_dict]
+    """
+
+    if scratch is None:
+        scratch = os.environ['QCSCRATCH']
+
+    # check if parameters is None
+    if parser_parameters is None:
+        parser_parameters = {}
+
+    cached_output, force_recalculation, (output, err) = _check_stored_calculation(
+        input_qchem, read_fchk=read_fchk, parser=parser, parser_parameters=parser_parameters,
+        force_recalculation=force_recalculation, fchk_only=fchk_only, store_full_output=store_full_output,
+        fchk_file=fchk_file, as_arrays=as_arrays)
+    if cached_output is not None:
+        return cached_output
+
+    work_dir, job_id = create_work_dir(scratch)
+
+    try:
+        temp_filename, fchk_filename = _write_input_files(input_qchem, work_dir, job_id)
+
+        # Q-Chem calculation
+        if output is None or force_recalculation is True:
+            if semaphore is None:
+                output, err = await alocal_run(temp_filename, work_dir, fchk_filename,
+                                               use_mpi=use_mpi, processors=processors)
+            else:
+                async with semaphore:
+                    output, err = await alocal_run(temp_filename, work_dir, fchk_filename,
+                                                   use_mpi=use_mpi, processors=processors)
+
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(None, lambda: _process_output(input_qchem, output, err,
+                                                                     work_dir, fchk_filename,
+                                                                     read_fchk=read_fchk,
+                                                                     parser=parser,
+                                                                     parser_parameters=parser_parameters,
+                                                                     force_recalculation=force_recalculation,
+                                                                     store_full_output=store_full_output,
+                                                                     fchk_file=fchk_file,
+                                                                     as_arrays=as_arrays))
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            # the thread cannot be stopped: wait until it has finished using the work directory
+            await asyncio.wait([future])
+            raise
+
+    finally:
+        if not keep_scratch:
+            shutil.rmtree(work_dir, ignore_errors=True)
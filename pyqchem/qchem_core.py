@@ -2,34 +2,83 @@ import os
 from subprocess import Popen, PIPE
 import numpy as np
 import hashlib
-import pickle
+import re
 import warnings
+import shutil
+import signal
+import threading
+import uuid
 from pyqchem.qc_input import QchemInput
+from pyqchem.output_stream import OutputStream
+from pyqchem.cache import CalculationData
 from pyqchem.errors import ParserError, OutputError
 
 
+def _get_calculation_data_directory(filename):
+    return os.path.splitext(filename)[0] + '.cache'
+
+
 __calculation_data_filename__ = 'calculation_data.pkl'
-try:
-    with open(__calculation_data_filename__, 'rb') as input:
-        calculation_data = pickle.load(input)
-        print('Loaded data from {}'.format(__calculation_data_filename__))
-except IOError:
-    calculation_data = {}
+__calculation_data_policy__ = {}
+__calculation_data_lock__ = threading.RLock()
+calculation_data = CalculationData(_get_calculation_data_directory(__calculation_data_filename__),
+                                   legacy_filename=__calculation_data_filename__)
 
 
-def redefine_calculation_data_filename(filename):
+def redefine_calculation_data_filename(filename, directory=None):
+    """
+    Set the file used to store the calculation data. The data is stored in a directory with
+    the same name and extension .cache (e.g. calculation_data.pkl -> calculation_data.cache).
+    The data in the pickle file (old format) is imported in the first use (and again if the file
+    is modified later).
+
+    :param filename: calculation data filename
+    :param directory: directory where the data is stored (default: filename with extension .cache)
+    """
     global __calculation_data_filename__
     global calculation_data
 
     __calculation_data_filename__ = filename
     print('Set data file to {}'.format(__calculation_data_filename__))
 
-    try:
-        with open(__calculation_data_filename__, 'rb') as input:
-            calculation_data = pickle.load(input)
-            print('Loaded data from {}'.format(__calculation_data_filename__))
-    except IOError:
-        calculation_data = {}
+    if directory is None:
+        directory = _get_calculation_data_directory(__calculation_data_filename__)
+
+    calculation_data = CalculationData(directory,
+                                       legacy_filename=__calculation_data_filename__,
+                                       **__calculation_data_policy__)
+
+
+def set_calculation_data_policy(max_size=None, ttl=None, keep=()):
+    """
+    Set the limits of the stored calculation data. If the size of the data exceeds max_size,
+    the least recently used entries are removed. Expired entries are removed when this function is called
+    and every time the size limit is exceeded.
+
+    Example: keep parsed RAS-CI data forever and remove full outputs after 7 days
+        set_calculation_data_policy(max_size=10*1024**3, ttl={'fullout': 7*24*3600}, keep=['parser_rasci'])
+
+    :param max_size: maximum size of the stored calculation data in bytes (None: no limit)
+    :param ttl: dictionary {keyword: seconds} with the time to live of the data of each keyword
+                (keyword: parser function name, 'fullout' or 'fchk'). The policy of a parser also applies
+                to the data parsed with only some fields
+    :param keep: list of keywords whose data is never removed to fit max_size
+    """
+    global __calculation_data_policy__
+
+    __calculation_data_policy__ = {'max_size': max_size, 'ttl': ttl, 'keep': keep}
+    calculation_data.set_policy(**__calculation_data_policy__)
+    calculation_data.evict()
+
+
+def cache_stats():
+    """
+    Get the usage statistics of the stored calculation data:
+    hits, misses, hit rate and evictions in this process and number of entries and bytes per keyword
+
+    :return: dictionary with the statistics
+    """
+    return calculation_data.get_stats()
 
 
 # Check if calculation finished ok
@@ -60,7 +109,7 @@ def parse_output(get_output_function):
         force_recalculation = kwargs.pop('force_recalculation', False)
 
         if parser is not None:
-            hash_p = (args[0], parser.__name__)
+            hash_p = (hash(args[0]), _get_parser_keyword(parser, parser_parameters))
             if hash_p in calculation_data and not force_recalculation:
                 print('already calculated. Skip')
                 return calculation_data[hash_p]
@@ -82,15 +131,41 @@ def parse_output(get_output_function):
         parsed_output = parser(output, **parser_parameters)
 
         calculation_data[hash_p] = parsed_output
-        with open(__calculation_data_filename__, 'wb') as output:
-            pickle.dump(calculation_data, output, pickle.HIGHEST_PROTOCOL)
 
         return parsed_output
 
     return func_wrapper
 
 
-def local_run(input_file_name, work_dir, fchk_file, use_mpi=False, processors=1):
+def get_qchem_environment(fchk_file, use_mpi=False, processors=1):
+    """
+    Get the environment variables to run Q-Chem in a subprocess
+    (os.environ is not modified since it is shared by all threads)
+
+    :param fchk_file: filename of fchk
+    :param use_mpi: use mpi instead of openmp
+    :param processors: number of threads to use
+
+    :return: dictionary with the environment variables
+    """
+
+    environment = dict(os.environ)
+    if not use_mpi:
+        environment["QCTHREADS"] = "{}".format(processors)
+        environment["OMP_NUM_THREADS"] = "{}".format(processors)
+        environment["MKL_NUM_THREADS"] = "1"
+
+    environment["GUIFILE"] = fchk_file
+
+    return environment
+
+
+def get_qchem_binary(environment):
+    return "{}/exe/qcprog.exe".format(environment['QC'])
+
+
+def local_run(input_file_name, work_dir, fchk_file, use_mpi=False, processors=1,
+              stream_output=False, stream_callbacks=None, abort_on_scf_failure=True):
     """
     Run Q-Chem locally
 
@@ -98,233 +173,358 @@ def local_run(input_file_name, work_dir, fchk_file, use_mpi=False, processors=1)
     :param work_dir:  Scratch directory where calculation run
     :param fchk_file: filename of fchk
     :param use_mpi: use mpi instead of openmp
+    :param stream_output: if True the output is read line by line and written to a file in work_dir
+                          while the calculation is running. The complete output is still returned at the end
+                          (read from that file), since the parsers and the stored data use the full text
+    :param stream_callbacks: dictionary {section name: function(section_text)} of functions called
+                             when each section of the output is complete (see output_stream.STREAM_SECTIONS)
+    :param abort_on_scf_failure: if True (and the output is streamed) the calculation is aborted as soon as
+                                 SCF does not converge
 
     :return: output, err: Q-Chem standard output and standard error
     """
 
-    if not use_mpi:
-        os.environ["QCTHREADS"] = "{}".format(processors)
-        os.environ["OMP_NUM_THREADS"] = "{}".format(processors)
-        os.environ["MKL_NUM_THREADS"] = "1"
-
-    os.environ["GUIFILE"] = fchk_file
-    qc_dir = os.environ['QC']
-    binary = "{}/exe/qcprog.exe".format(qc_dir)
+    environment = get_qchem_environment(fchk_file, use_mpi=use_mpi, processors=processors)
+    binary = get_qchem_binary(environment)
     # command = binary + ' {} {} '.format(flag, processors) + ' {} '.format(temp_file_name)
     command = binary + ' {} '.format(os.path.join(work_dir, input_file_name)) + ' {} '.format(work_dir)
 
-    qchem_process = Popen(command, stdout=PIPE, stdin=PIPE, stderr=PIPE, shell=True, cwd=work_dir)
-    (output, err) = qchem_process.communicate()
-    qchem_process.wait()
-    output = output.decode()
-    err = err.decode()
+    if not stream_output and stream_callbacks is None:
+        qchem_process = Popen(command, stdout=PIPE, stdin=PIPE, stderr=PIPE, shell=True, cwd=work_dir, env=environment)
+        (output, err) = qchem_process.communicate()
+        qchem_process.wait()
+        output = output.decode()
+        err = err.decode()
+
+        return output, err
+
+    output_file_name = os.path.join(work_dir, os.path.splitext(input_file_name)[0] + '.out')
+    error_file_name = os.path.join(work_dir, os.path.splitext(input_file_name)[0] + '.err')
+
+    with open(output_file_name, 'w') as output_file, open(error_file_name, 'w') as error_file:
+        # run in a new session to be able to kill all the processes created by Q-Chem
+        qchem_process = Popen(command, stdout=PIPE, stdin=PIPE, stderr=error_file, shell=True, cwd=work_dir,
+                              env=environment, start_new_session=True)
+        qchem_process.stdin.close()
+
+        output_stream = OutputStream(output_file, callbacks=stream_callbacks,
+                                     abort_on_scf_failure=abort_on_scf_failure)
+        for line in iter(qchem_process.stdout.readline, b''):
+            if output_stream.feed(line.decode()):
+                os.killpg(qchem_process.pid, signal.SIGKILL)
+                break
+
+        qchem_process.stdout.close()
+        qchem_process.wait()
+
+    with open(output_file_name) as f:
+        output = f.read()
+    with open(error_file_name) as f:
+        err = f.read()
 
     return output, err
 
 
-def remote_run(input_file_name, work_dir, fchk_file, remote_params, use_mpi=False, processors=1):
+def remote_run(input_file_name, work_dir, fchk_file, remote_params, use_mpi=False, processors=1,
+               connection_pool=None):
     """
     Run Q-Chem remotely
 
     :param input_file: Q-Chem input file in plain text format
     :param work_dir:  Scratch directory where calculation run
     :param fchk_file: filename of fchk
-    :param remote_params: connection parameters for paramiko
+    :param remote_params: connection parameters for paramiko and the optional keys:
+                          precommand: list of commands executed before Q-Chem,
+                          remote_scratch: directory where the calculation runs (default: home directory),
+                          compress: compress the FCHK file in the remote machine before the transfer
+                          ('gzip' or 'xz', default: no compression)
     :param use_mpi: use mpi instead of openmp
+    :param connection_pool: SSHConnectionPool used to connect to the remote machine (default: pool shared by
+                            all the calculations, the connection is kept open for the next calculations)
 
     :return: output, err: Q-Chem standard output and standard error
     """
-    import paramiko
+    from pyqchem.remote import get_connection_pool, get_compress_command, decompress_file
 
-    # get precommands
-    commands = remote_params.pop('precommand', [])
-    remote_scratch = remote_params.pop('remote_scratch', None)
+    if connection_pool is None:
+        connection_pool = get_connection_pool()
 
-    # Setup SSH connection
-    ssh = paramiko.SSHClient()
-    ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-    ssh.connect(**remote_params)
+    # get precommands (remote_params is not modified, it is used in the next calculations)
+    remote_params = dict(remote_params)
+    commands = list(remote_params.pop('precommand', []))
+    remote_scratch = remote_params.pop('remote_scratch', None)
+    compression = remote_params.pop('compress', None)
 
-    ssh.get_transport()
-    sftp = ssh.open_sftp()
-    print('connected to {}..'.format(remote_params['hostname']))
+    # fchk file generated by Q-Chem
+    remote_fchk_file = input_file_name + '.fchk'
+    if compression is not None:
+        compress_command, remote_fchk_file = get_compress_command(remote_fchk_file, compression)
 
-    # Define temp remote dir
-    _, stdout, _ = ssh.exec_command('pwd', get_pty=True)
+    # Setup SSH connection
+    sftp = connection_pool.open_sftp(remote_params)
 
+    # Define temp remote dir (unique for each calculation, so several calculations can run at the same time)
     if remote_scratch is None:
-        remote_scratch = stdout.read().decode().strip('\n').strip('\r')
+        remote_scratch = connection_pool.get_home_directory(remote_params)
 
-    remote_dir = '{}/temp_pyqchem_remote/'.format(remote_scratch)
+    job_id = os.path.basename(os.path.normpath(work_dir))
+    remote_dir = '{}/temp_pyqchem_remote_{}/'.format(remote_scratch, job_id)
 
     # Create temp directory in remote machine
-    try:
-        sftp.mkdir(remote_dir)
-    except OSError:
-        pass
+    sftp.mkdir(remote_dir)
     sftp.chdir(remote_dir)
 
-    # Copy all files in local workdir to remote machine
-    file_list = os.listdir(work_dir)
-    for file in file_list:
-        sftp.put(os.path.join(work_dir, file), '{}'.format(file))
+    try:
+        # Copy only the files needed by the calculation to remote machine (input and guess)
+        for file in [input_file_name, '53.0']:
+            if os.path.isfile(os.path.join(work_dir, file)):
+                sftp.put(os.path.join(work_dir, file), '{}'.format(file))
+
+        flag = '-np' if use_mpi else '-nt'
+
+        # Define commands to run Q-Chem in remote machine
+        commands += ['cd  {}'.format(remote_dir),  # go to remote work dir
+                     'qchem {} {} {}'.format(flag, processors, input_file_name)]  # run qchem
+        if compression is not None:
+            commands.append(compress_command)
+
+        # Execute command in remote machine
+        stdin, stdout, stderr = connection_pool.exec_command(remote_params,
+                                                             'bash -l -c "{}"'.format(';'.join(commands)),
+                                                             get_pty=True)
+
+        # Reformat output/error files
+        output = ''.join(stdout.readlines())
+        error = ''.join(stderr.readlines())
+
+        # get the fchk file (the output is received from the standard output)
+        if remote_fchk_file in sftp.listdir():
+            if compression is None:
+                sftp.get(remote_dir + remote_fchk_file, os.path.join(work_dir, fchk_file))
+            else:
+                sftp.get(remote_dir + remote_fchk_file, os.path.join(work_dir, remote_fchk_file))
+                decompress_file(os.path.join(work_dir, remote_fchk_file), os.path.join(work_dir, fchk_file),
+                                compression)
+
+    finally:
+        # remove temp remote dir
+        sftp.close()
+        connection_pool.exec_command(remote_params, 'rm -rf {}'.format(remote_dir))[1].channel.recv_exit_status()
+
+    return output, error
 
-    flag = '-np' if use_mpi else '-nt'
 
-    # Define commands to run Q-Chem in remote machine
-    commands += ['cd  {}'.format(remote_dir),  # go to remote work dir
-                 'qchem {} {} {}'.format(flag, processors, input_file_name)]  # run qchem
+def store_calculation_data(input_qchem, keyword, data, protocol=None):
 
-    # Execute command in remote machine
-    stdin, stdout, stderr = ssh.exec_command('bash -l -c "{}"'.format(';'.join(commands)), get_pty=True)
+    # each entry is stored in its own file (protocol is set by the calculation data storage)
+    if protocol is not None:
+        warnings.warn('protocol argument of store_calculation_data is deprecated and ignored', DeprecationWarning)
 
-    # Reformat output/error files
-    output = ''.join(stdout.readlines())
-    error = ''.join(stderr.readlines())
+    with __calculation_data_lock__:
+        calculation_data[(hash(input_qchem), keyword)] = data
 
-    # get files and remove them from remote server
-    for file in sftp.listdir():
-        sftp.get(os.path.join(remote_dir, file), os.path.join(work_dir, file))
-        sftp.remove(os.path.join(remote_dir, file))
-    sftp.rmdir(remote_dir)
 
-    sftp.close()
-    ssh.close()
+def retrieve_calculation_data(input_qchem, keyword):
+    return calculation_data.get((hash(input_qchem), keyword))
 
-    # Rename fchk file to match expected name
-    if input_file_name + '.fchk' in os.listdir(work_dir):
-        os.rename(os.path.join(work_dir, input_file_name + '.fchk'), os.path.join(work_dir, fchk_file))
 
-    return output, error
+def is_calculation_data_stored(input_qchem, keyword):
+    return (hash(input_qchem), keyword) in calculation_data
 
 
-def store_calculation_data(input_qchem, keyword, data, protocol=pickle.HIGHEST_PROTOCOL):
+def _retrieve_fchk(input_qchem, fchk_file=None, as_arrays=False):
+    """
+    Get the stored electronic structure of the calculation
 
-    calculation_data[(hash(input_qchem), keyword)] = data
-    with open(__calculation_data_filename__, 'wb') as f:
-        pickle.dump(calculation_data, f, protocol)
+    :param fchk_file: if present, look for a kept FCHK file instead of the parsed data. If the stored file
+                      is in other location it is copied to fchk_file
+    :param as_arrays: return the electronic structure data as numpy arrays (see parser_fchk)
+    :return: dictionary, FchkFile object or None if not found
+    """
+    from pyqchem.parsers.parser_fchk import FchkFile, _format_electronic_structure
 
+    if fchk_file is None:
+        # the data is stored once (in the format it was parsed) and converted to the requested format
+        data_fchk = retrieve_calculation_data(input_qchem, 'fchk')
+        if data_fchk is None:
+            return None
+        return _format_electronic_structure(data_fchk, as_arrays=as_arrays)
 
-def retrieve_calculation_data(input_qchem, keyword):
-    return calculation_data[(hash(input_qchem), keyword)] if (hash(input_qchem), keyword) in calculation_data else None
+    stored_fchk_file = retrieve_calculation_data(input_qchem, 'fchk_file')
+    if stored_fchk_file is None or not os.path.isfile(stored_fchk_file):
+        return None
 
+    if os.path.abspath(stored_fchk_file) != os.path.abspath(fchk_file):
+        shutil.copy(stored_fchk_file, fchk_file)
 
-def get_output_from_qchem(input_qchem,
-                          processors=1,
-                          use_mpi=False,
-                          scratch=None,
-                          read_fchk=False,
-                          parser=None,
-                          parser_parameters=None,
-                          force_recalculation=False,
-                          fchk_only=False,
-                          store_full_output=False,
-                          remote=None,
-                          strict_policy=False):
+    return FchkFile(fchk_file, as_arrays=as_arrays)
+
+
+# parser parameters that change the format of the parsed data (stored with a different keyword)
+_format_parameters = ['configuration_table']
+
+
+def _get_parser_keyword(parser, parser_parameters=None):
     """
-    Runs qchem and returns the output in the following format:
+    Keyword used to store the parsed output in calculation_data. If only some fields are parsed
+    (fields in parser_parameters) the keyword includes them: parser_name[field1,field2,...]
+    Parameters that change the format of the data are appended: parser_name[...]:parameter
 
-    1) If read_fchk is requested:
-        [output, parsed_fchk]
-    2) If read_fchk is not requested:
-        [output]
+    :return: keyword
+    """
+    if parser_parameters is None:
+        parser_parameters = {}
 
-    Note: if parser is set then output contains a dictionary with the parsed info
-          else output contains the q-chem output in plain text
+    keyword = parser.__name__
+    fields = parser_parameters.get('fields', None)
+    if fields is not None:
+        keyword += '[{}]'.format(','.join(sorted(set(fields))))
 
-    read_fchk: contains a dictionary with the parsed info inside fchk file.
+    for parameter in _format_parameters:
+        if parser_parameters.get(parameter, False):
+            keyword += ':' + parameter
 
-    :param input_qchem: QcInput object containing the Q-Chem input
-    :param processors: number of threads/processors to use in the calculation
-    :param use_mpi: If False use OpenMP (threads) else use MPI (processors)
-    :param scratch: Full Q-Chem scratch directory path. If None read from $QCSCRATCH
-    :param read_fchk: if True, generate and parse the FCHK file containing the electronic structure
-    :param parser: function to use to parse the Q-Chem output
-    :param parser_parameters: additional parameters that parser function may have
-    :param force_recalculation: Force to recalculate even identical calculation has already performed
-    :param fchk_only: If true, returns only the electronic structure data parsed from FCHK file
-    :param remote: dictionary containing the data for remote calculation (beta)
+    return keyword
 
-    :return: output [, fchk_dict]
+
+def _get_cached_output(input_qchem, parser=None, parser_parameters=None, read_fchk=False, fchk_only=False,
+                       fchk_file=None, as_arrays=False):
+    """
+    Look for a previous result of the calculation in calculation_data
+
+    :return: the output in the same format returned by get_output_from_qchem or None if not found
+    """
+    from pyqchem.parsers.support import select_fields
+
+    if parser is not None:
+        keyword = _get_parser_keyword(parser, parser_parameters)
+        data = retrieve_calculation_data(input_qchem, keyword)
+
+        # the requested fields can be taken from the data parsed with all the fields
+        all_fields_parameters = dict(parser_parameters, fields=None) if parser_parameters is not None else {}
+        all_fields_keyword = _get_parser_keyword(parser, all_fields_parameters)
+        if data is None and keyword != all_fields_keyword:
+            data = retrieve_calculation_data(input_qchem, all_fields_keyword)
+            if data is not None:
+                data = select_fields(data, parser_parameters['fields'])
+
+        if data is not None:
+            if read_fchk is False:
+                return data
+
+            data_fchk = _retrieve_fchk(input_qchem, fchk_file, as_arrays=as_arrays)
+            if data_fchk is not None:
+                return data, data_fchk
+
+    elif fchk_only:
+        data_fchk = _retrieve_fchk(input_qchem, fchk_file, as_arrays=as_arrays)
+        if data_fchk is not None:
+            return None, data_fchk
+
+    return None
+
+
+def _check_stored_calculation(input_qchem, read_fchk=False, parser=None, parser_parameters=None,
+                              force_recalculation=False, fchk_only=False, store_full_output=False,
+                              fchk_file=None, as_arrays=False):
+    """
+    Look for the stored results of a calculation before running it (common to get_output_from_qchem and
+    aget_output_from_qchem). If read_fchk is True the input is set to generate the FCHK file.
+
+    :return: stored output in the format returned by get_output_from_qchem (None if not found),
+             force_recalculation (True if the calculation has to be run again), stored full output [output, err]
     """
-    from pyqchem.parsers.parser_fchk import parser_fchk
 
     # check gui > 2 if read_fchk
     if read_fchk:
         if input_qchem.gui is None or input_qchem.gui < 1:
             input_qchem.gui = 2
 
-    if scratch is None:
-        scratch = os.environ['QCSCRATCH']
+    if not force_recalculation and not store_full_output:
 
-    work_dir = '{}/qchem{}/'.format(scratch, os.getpid())
+        cached_output = _get_cached_output(input_qchem, parser=parser, parser_parameters=parser_parameters,
+                                           read_fchk=read_fchk, fchk_only=fchk_only, fchk_file=fchk_file,
+                                           as_arrays=as_arrays)
+        if cached_output is not None:
+            return cached_output, force_recalculation, [None, None]
 
-    try:
-        os.mkdir(work_dir)
-    except OSError:
-        pass
+        # parsed data is stored but the electronic structure is missing
+        if parser is not None and read_fchk and \
+                is_calculation_data_stored(input_qchem, _get_parser_keyword(parser, parser_parameters)):
+            force_recalculation = True
+
+    # check if full output is stored
+    full_output = retrieve_calculation_data(input_qchem, 'fullout') if not force_recalculation else None
+
+    return None, force_recalculation, full_output if full_output is not None else [None, None]
+
+
+def create_work_dir(scratch):
+    """
+    Create a new work directory inside scratch, unique for each calculation
+    (safe for concurrent calculations)
+
+    :param scratch: Full Q-Chem scratch directory path
+
+    :return: work_dir, job_id
+    """
+    job_id = '{}_{}'.format(os.getpid(), uuid.uuid4().hex[:12])
+    work_dir = os.path.join(scratch, 'qchem{}'.format(job_id))
+    os.makedirs(work_dir)
+
+    return work_dir, job_id
+
+
+def _write_input_files(input_qchem, work_dir, job_id):
+    """
+    Write Q-Chem input file (and guess file if needed) in work directory
+
+    :return: input_filename, fchk_filename
+    """
 
     # check scf_guess if guess
     if input_qchem.mo_coefficients is not None:
         guess = input_qchem.mo_coefficients
         # set guess in place
-        mo_coeffa = np.array(guess['alpha'], dtype=np.float)
+        mo_coeffa = np.array(guess['alpha'], dtype=float)
         l = len(mo_coeffa)
         if 'beta' in guess:
-            mo_coeffb = np.array(guess['beta'], dtype=np.float)
+            mo_coeffb = np.array(guess['beta'], dtype=float)
         else:
             mo_coeffb = mo_coeffa
 
         mo_ene = np.zeros(l)
 
         guess_file = np.vstack([mo_coeffa, mo_ene, mo_coeffb, mo_ene]).flatten()
-        with open(work_dir + '53.0', 'w') as f:
+        with open(os.path.join(work_dir, '53.0'), 'w') as f:
             guess_file.tofile(f, sep='')
 
-    input_txt = input_qchem.get_txt()
+    fchk_filename = 'qchem_temp_{}.fchk'.format(job_id)
+    temp_filename = 'qchem_temp_{}.inp'.format(job_id)
 
-    # check if parameters is None
-    if parser_parameters is None:
-        parser_parameters = {}
+    with open(os.path.join(work_dir, temp_filename), mode='w') as qchem_input_file:
+        qchem_input_file.write(input_qchem.get_txt())
 
-    # check if full output is stored
-    # print('input:', input_qchem)
-    output, err = calculation_data[(hash(input_qchem), 'fullout')] if (hash(input_qchem), 'fullout') in calculation_data else [None, None]
-    # output, err = retrieve_calculation_data(input_qchem, 'fullout') if retrieve_calculation_data(input_qchem, 'fullout') is not None else [None, None]
+    return temp_filename, fchk_filename
 
-    if not force_recalculation and not store_full_output:
 
-        data_fchk = retrieve_calculation_data(input_qchem, 'fchk')
-
-        if parser is not None:
-
-            data = retrieve_calculation_data(hash(input_qchem), parser.__name__)
-
-            if data is not None:
-                if read_fchk is False:
-                    return data
-                elif data_fchk is not None:
-                    return data, data_fchk
-                else:
-                    force_recalculation = True
-
-        else:
-            if fchk_only and data_fchk is not None:
-                return None, data_fchk
-
-    fchk_filename = 'qchem_temp_{}.fchk'.format(os.getpid())
-    temp_filename = 'qchem_temp_{}.inp'.format(os.getpid())
+def _process_output(input_qchem, output, err, work_dir, fchk_filename,
+                    read_fchk=False,
+                    parser=None,
+                    parser_parameters=None,
+                    force_recalculation=False,
+                    store_full_output=False,
+                    fchk_file=None,
+                    as_arrays=False):
+    """
+    Check, parse and store the output of a finished Q-Chem calculation
 
-    qchem_input_file = open(os.path.join(work_dir, temp_filename), mode='w')
-    qchem_input_file.write(input_txt)
-    qchem_input_file.close()
+    :return: output [, fchk_dict]
+    """
+    from pyqchem.parsers.parser_fchk import parser_fchk, FchkFile
 
-    # Q-Chem calculation
-    if output is None or force_recalculation is True:
-        if remote is None:
-            output, err = local_run(temp_filename, work_dir, fchk_filename, use_mpi=use_mpi, processors=processors)
-        else:
-            output, err = remote_run(temp_filename, work_dir, fchk_filename, remote, use_mpi=use_mpi, processors=processors)
+    if parser_parameters is None:
+        parser_parameters = {}
 
     if not finish_ok(output):
         raise OutputError(output, err)
@@ -335,15 +535,17 @@ def get_output_from_qchem(input_qchem,
     if parser is not None:
         try:
             output = parser(output, **parser_parameters)
+        except ParserError:
+            raise
         # minimum functionality for error capture
         except:
             raise ParserError(parser.__name__, 'Undefined error')
 
-        store_calculation_data(input_qchem, parser.__name__, output)
+        store_calculation_data(input_qchem, _get_parser_keyword(parser, parser_parameters), output)
 
     if read_fchk:
 
-        data_fchk = retrieve_calculation_data(input_qchem, 'fchk')
+        data_fchk = _retrieve_fchk(input_qchem, fchk_file, as_arrays=as_arrays)
         if data_fchk is not None and not force_recalculation:
             return output, data_fchk
 
@@ -351,11 +553,17 @@ def get_output_from_qchem(input_qchem,
             warnings.warn('fchk not found! Make sure the input generates it (gui 2)')
             return output, []
 
+        # keep the FCHK file and read it on demand
+        if fchk_file is not None:
+            shutil.move(os.path.join(work_dir, fchk_filename), fchk_file)
+            store_calculation_data(input_qchem, 'fchk_file', os.path.abspath(fchk_file))
+            return output, FchkFile(fchk_file, as_arrays=as_arrays)
+
         with open(os.path.join(work_dir, fchk_filename)) as f:
             fchk_txt = f.read()
         os.remove(os.path.join(work_dir, fchk_filename))
 
-        data_fchk = parser_fchk(fchk_txt)
+        data_fchk = parser_fchk(fchk_txt, as_arrays=as_arrays)
         store_calculation_data(input_qchem, 'fchk', data_fchk)
 
         return output, data_fchk
@@ -363,6 +571,485 @@ def get_output_from_qchem(input_qchem,
     return output
 
 
+def get_output_from_qchem(input_qchem,
+                          processors=1,
+                          use_mpi=False,
+                          scratch=None,
+                          read_fchk=False,
+                          parser=None,
+                          parser_parameters=None,
+                          force_recalculation=False,
+                          fchk_only=False,
+                          store_full_output=False,
+                          remote=None,
+                          strict_policy=False,
+                          keep_scratch=False,
+                          stream_output=False,
+                          stream_callbacks=None,
+                          abort_on_scf_failure=True,
+                          fchk_file=None,
+                          executor=None,
+                          as_arrays=False):
+    """
+    Runs qchem and returns the output in the following format:
+
+    1) If read_fchk is requested:
+        [output, parsed_fchk]
+    2) If read_fchk is not requested:
+        [output]
+
+    Note: if parser is set then output contains a dictionary with the parsed info
+          else output contains the q-chem output in plain text
+
+    read_fchk: contains a dictionary with the parsed info inside fchk file.
+
+    :param input_qchem: QcInput object containing the Q-Chem input
+    :param processors: number of threads/processors to use in the calculation
+    :param use_mpi: If False use OpenMP (threads) else use MPI (processors)
+    :param scratch: Full Q-Chem scratch directory path. If None read from $QCSCRATCH
+    :param read_fchk: if True, generate and parse the FCHK file containing the electronic structure
+    :param parser: function to use to parse the Q-Chem output
+    :param parser_parameters: additional parameters that parser function may have. If the parser supports it,
+                              {'fields': [...]} parses only the requested fields (stored separately)
+    :param force_recalculation: Force to recalculate even identical calculation has already performed
+    :param fchk_only: If true, returns only the electronic structure data parsed from FCHK file
+    :param remote: dictionary containing the data for remote calculation (beta). The connection to the remote
+                   machine is kept open and shared by the next calculations (see pyqchem.remote)
+    :param keep_scratch: If True, do not remove the work directory of the calculation from scratch
+    :param stream_output: If True, follow the output while the calculation is running (local only). The output
+                          is written to a file in the work directory (see local_run)
+    :param stream_callbacks: dictionary {section name: function(section_text)} of functions called when each
+                             section of the output is complete (see output_stream.STREAM_SECTIONS)
+    :param abort_on_scf_failure: If True, a followed calculation (stream_output or stream_callbacks) is aborted
+                                 as soon as SCF does not converge
+    :param fchk_file: if present (and read_fchk is True), the FCHK file is kept in this path and the electronic
+                      structure is returned as a FchkFile object that reads the data on demand. The FchkFile
+                      keeps the file open: close it (or use it in a with statement) when it is not needed
+    :param executor: Executor object that runs the calculation (e.g. QueueExecutor to run it through a batch
+                     scheduler, see pyqchem.executors). If None, the calculation runs in this machine or
+                     in the remote machine if remote is present
+    :param as_arrays: if True, MO coefficients and energies, overlap and NATO data of the electronic structure
+                      are returned as float64 numpy arrays instead of lists (see parser_fchk)
+
+    :return: output [, fchk_dict]
+    """
+
+    if scratch is None:
+        scratch = os.environ['QCSCRATCH']
+
+    # check if parameters is None
+    if parser_parameters is None:
+        parser_parameters = {}
+
+    cached_output, force_recalculation, (output, err) = _check_stored_calculation(
+        input_qchem, read_fchk=read_fchk, parser=parser, parser_parameters=parser_parameters,
+        force_recalculation=force_recalculation, fchk_only=fchk_only, store_full_output=store_full_output,
+        fchk_file=fchk_file, as_arrays=as_arrays)
+    if cached_output is not None:
+        return cached_output
+
+    work_dir, job_id = create_work_dir(scratch)
+
+    try:
+        temp_filename, fchk_filename = _write_input_files(input_qchem, work_dir, job_id)
+
+        # Q-Chem calculation
+        if output is None or force_recalculation is True:
+            if executor is not None:
+                output, err = executor.run(temp_filename, work_dir, fchk_filename, use_mpi=use_mpi,
+                                           processors=processors)
+            elif remote is None:
+                output, err = local_run(temp_filename, work_dir, fchk_filename, use_mpi=use_mpi, processors=processors,
+                                        stream_output=stream_output, stream_callbacks=stream_callbacks,
+                                        abort_on_scf_failure=abort_on_scf_failure)
+            else:
+                output, err = remote_run(temp_filename, work_dir, fchk_filename, remote, use_mpi=use_mpi, processors=processors)
+
+        return _process_output(input_qchem, output, err, work_dir, fchk_filename,
+                               read_fchk=read_fchk,
+                               parser=parser,
+                               parser_parameters=parser_parameters,
+                               force_recalculation=force_recalculation,
+                               store_full_output=store_full_output,
+                               fchk_file=fchk_file,
+                               as_arrays=as_arrays)
+
+    finally:
+        if not keep_scratch:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def _batch_worker_init(filename, policy):
+    global __calculation_data_filename__
+    global __calculation_data_policy__
+    global calculation_data
+
+    # use the same calculation data as the parent process
+    __calculation_data_filename__ = filename
+    __calculation_data_policy__ = policy
+    calculation_data = CalculationData(_get_calculation_data_directory(filename), **policy)
+
+
+def run_batch(input_list,
+              max_workers=None,
+              processors_per_job=None,
+              ordered=True,
+              **kwargs):
+    """
+    Runs a list of independent Q-Chem calculations concurrently in a local pool of processes.
+    The available cores are split between the concurrent Q-Chem calculations.
+
+    Calculations already stored in calculation_data are not submitted to the pool.
+
+    If remote is present in kwargs the calculations run in the remote machines. Each calculation is sent to the
+    host with less calculations running (each one in its own remote directory) from a pool of threads that share
+    the connections to the hosts.
+
+    Example: 8 calculations at the same time in two hosts
+        outputs = run_batch(input_list, max_workers=8, remote=[remote_host_1, remote_host_2], parser=basic_cis)
+
+    If executor is present in kwargs and supports batch submission (e.g. QueueExecutor) all the calculations
+    are submitted at once (e.g. one array job) and max_workers is not used. A calculation that fails does not
+    stop the others: the first error is raised when all the calculations have finished.
+
+    :param input_list: list of QcInput objects
+    :param max_workers: maximum number of concurrent Q-Chem calculations (default: cores/processors_per_job,
+                        one calculation per host in remote calculations)
+    :param processors_per_job: number of threads/processors to use in each calculation (default: cores/max_workers,
+                               1 in remote calculations)
+    :param ordered: if True return a list with the outputs in the same order as input_list,
+                    else return an iterator that yields (index, output) as calculations finish
+    :param kwargs: additional arguments passed to get_output_from_qchem (parser, read_fchk, scratch, etc..).
+                   remote can be a list of dictionaries to use several hosts
+
+    :return: list of outputs or iterator of (index, output)
+    """
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+    from multiprocessing import cpu_count
+
+    remote = kwargs.pop('remote', None)
+    if remote is not None:
+        hosts = list(remote) if isinstance(remote, (list, tuple)) else [remote]
+        if processors_per_job is None:
+            processors_per_job = 1
+        if max_workers is None:
+            max_workers = len(hosts)
+
+        # number of calculations running in each host
+        running_jobs = [0] * len(hosts)
+        hosts_lock = threading.Lock()
+
+        def remote_job(input_qchem, **kwargs):
+            with hosts_lock:
+                i_host = running_jobs.index(min(running_jobs))
+                running_jobs[i_host] += 1
+            try:
+                return get_output_from_qchem(input_qchem, remote=hosts[i_host], **kwargs)
+            finally:
+                with hosts_lock:
+                    running_jobs[i_host] -= 1
+
+    batch_submission = getattr(kwargs.get('executor', None), 'batch_submission', False)
+    if batch_submission and processors_per_job is None:
+        processors_per_job = 1
+
+    n_cores = cpu_count()
+    if processors_per_job is None:
+        processors_per_job = max(n_cores // max_workers, 1) if max_workers is not None else 1
+    if max_workers is None:
+        max_workers = max(n_cores // processors_per_job, 1)
+
+    kwargs['processors'] = processors_per_job
+
+    def iterate_outputs():
+        pending = []
+        for i, input_qchem in enumerate(input_list):
+            if not kwargs.get('force_recalculation', False) and not kwargs.get('store_full_output', False):
+                cached_output = _get_cached_output(input_qchem,
+                                                   parser=kwargs.get('parser', None),
+                                                   parser_parameters=kwargs.get('parser_parameters', None),
+                                                   read_fchk=kwargs.get('read_fchk', False),
+                                                   fchk_only=kwargs.get('fchk_only', False),
+                                                   as_arrays=kwargs.get('as_arrays', False))
+                if cached_output is not None:
+                    yield i, cached_output
+                    continue
+            pending.append(i)
+
+        if len(pending) == 0:
+            return
+
+        if batch_submission:
+            # all the calculations are submitted at once (e.g. array job of a batch scheduler)
+            for i, output in _iterate_batch_submission([input_list[i] for i in pending], **kwargs):
+                yield pending[i], output
+            return
+
+        if remote is not None:
+            # the calculations run in the remote hosts, threads are enough
+            pool = ThreadPoolExecutor(max_workers=min(max_workers, len(pending)))
+            job_function = remote_job
+        else:
+            pool = ProcessPoolExecutor(max_workers=min(max_workers, len(pending)),
+                                       initializer=_batch_worker_init,
+                                       initargs=(__calculation_data_filename__, __calculation_data_policy__))
+            job_function = get_output_from_qchem
+
+        with pool:
+            futures = {pool.submit(job_function, input_list[i], **kwargs): i for i in pending}
+
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+
+    if not ordered:
+        return iterate_outputs()
+
+    output_list = [None] * len(input_list)
+    for i, output in iterate_outputs():
+        output_list[i] = output
+
+    return output_list
+
+
+def split_multijob_output(output, n_jobs):
+    """
+    Split the output of a multi-job Q-Chem input (jobs separated by @@@) in the outputs of each job.
+    The output of each job that finished (except the last one) is completed with the final lines of the
+    Q-Chem output so that it can be used as the output of a single calculation.
+
+    :param output: Q-Chem output of the multi-job input
+    :param n_jobs: number of jobs of the input
+    :return: list of the outputs of each job (None for jobs that did not run)
+    """
+    positions = {}
+    for m in re.finditer('Running Job +([0-9]+) +of +[0-9]+', output):
+        positions.setdefault(int(m.group(1)), m.start())
+    # the output starts with the first job
+    positions[1] = 0
+
+    # final lines of the output (after the end of the last job). If Q-Chem stopped before the
+    # end (failed job) the jobs that finished are completed with the last line of a normal termination
+    enum = output.rfind('Total job time')
+    footer = output[output.find('\n', enum) + 1:] if enum > -1 else ''
+    if not finish_ok(footer):
+        footer = '        *  Thank you very much for using Q-Chem.  Have a nice day.  *\n'
+
+    outputs = []
+    for job in range(1, n_jobs + 1):
+        if job not in positions:
+            outputs.append(None)
+            continue
+
+        job_output = output[positions[job]:positions.get(job + 1, len(output))]
+        if job + 1 in positions and job_output.find('Total job time') > -1:
+            job_output += footer
+        outputs.append(job_output)
+
+    return outputs
+
+
+def _run_pack(input_list, processors=1, use_mpi=False, scratch=None, parser=None, parser_parameters=None,
+              store_full_output=False, keep_scratch=False, executor=None):
+    """
+    Run a list of calculations as a single multi-job Q-Chem input. The output of each calculation
+    is parsed and stored as if the calculation had run alone
+
+    :return: list of outputs (OutputError/ParserError for the calculations that failed and None for those
+             that did not run)
+    """
+    work_dir, job_id = create_work_dir(scratch)
+
+    try:
+        input_file_name, fchk_filename = _write_input_files(input_list[0], work_dir, job_id)
+        if len(input_list) > 1:
+            with open(os.path.join(work_dir, input_file_name), mode='w') as qchem_input_file:
+                qchem_input_file.write('@@@\n\n'.join([input_qchem.get_txt() for input_qchem in input_list]))
+
+        if executor is not None:
+            output, err = executor.run(input_file_name, work_dir, fchk_filename, use_mpi=use_mpi,
+                                       processors=processors)
+        else:
+            output, err = local_run(input_file_name, work_dir, fchk_filename, use_mpi=use_mpi, processors=processors)
+
+        outputs = []
+        for input_qchem, job_output in zip(input_list, split_multijob_output(output, len(input_list))):
+            if job_output is None:
+                outputs.append(None)
+                continue
+            try:
+                outputs.append(_process_output(input_qchem, job_output, err, work_dir, fchk_filename,
+                                               parser=parser,
+                                               parser_parameters=parser_parameters,
+                                               force_recalculation=True,
+                                               store_full_output=store_full_output))
+            except (OutputError, ParserError) as e:
+                outputs.append(e)
+
+        return outputs
+
+    finally:
+        if not keep_scratch:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def run_packed(input_list,
+               pack_size=20,
+               max_workers=1,
+               processors=1,
+               use_mpi=False,
+               scratch=None,
+               parser=None,
+               parser_parameters=None,
+               force_recalculation=False,
+               store_full_output=False,
+               keep_scratch=False,
+               executor=None):
+    """
+    Runs a list of small Q-Chem calculations packing them in multi-job inputs (jobs separated by @@@), so
+    that Q-Chem starts only once for each pack of calculations. The output of each calculation is parsed and
+    stored separately (as in get_output_from_qchem).
+
+    Q-Chem stops at the first job that fails: the following calculations of the pack are run again in a new
+    pack. Calculations with a guess (scf_guess) are not packed. The FCHK files are not retrieved (read_fchk
+    is not supported).
+
+    Example: energies of a scan of 200 points running Q-Chem 10 times
+        outputs = run_packed(input_list, pack_size=20, parser=basic_parser_qchem)
+
+    :param input_list: list of QcInput objects
+    :param pack_size: maximum number of calculations in each multi-job input
+    :param max_workers: number of packs running at the same time in a pool of processes (1: run in this process)
+    :param processors: number of threads/processors to use in each pack
+    :param use_mpi: If False use OpenMP (threads) else use MPI (processors)
+    :param scratch: Full Q-Chem scratch directory path. If None read from $QCSCRATCH
+    :param parser: function to use to parse the Q-Chem output of each calculation
+    :param parser_parameters: additional parameters that parser function may have
+    :param force_recalculation: Force to recalculate even identical calculation has already performed
+    :param store_full_output: store the output of each calculation in calculation data
+    :param keep_scratch: If True, do not remove the work directories from scratch
+    :param executor: Executor object that runs the packs (default: run in this machine)
+
+    :return: list of outputs in the same order as input_list. The first error found (OutputError or ParserError)
+             is raised after all the calculations have run
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    if scratch is None:
+        scratch = os.environ['QCSCRATCH']
+
+    if parser_parameters is None:
+        parser_parameters = {}
+
+    output_list = [None] * len(input_list)
+    pending = []
+    for i, input_qchem in enumerate(input_list):
+        if not force_recalculation and not store_full_output:
+            cached_output = _get_cached_output(input_qchem, parser=parser, parser_parameters=parser_parameters)
+            if cached_output is not None:
+                output_list[i] = cached_output
+                continue
+        pending.append(i)
+
+    def make_packs(indices):
+        # calculations with guess need their own guess file
+        packs = [[i] for i in indices if input_list[i].mo_coefficients is not None]
+        indices = [i for i in indices if input_list[i].mo_coefficients is None]
+        return packs + [indices[j:j + pack_size] for j in range(0, len(indices), pack_size)]
+
+    kwargs = {'processors': processors, 'use_mpi': use_mpi, 'scratch': scratch, 'parser': parser,
+              'parser_parameters': parser_parameters, 'store_full_output': store_full_output,
+              'keep_scratch': keep_scratch, 'executor': executor}
+
+    errors = {}
+    packs = make_packs(pending)
+    while len(packs) > 0:
+        if max_workers == 1 or len(packs) == 1:
+            results = [_run_pack([input_list[i] for i in pack], **kwargs) for pack in packs]
+        else:
+            with ProcessPoolExecutor(max_workers=min(max_workers, len(packs)),
+                                     initializer=_batch_worker_init,
+                                     initargs=(__calculation_data_filename__, __calculation_data_policy__)) as pool:
+                futures = [pool.submit(_run_pack, [input_list[i] for i in pack], **kwargs) for pack in packs]
+                results = [future.result() for future in futures]
+
+        not_run = []
+        for pack, outputs in zip(packs, results):
+            for i, output in zip(pack, outputs):
+                if output is None:
+                    not_run.append(i)
+                elif isinstance(output, (OutputError, ParserError)):
+                    errors[i] = output
+                else:
+                    output_list[i] = output
+
+        packs = make_packs(not_run)
+
+    if len(errors) > 0:
+        raise errors[min(errors)]
+
+    return output_list
+
+
+def _iterate_batch_submission(input_list, executor, processors=1, use_mpi=False, scratch=None, read_fchk=False,
+                              parser=None, parser_parameters=None, force_recalculation=False, fchk_only=False,
+                              store_full_output=False, strict_policy=False, keep_scratch=False,
+                              stream_output=False, stream_callbacks=None, abort_on_scf_failure=True,
+                              fchk_file=None, as_arrays=False):
+    """
+    Run a list of calculations submitting them at once to an executor (see Executor.iterate_jobs).
+    A calculation that fails does not stop the others: the first error (OutputError or ParserError)
+    is raised when all the calculations have finished.
+
+    :return: iterator that yields (index, output) as calculations finish
+    """
+    if fchk_file is not None:
+        raise ValueError('fchk_file is not supported in batch calculations (one FCHK file for each calculation)')
+
+    if scratch is None:
+        scratch = os.environ['QCSCRATCH']
+
+    jobs = []
+    job_iterator = None
+    errors = {}
+    try:
+        for input_qchem in input_list:
+            if read_fchk and (input_qchem.gui is None or input_qchem.gui < 1):
+                input_qchem.gui = 2
+
+            work_dir, job_id = create_work_dir(scratch)
+            temp_filename, fchk_filename = _write_input_files(input_qchem, work_dir, job_id)
+            jobs.append((temp_filename, work_dir, fchk_filename))
+
+        job_iterator = executor.iterate_jobs(jobs, use_mpi=use_mpi, processors=processors)
+        for i, (output, err) in job_iterator:
+            try:
+                output = _process_output(input_list[i], output, err, jobs[i][1], jobs[i][2],
+                                         read_fchk=read_fchk,
+                                         parser=parser,
+                                         parser_parameters=parser_parameters,
+                                         force_recalculation=force_recalculation,
+                                         store_full_output=store_full_output,
+                                         as_arrays=as_arrays)
+            except (OutputError, ParserError) as e:
+                errors[i] = e
+                continue
+
+            if not keep_scratch:
+                shutil.rmtree(jobs[i][1], ignore_errors=True)
+            yield i, output
+
+    finally:
+        # stop the calculations that are still running (iteration interrupted) before removing their files
+        if job_iterator is not None:
+            job_iterator.close()
+        if not keep_scratch:
+            for _, work_dir, _ in jobs:
+                shutil.rmtree(work_dir, ignore_errors=True)
+
+    if len(errors) > 0:
+        raise errors[min(errors)]
+
+
 def get_input_hash(data):
     return hashlib.md5(data.encode()).hexdigest()
 
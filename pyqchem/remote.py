@@ -0,0 +1,206 @@
+import threading
+import atexit
+import os
+
+
+# compression of the files transferred from the remote machine: remote command, extension
+COMPRESSION_FORMATS = {'gzip': ('gzip -f -1', '.gz'),
+                       'xz': ('xz -f -1', '.xz')}
+
+
+def get_compress_command(filename, compression):
+    """
+    get the command that compresses a file in the remote machine (if the file exists)
+
+    :param filename: file name
+    :param compression: compression format ('gzip' or 'xz')
+    :return: command, name of the compressed file
+    """
+    if compression not in COMPRESSION_FORMATS:
+        raise ValueError('Compression {} not supported (available: {})'.format(compression,
+                                                                               ', '.join(sorted(COMPRESSION_FORMATS))))
+    command, extension = COMPRESSION_FORMATS[compression]
+    return 'if [ -f {0} ]; then {1} {0}; fi'.format(filename, command), filename + extension
+
+
+def decompress_file(filename, output_filename, compression):
+    """
+    decompress a file transferred from the remote machine (the compressed file is removed)
+
+    :param filename: compressed file name
+    :param output_filename: decompressed file name
+    :param compression: compression format ('gzip' or 'xz')
+    """
+    import shutil
+
+    if compression == 'gzip':
+        import gzip
+        open_function = gzip.open
+    else:
+        import lzma
+        open_function = lzma.open
+
+    with open_function(filename, 'rb') as f_in, open(output_filename, 'wb') as f_out:
+        shutil.copyfileobj(f_in, f_out, 1024**2)
+
+    os.remove(filename)
+
+
+def _connection_key(remote_params):
+    # the connections are only shared by the same host, user and credentials (password, key, agent, etc..).
+    # The rest of the parameters are stored as a digest to not keep the password in the keys
+    import hashlib
+
+    def get_text(value):
+        # private keys (paramiko PKey) are compared by their content
+        return value.get_base64() if hasattr(value, 'get_base64') else repr(value)
+
+    parameters = sorted([(name, get_text(value)) for name, value in remote_params.items()
+                         if name not in ['hostname', 'port', 'username']])
+    credentials = hashlib.sha256(repr(parameters).encode()).hexdigest()
+
+    return remote_params['hostname'], remote_params.get('port', 22), remote_params.get('username', None), credentials
+
+
+class SSHConnectionPool:
+    """
+    Pool of persistent SSH connections (one authenticated transport for each host, user and credentials).
+    The calculations do not open new connections: each command and SFTP session is a new channel
+    of the transport of the host, so the channels of concurrent calculations (threads) are multiplexed
+    over the same connection. Connections closed by the server (or by a network error) are opened again
+    when they are needed.
+    """
+
+    def __init__(self, keepalive=30, retries=1):
+        """
+        :param keepalive: interval (seconds) of the keepalive packets sent to keep the connections open (0: disabled)
+        :param retries: number of times a new connection is tried if a channel cannot be opened
+        """
+        self._keepalive = keepalive
+        self._retries = retries
+        self._clients = {}
+        self._home_directories = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+        self.n_connections = 0
+
+    def _get_lock(self, key):
+        with self._lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def get_client(self, remote_params):
+        """
+        get the connection to a host (a new connection is opened if there is none or it is closed)
+
+        :param remote_params: connection parameters for paramiko (hostname, port, username, password, etc..)
+        :return: paramiko SSHClient
+        """
+        import paramiko
+
+        key = _connection_key(remote_params)
+        with self._get_lock(key):
+            ssh = self._clients.get(key)
+            transport = ssh.get_transport() if ssh is not None else None
+            if transport is not None and transport.is_active():
+                return ssh
+
+            if ssh is not None:
+                ssh.close()
+
+            ssh = paramiko.SSHClient()
+            ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+            ssh.connect(**remote_params)
+            if self._keepalive:
+                ssh.get_transport().set_keepalive(self._keepalive)
+            print('connected to {}..'.format(remote_params['hostname']))
+
+            self._clients[key] = ssh
+            self.n_connections += 1
+
+        return ssh
+
+    def _discard(self, remote_params, ssh):
+        # close a broken connection (unless it has been replaced by other thread)
+        key = _connection_key(remote_params)
+        with self._get_lock(key):
+            if self._clients.get(key) is ssh:
+                del self._clients[key]
+        ssh.close()
+
+    def _open_channel(self, remote_params, open_function):
+        import paramiko
+        import socket
+
+        for attempt in range(self._retries + 1):
+            ssh = self.get_client(remote_params)
+            try:
+                return open_function(ssh)
+            except (paramiko.SSHException, EOFError, socket.error):
+                self._discard(remote_params, ssh)
+                if attempt == self._retries:
+                    raise
+
+    def exec_command(self, remote_params, command, get_pty=False):
+        """
+        execute a command in the host (equivalent to paramiko SSHClient.exec_command)
+
+        :param remote_params: connection parameters for paramiko
+        :param command: command to execute
+        :param get_pty: request a pseudo-terminal
+        :return: stdin, stdout, stderr of the command
+        """
+        return self._open_channel(remote_params, lambda ssh: ssh.exec_command(command, get_pty=get_pty))
+
+    def open_sftp(self, remote_params):
+        """
+        open a new SFTP session in the host. The session has to be closed after its use (the connection is kept)
+
+        :param remote_params: connection parameters for paramiko
+        :return: paramiko SFTPClient
+        """
+        return self._open_channel(remote_params, lambda ssh: ssh.open_sftp())
+
+    def get_home_directory(self, remote_params):
+        """
+        get the working directory of the remote shell (only requested once for each host)
+
+        :param remote_params: connection parameters for paramiko
+        :return: directory path
+        """
+        key = _connection_key(remote_params)
+        if key not in self._home_directories:
+            _, stdout, _ = self.exec_command(remote_params, 'pwd', get_pty=True)
+            self._home_directories[key] = stdout.read().decode().strip('\n').strip('\r')
+
+        return self._home_directories[key]
+
+    def close(self):
+        """
+        close all the connections
+        """
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients = {}
+
+        for ssh in clients:
+            ssh.close()
+
+
+_connection_pool = None
+_connection_pool_lock = threading.Lock()
+
+
+def get_connection_pool():
+    """
+    get the connection pool shared by all the remote calculations of this process
+
+    :return: SSHConnectionPool
+    """
+    global _connection_pool
+
+    with _connection_pool_lock:
+        if _connection_pool is None:
+            _connection_pool = SSHConnectionPool()
+            atexit.register(_connection_pool.close)
+
+    return _connection_pool
@@ -137,10 +137,30 @@ class Structure:
     def __str__(self):
         return self.get_xyz()
 
+    def __setattr__(self, name, value):
+        # any change of the structure (except data derived from it) invalidates the stored hash.
+        # The coordinates are stored as a read-only array so the structure can only change through assignments
+        if name not in ['_atomic_masses', '_number_of_atoms', '_number_of_internal', '_full_z_matrix']:
+            self.__dict__.pop('_hash_cache', None)
+        if name == '_coordinates' and isinstance(value, np.ndarray):
+            value = np.array(value)
+            value.flags.writeable = False
+        object.__setattr__(self, name, value)
+
+    def __setstate__(self, state):
+        # copies (deepcopy, pickle) also keep the coordinates read-only
+        for name, value in state.items():
+            if name != '_hash_cache':
+                setattr(self, name, value)
+
     def __hash__(self):
-        digest = hashlib.md5(json.dumps((self.get_xyz(), self.alpha_electrons, self.beta_electrons),
-                                        sort_keys=True).encode()).hexdigest()
-        return int(digest, 16)
+        # the hash is stored and only recalculated if the structure changes
+        if self.__dict__.get('_hash_cache') is None:
+            digest = hashlib.md5(json.dumps((self.get_xyz(), self.alpha_electrons, self.beta_electrons),
+                                            sort_keys=True).encode()).hexdigest()
+            self.__dict__['_hash_cache'] = int(digest, 16)
+
+        return self.__dict__['_hash_cache']
 
     def get_coordinates(self, fragment=None):
         """
@@ -26,9 +26,10 @@ def get_wf_symmetry(structure,
     :return molsym: wfnsympy object
     """
 
-    alpha_mo_coeff = np.array(mo_coeff['alpha']).tolist()
+    # the coefficients are passed as contiguous arrays (no copy if already in this format)
+    alpha_mo_coeff = np.ascontiguousarray(mo_coeff['alpha'], dtype=float)
     if 'beta' in mo_coeff:
-        beta_mo_coeff = np.array(mo_coeff['beta']).tolist()
+        beta_mo_coeff = np.ascontiguousarray(mo_coeff['beta'], dtype=float)
     else:
         beta_mo_coeff = None
 
@@ -221,13 +222,13 @@ def get_symmetry_le(electronic_structure, data_rasci, fragment_atoms=(0), tol=0.
 
             coefficients = electronic_structure['nato_coefficients_multi'][index+1]
             occupation = electronic_structure['nato_occupancies_multi'][index+1]
-            overlap_matrix = np.array(electronic_structure['overlap'])
+            overlap_matrix = np.asarray(electronic_structure['overlap'])
 
             functions_indices = _indices_from_ranges(functions_range)
-            overlap_matrix = np.array([ovm[functions_indices] for ovm in overlap_matrix[functions_indices]])
+            overlap_matrix = overlap_matrix[np.ix_(functions_indices, functions_indices)]
 
-            c_alpha = np.array(coefficients['alpha'])
-            oc_alpha = np.array(occupation['alpha'])
+            c_alpha = np.asarray(coefficients['alpha'])
+            oc_alpha = np.asarray(occupation['alpha'])
 
             orbitals = []
             alpha = 0
@@ -25,13 +25,27 @@ def standardize_vector(vector):
     return vector
 
 
-def search_bars(output, from_position=0, bar_type='---'):
-    output = output[from_position:]
+def search_bars(output, from_position=0, bar_type='---', n_bars=None):
+    """
+    get the positions of the bars (lines of repeated characters) in the output
+
+    :param output: Q-Chem output
+    :param from_position: position to start the search
+    :param bar_type: regular expression of the bar
+    :param n_bars: maximum number of bars to search (None: search up to the end of the output)
+    :return: list of positions
+    """
+    # same as slicing the output (without copying it)
+    if from_position < 0:
+        from_position = max(len(output) + from_position, 0)
+
     positions = []
-    previous = 0
-    for m in re.finditer(bar_type, output):
+    previous = from_position
+    for m in re.compile(bar_type).finditer(output, from_position):
         if m.start() > previous + 1:
-            positions.append(m.start() + from_position)
+            positions.append(m.start())
+            if n_bars is not None and len(positions) >= n_bars:
+                break
         previous = m.end()
 
     return positions
@@ -105,7 +119,7 @@ def _set_zero_to_coefficients(basis, mo_coeff, range_atoms):
     :param basis: full basis dictionary
     :param mo_coeff: full molecular orbitals coefficients to be modiffied
     :param range_atoms: list containing the atom numbers whose coefficients will be set to zero
-    :return:
+    :return: new coefficients (numpy arrays if the original coefficients are numpy arrays, else lists)
     """
 
     functions_to_atom = []
@@ -118,22 +132,23 @@ def _set_zero_to_coefficients(basis, mo_coeff, range_atoms):
     functions_to_atom = functions_to_atom
 
     # print(funtions_to_atom)
-    mo_coeff_a = np.array(mo_coeff['alpha'])
-    for i in range_atoms:
-        ini = np.sum(functions_to_atom[:i], dtype=int)
-        fin = np.sum(functions_to_atom[:i+1], dtype=int)
-        # print('ini', ini, 'fin', fin)
-        mo_coeff_a[:, ini: fin] *= 0.0
-    mo_coeff_zero = {'alpha': mo_coeff_a.tolist()}
-
-    if 'beta' in mo_coeff:
-        mo_coeff_b = np.array(mo_coeff['beta'])
+    mo_coeff_zero = {}
+    for spin in ['alpha', 'beta']:
+        if spin not in mo_coeff:
+            continue
+
+        # copy of the coefficients
+        mo_coeff_spin = np.array(mo_coeff[spin], dtype=float)
         for i in range_atoms:
             ini = np.sum(functions_to_atom[:i], dtype=int)
-            fin = np.sum(functions_to_atom[:i + 1], dtype=int)
+            fin = np.sum(functions_to_atom[:i+1], dtype=int)
             # print('ini', ini, 'fin', fin)
-            mo_coeff_b[:, ini: fin] *= 0.0
-        mo_coeff_zero['beta'] = mo_coeff_b.tolist()
+            mo_coeff_spin[:, ini: fin] = 0.0
+
+        if isinstance(mo_coeff[spin], np.ndarray):
+            mo_coeff_zero[spin] = mo_coeff_spin
+        else:
+            mo_coeff_zero[spin] = mo_coeff_spin.tolist()
 
     return mo_coeff_zero
 
@@ -147,7 +162,9 @@ def crop_electronic_structure(electronic_structure, atom_list):
                                                  electronic_structure['coefficients'],
                                                  complementary_list)
 
-    new_electronic_structure = deepcopy(electronic_structure)
+    # the original coefficients are not copied
+    new_electronic_structure = deepcopy({key: value for key, value in electronic_structure.items()
+                                         if key != 'coefficients'})
     new_electronic_structure['coefficients'] = new_coefficients
     return new_electronic_structure
 
@@ -202,10 +219,23 @@ def reorder_coefficients(occupations, coefficients):
 
     :param occupations: list on integers (0 or 1) or list of Boolean
     :param coefficients:  dictionary containing the molecular orbitals coefficients {'alpha': coeff, 'beta:' coeff}.
-                          coeff should be a list of lists (Norb x NBas)
+                          coeff should be a list of lists or a numpy array (Norb x NBas)
     :return:
     """
 
+    # the dictionary of the caller is not modified
+    if not 'beta' in coefficients:
+        coefficients = {'alpha': coefficients['alpha'], 'beta': coefficients['alpha']}
+
+    if isinstance(coefficients['alpha'], np.ndarray):
+        # stable sort: occupied first keeping the original order
+        reordered = {}
+        for spin in ['alpha', 'beta']:
+            n_orbitals = min(len(occupations[spin]), len(coefficients[spin]))
+            order = np.argsort(np.logical_not(occupations[spin][:n_orbitals]), kind='stable')
+            reordered[spin] = coefficients[spin][order]
+        return reordered
+
     alpha_coefficients = []
     non_occupied = []
     for occ, coeff in zip(occupations['alpha'], coefficients['alpha']):
@@ -217,9 +247,6 @@ def reorder_coefficients(occupations, coefficients):
     # non occupated attached at the end
     alpha_coefficients += non_occupied
 
-    if not 'beta' in coefficients:
-        coefficients['beta'] = coefficients['alpha']
-
     beta_coefficients = []
     non_occupied = []
     for occ, coeff in zip(occupations['beta'], coefficients['beta']):
@@ -236,8 +263,8 @@ def reorder_coefficients(occupations, coefficients):
 
 def get_occupied_electrons(configuration, structure):
     # works for closed shell only
-    alpha_e = np.sum([int(c) for c in configuration['alpha']])
-    beta_e = np.sum([int(c) for c in configuration['beta']])
+    alpha_e = sum([int(c) for c in configuration['alpha']])
+    beta_e = sum([int(c) for c in configuration['beta']])
     hole = 0 if configuration['hole'] == '' else 1
     part = 0 if configuration['part'] == '' else 1
 
@@ -320,13 +347,13 @@ def get_occupated_list(configuration, structure, total_orbitals):
     vector_beta = [1] * occupied_orbitals + [int(c) for c in configuration['beta']] + [0] * n_extra
 
     if configuration['hole'] is not '':
-        if np.sum(vector_alpha) > np.sum(vector_beta):
+        if sum(vector_alpha) > sum(vector_beta):
             vector_alpha[int(configuration['hole']) - 1] = 0
         else:
             vector_beta[int(configuration['hole']) - 1] = 0
 
     if configuration['part'] is not '':
-        if np.sum(vector_alpha) < np.sum(vector_beta):
+        if sum(vector_alpha) < sum(vector_beta):
             vector_alpha[int(configuration['part']) - 1] = 1
         else:
             vector_beta[int(configuration['part']) - 1] = 1
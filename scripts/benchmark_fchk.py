@@ -0,0 +1,91 @@
+# Compare the FCHK parser with the previous implementation (word by word search)
+# using synthetic FCHK files of increasing size
+#
+# usage:
+#   python benchmark_fchk.py <revision>     git revision with the implementation to compare with
+#                                           (e.g. the last commit before the single pass parser)
+from pyqchem import Structure
+from pyqchem.file_io import build_fchk, get_array_txt
+from pyqchem.parsers.parser_fchk import parser_fchk
+import numpy as np
+import time
+
+
+def generate_fchk(n_atoms, nato=False):
+    """
+    generate a FCHK file of a chain of carbon atoms with 10 basis functions per atom
+
+    :param n_atoms: number of atoms
+    :param nato: if True include natural orbitals
+    :return: FCHK file in plain text
+    """
+    structure = Structure(coordinates=[[0.0, 0.0, 1.4 * i] for i in range(n_atoms)],
+                          symbols=['C'] * n_atoms)
+
+    shell = lambda shell_type, n: {'shell_type': shell_type,
+                                   'p_exponents': np.linspace(0.1, 100, n).tolist(),
+                                   'con_coefficients': np.linspace(0.1, 0.9, n).tolist(),
+                                   'p_con_coefficients': [0.0] * n}
+
+    basis = {'name': 'synthetic',
+             'primitive_type': 'gaussian',
+             'atoms': [{'symbol': 'C', 'atomic_number': 6,
+                        'shells': [shell('s', 6), shell('s', 3), shell('p', 3), shell('s', 1), shell('p', 1)]}
+                       for _ in range(n_atoms)]}
+
+    nbas = 10 * n_atoms
+    coefficients = np.random.RandomState(0).uniform(-1, 1, (nbas, nbas))
+
+    txt_fchk = build_fchk({'structure': structure,
+                           'basis': basis,
+                           'coefficients': {'alpha': coefficients.tolist()},
+                           'mo_energies': {'alpha': np.linspace(-10, 10, nbas).tolist()}})
+
+    txt_fchk += get_array_txt('Overlap Matrix', 'R', np.identity(nbas)[np.tril_indices(nbas)])
+    if nato:
+        txt_fchk += get_array_txt('Alpha NATO coefficients', 'R', coefficients.flatten())
+        txt_fchk += get_array_txt('Alpha Natural Orbital occupancies', 'R', np.linspace(2, 0, nbas))
+
+    return txt_fchk
+
+
+if __name__ == '__main__':
+    import argparse
+    import types
+    from subprocess import check_output
+
+    parser = argparse.ArgumentParser(description='Compare the FCHK parser with a previous implementation')
+    parser.add_argument('revision', help='git revision with the previous implementation of the parser')
+    args = parser.parse_args()
+
+    # previous implementation of the parser (a relative revision such as HEAD~1 changes with each commit,
+    # so the revision is always given explicitly)
+    previous_parser = None
+    try:
+        source = check_output(['git', 'show', '{}:pyqchem/parsers/parser_fchk.py'.format(args.revision)])
+        previous_module = types.ModuleType('previous_parser_fchk')
+        exec(source, previous_module.__dict__)
+        previous_parser = previous_module.parser_fchk
+    except Exception:
+        print('previous parser not available in revision {}'.format(args.revision))
+
+    print(' atoms  nbas   size(MB)   parser(s)  previous(s)')
+    for n_atoms in [5, 10, 20, 40, 80, 200]:
+        txt_fchk = generate_fchk(n_atoms)
+
+        t = time.time()
+        parsed_data = parser_fchk(txt_fchk)
+        parser_time = time.time() - t
+
+        previous_time = None
+        # the previous parser is too slow for large files
+        if previous_parser is not None and n_atoms <= 40:
+            t = time.time()
+            previous_data = previous_parser(txt_fchk)
+            previous_time = time.time() - t
+            assert previous_data['coefficients'] == parsed_data['coefficients']
+            assert previous_data['overlap'] == parsed_data['overlap']
+            assert previous_data['basis'] == parsed_data['basis']
+
+        print('{:6} {:5} {:10.2f} {:11.3f} {:>12}'.format(n_atoms, 10 * n_atoms, len(txt_fchk)/1e6, parser_time,
+                                                          '{:.3f}'.format(previous_time) if previous_time else '-'))
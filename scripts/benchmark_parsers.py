@@ -0,0 +1,541 @@
+# Benchmark of the parsers using synthetic Q-Chem outputs of increasing size
+#
+# Baselines depend on the machine. The first step is always to record them (--save) in the machine used
+# to check the regressions (e.g. before applying the changes to be checked):
+#
+#   python benchmark_parsers.py --save          record the current timings as baselines
+#   python benchmark_parsers.py                 compare with the baselines (exit status 1 if regressions)
+#   python benchmark_parsers.py --large         include the largest outputs (e.g. FCHK with nbas = 3000)
+#   python benchmark_parsers.py --cases rasci cis
+#
+# A case is a regression if the ratio with respect to the baseline exceeds --tolerance and the difference
+# exceeds --min-delta (seconds), so that the noise of the fastest cases is not reported.
+#
+# Not included: the diabatization parsers (parser_diabatic, parser_diabatic_general), which need complete
+# diabatization outputs with several RAS-CI calculations.
+from pyqchem.parsers.parser_rasci import parser_rasci
+from pyqchem.parsers.parser_rasci_basic import basic_rasci
+from pyqchem.parsers.basic import basic_parser_qchem
+from pyqchem.parsers.parser_cis import basic_cis
+from pyqchem.parsers.parser_optimization import basic_optimization
+from pyqchem.parsers.parser_frequencies import basic_frequencies
+from pyqchem.parsers.parser_fchk import parser_fchk
+from benchmark_fchk import generate_fchk
+from itertools import combinations, product, islice
+from timeit import default_timer
+import numpy as np
+import multiprocessing
+import platform
+import json
+import os
+
+try:
+    import tracemalloc
+except ImportError:
+    # python 2
+    tracemalloc = None
+
+
+BASELINES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baselines.json')
+MACHINE_KEY = '_machine'
+
+
+def _molecule_section(symbols, coordinates):
+    return (['$molecule', '0 1'] +
+            ['{:2} {:15.10f} {:15.10f} {:15.10f}'.format(s, *c) for s, c in zip(symbols, coordinates)] +
+            ['$end', ''])
+
+
+def _active_strings(n_orbitals, n_electrons):
+    return [''.join(['1' if i in occupied else '0' for i in range(n_orbitals)])
+            for occupied in combinations(range(n_orbitals), n_electrons)]
+
+
+def _rasci_configurations(n_active, n_occupied, n_basis):
+    # active configurations, then hole configurations, then particle configurations
+    half = n_active // 2
+    for alpha, beta in product(_active_strings(n_active, half), repeat=2):
+        yield '', alpha, beta, ''
+    for hole in range(1, n_occupied + 1):
+        for alpha, beta in product(_active_strings(n_active, half + 1), _active_strings(n_active, half)):
+            yield str(hole), alpha, beta, ''
+    for part in range(n_occupied + n_active + 1, n_basis + 1):
+        for alpha, beta in product(_active_strings(n_active, half - 1), _active_strings(n_active, half)):
+            yield '', alpha, beta, str(part)
+
+
+def generate_rasci(n_states, n_configurations, n_active=6, n_occupied=3, n_virtual=10):
+    """
+    generate a RAS-CI output of a chain of hydrogen atoms (closed shell, half filled active space)
+
+    :param n_states: number of states
+    :param n_configurations: number of configurations of each state
+    :param n_active: number of active orbitals (even)
+    :param n_occupied: number of doubly occupied orbitals
+    :param n_virtual: number of virtual orbitals
+    :return: output in plain text
+    """
+    n_atoms = 2 * n_occupied + n_active
+    n_basis = n_occupied + n_active + n_virtual
+    symbols = ['H'] * n_atoms
+    coordinates = [[0.0, 0.0, 0.74 * i] for i in range(n_atoms)]
+
+    configurations = list(islice(_rasci_configurations(n_active, n_occupied, n_basis), n_configurations))
+    if len(configurations) < n_configurations:
+        raise ValueError('Only {} configurations available, increase n_active'.format(len(configurations)))
+
+    amplitudes = np.random.RandomState(0).normal(size=(n_states, n_configurations))
+    amplitudes /= np.linalg.norm(amplitudes, axis=1)[:, None]
+
+    lines = _molecule_section(symbols, coordinates)
+    lines += [' ' + '-' * 64,
+              '             Standard Nuclear Orientation (Angstroms)',
+              '    I     Atom           X                Y                Z',
+              ' ' + '-' * 64]
+    lines += ['    {:<6d} H   {:16.10f} {:16.10f} {:16.10f}'.format(i + 1, *c) for i, c in enumerate(coordinates)]
+    lines += [' ' + '-' * 64,
+              ' Molecular Point Group                 C1    NOp =  1',
+              ' Largest Abelian Subgroup              C1    NOp =  1',
+              ' There are        {0} alpha and        {0} beta electrons'.format(n_atoms // 2),
+              ' There are {} shells and {} basis functions'.format(n_atoms, n_basis),
+              '',
+              ' SCF   energy in the final basis set =      -10.0000000000',
+              ' Total energy in the final basis set =      -10.0000000000',
+              '',
+              '  ***************************************************',
+              '  *  RAS-CI Dimensions:                             *',
+              '  *                                                 *',
+              '  *  Active Elec.: {:3d} ({:2d},{:2d})   Active Orb.: {:3d}   *'.format(n_active, n_active // 2,
+                                                                              n_active // 2, n_active),
+              '  *  Doubly Occ. : {:3d}           Doubly Vir.: {:3d}   *'.format(n_occupied, n_virtual),
+              '  *  Frozen Occ. :   0           Frozen Vir.:   0   *',
+              '  *                                                 *',
+              '  *  Total CI configurations: {:9d}             * '.format(n_configurations),
+              '  *    Active configurations: {:9d}             * '.format(len([c for c in configurations
+                                                                             if c[0] == c[3] == ''])),
+              '  *      Hole configurations: {:9d}             * '.format(len([c for c in configurations
+                                                                             if c[0] != ''])),
+              '  *  Particle configurations: {:9d}             * '.format(len([c for c in configurations
+                                                                             if c[3] != ''])),
+              '  *                                                 *',
+              '  *   Requested states: {:6d}                      *'.format(n_states),
+              '  *  Spin multiplicity: Singlets                    *',
+              '  *                                                 *',
+              '  ***************************************************',
+              '']
+
+    for i in range(n_states):
+        lines += ['**************************************************',
+                  ' RAS-CI total energy for state {:3d}:    {:.12f}'.format(i + 1, -10.0 + 0.01 * i),
+                  '  Excitation energy (eV) = {:9.4f}'.format(0.272114 * i),
+                  '  Multiplicity: Singlet ',
+                  '  Dipole Moment: {:9.4f} X {:9.4f} Y {:9.4f} Z'.format(0.0, 0.0, 0.001 * i)]
+        if i > 0:
+            lines += ['  Trans. Moment: {:9.4f} X {:9.4f} Y {:9.4f} Z'.format(0.0, 0.0, 0.01 * i),
+                      '  Strength   : {:9.6f}'.format(0.0001 * i)]
+        lines += ['  Amplitudes : ',
+                  '  ',
+                  ' | HOLE  | ALPHA | BETA  | PART  |    AMPLITUDE ',
+                  '-' * 50]
+        lines += [' | {:>5} | {} | {} | {:>5} |  {:12.7f}'.format(hole, alpha, beta, part, amplitude)
+                  for (hole, alpha, beta, part), amplitude in zip(configurations, amplitudes[i])]
+        lines += ['-' * 50,
+                  '*** Contributions RASCI wfn    Active:  90.00',
+                  '                                 Hole:   8.00',
+                  '                                 Part:   2.00',
+                  '*** Unpaired Electrons',
+                  ' Yamaguchi Nd:         0.15',
+                  '  ']
+
+    lines += ['-' * 50,
+              ' Interstate Transition Properties',
+              '-' * 50]
+    for i in range(1, n_states):
+        lines += ['State A: Root  1',
+                  'State B: Root {:2d}'.format(i + 1),
+                  '  ',
+                  ' Norm of one-particle transition density matrix',
+                  '||gamma^AB||_total       =  {:.6f}'.format(0.9),
+                  '||gamma^AB||_symmetrized =  {:.6f}'.format(0.6),
+                  '||gamma^AB||_anti-symm   =  {:.6f}'.format(0.7),
+                  '  ',
+                  '**************************************************']
+    lines += ['-' * 50, '']
+
+    return '\n'.join(lines)
+
+
+def generate_cis(n_states, n_occupied=5, n_virtual=20):
+    """
+    generate a TDDFT/TDA output
+
+    :param n_states: number of excited states
+    :param n_occupied: number of occupied orbitals
+    :param n_virtual: number of virtual orbitals
+    :return: output in plain text
+    """
+    lines = [' Molecular Point Group                 C1    NOp =  1',
+             ' Largest Abelian Subgroup              C1    NOp =  1',
+             ' There are        {0} alpha and        {0} beta electrons'.format(n_occupied),
+             ' There are       10 shells and       {} basis functions'.format(n_occupied + n_virtual),
+             ' Total energy in the final basis set =      -76.0000000000',
+             ' ---------------------------------------------------',
+             '         TDDFT/TDA Excitation Energies',
+             ' ---------------------------------------------------',
+             '']
+
+    for i in range(n_states):
+        lines += [' Excited state {:3d}: excitation energy (eV) = {:10.4f}'.format(i + 1, 7.0 + 0.01 * i),
+                  '    Total energy for state {:3d}:            {:15.8f} au'.format(i + 1, -76.0 + 0.01 * i),
+                  '    Multiplicity: {}'.format('Singlet' if i % 2 else 'Triplet'),
+                  '    Trans. Mom.:  {:.4f} X   {:.4f} Y  {:.4f} Z'.format(0.1, 0.2, 0.3 + 0.001 * i),
+                  '    Strength   :     {:.10f}'.format(0.001 * i)]
+        for j in range(min(n_virtual, 10)):
+            lines.append('    D({:3d}) --> V({:3d}) amplitude = {:8.4f}'.format(n_occupied - j % n_occupied, j + 1,
+                                                                             0.9 / (j + 1)))
+        lines.append('')
+
+    lines += [' ---------------------------------------------------', '']
+
+    return '\n'.join(lines)
+
+
+def generate_optimization(n_cycles, n_atoms=10):
+    """
+    generate a geometry optimization output of a chain of carbon atoms
+
+    :param n_cycles: number of optimization cycles
+    :param n_atoms: number of atoms
+    :return: output in plain text
+    """
+    symbols = ['C'] * n_atoms
+    coordinates = np.array([[0.0, 0.0, 1.5 * i] for i in range(n_atoms)])
+
+    def coordinates_section(coordinates):
+        return (['                       Coordinates (Angstroms)',
+                 '     ATOM                X               Y               Z'] +
+                ['  {:4d}  C    {:16.10f}{:16.10f}{:16.10f}'.format(i + 1, *c) for i, c in enumerate(coordinates)])
+
+    lines = _molecule_section(symbols, coordinates)
+    for i in range(n_cycles):
+        step_coordinates = coordinates * (1 - 0.1 / (i + 1))
+        lines += ['   Optimization Cycle: {:3d}'.format(i + 1), '']
+        lines += coordinates_section(step_coordinates)
+        lines += ['   Point Group: c1   Number of degrees of freedom: {:5d}'.format(3 * n_atoms - 6),
+                  '',
+                  '',
+                  '   Energy is  {:.9f}'.format(-380.0 - 0.1 / (i + 1)),
+                  '',
+                  ' Minimum search - taking simple RFO step',
+                  ' Searching for Lamda that Minimizes Along All modes',
+                  ' Value Taken    Lamda =  -0.18863378',
+                  ' Step Taken.  Stepsize is  0.300000',
+                  '',
+                  '                             Maximum     Tolerance    Cnvgd?',
+                  '         Gradient     {:14.6f}      0.000300      NO'.format(0.1 / (i + 1)),
+                  '         Displacement {:14.6f}      0.001200      NO'.format(0.2 / (i + 1)),
+                  '         Energy change  {:12.6f}      0.000001      NO'.format(0.01 / (i + 1)),
+                  '']
+
+    lines += [' Final energy is   {:.13f}'.format(-380.0 - 0.1 / n_cycles),
+              '',
+              '',
+              ' ******************************',
+              ' **  OPTIMIZATION CONVERGED  **',
+              ' ******************************',
+              '']
+    lines += coordinates_section(coordinates * (1 - 0.1 / n_cycles))
+    lines += ['']
+
+    return '\n'.join(lines)
+
+
+def generate_frequencies(n_atoms):
+    """
+    generate a frequencies output of a chain of carbon atoms
+
+    :param n_atoms: number of atoms
+    :return: output in plain text
+    """
+    lines = _molecule_section(['C'] * n_atoms, [[0.0, 0.0, 1.4 * i] for i in range(n_atoms)])
+    lines += [' Total energy in the final basis set =      -76.0000000000',
+              '',
+              ' **                       VIBRATIONAL ANALYSIS                        **',
+              '']
+
+    n_modes = 3 * n_atoms - 6
+    for k in range(0, n_modes, 3):
+        modes = range(k, min(k + 3, n_modes))
+        columns = lambda value: ''.join(['{:>23}'.format(value(i)) for i in modes])
+        lines += [' Mode:       ' + columns(lambda i: i + 1),
+                  ' Frequency:  ' + columns(lambda i: '{:.2f}'.format(100 + i)),
+                  ' Force Cnst: ' + columns(lambda i: '{:.4f}'.format(0.1 * i)),
+                  ' Red. Mass:  ' + columns(lambda i: '{:.4f}'.format(1 + 0.01 * i)),
+                  ' IR Active:  ' + columns(lambda i: 'YES'),
+                  ' IR Intens:  ' + columns(lambda i: '{:.3f}'.format(i)),
+                  ' Raman Active: ' + columns(lambda i: 'YES'),
+                  '               ' + '        '.join(['X      Y      Z'] * len(modes))]
+        for a in range(n_atoms):
+            lines.append(' C    ' + '  '.join(['{:6.3f} {:6.3f} {:6.3f}'.format(0.001 * a, -0.001 * i, 0.01)
+                                               for i in modes]))
+        lines.append('')
+
+    lines += [' STANDARD THERMODYNAMIC QUANTITIES', '']
+
+    return '\n'.join(lines)
+
+
+def generate_scf(n_atoms):
+    """
+    generate a SCF output (orbital energies, Mulliken charges and multipole moments) of a chain of carbon atoms
+
+    :param n_atoms: number of atoms
+    :return: output in plain text
+    """
+    n_occupied = 3 * n_atoms
+    n_basis = 10 * n_atoms
+    energies = np.linspace(-11.0, 2.0, n_basis)
+
+    def energies_section(energies):
+        # 8 energies per line, each line followed by the symmetry labels
+        lines = []
+        for k in range(0, len(energies), 8):
+            lines += [' ' + ''.join(['{:9.3f}'.format(e) for e in energies[k:k + 8]]),
+                      '       ' + '      '.join(['{:3d} A'.format(k + i + 1) for i in range(len(energies[k:k + 8]))])]
+        return lines
+
+    lines = _molecule_section(['C'] * n_atoms, [[0.0, 0.0, 1.4 * i] for i in range(n_atoms)])
+    lines += [' Total energy in the final basis set =      -380.0000000000',
+              '',
+              ' ' + '-' * 62,
+              '',
+              '                    Orbital Energies (a.u.)',
+              ' ' + '-' * 62,
+              '',
+              ' Alpha MOs',
+              ' -- Occupied --']
+    lines += energies_section(energies[:n_occupied])
+    lines += [' -- Virtual --']
+    lines += energies_section(energies[n_occupied:])
+    lines += [' ' + '-' * 62,
+              '',
+              '          Ground-State Mulliken Net Atomic Charges',
+              '',
+              '     Atom                 Charge (a.u.)',
+              '  ' + '-' * 40]
+    lines += ['  {:5d} C              {:12.6f}'.format(i + 1, 0.01 * (-1) ** i) for i in range(n_atoms)]
+    lines += ['  ' + '-' * 40,
+              '  Sum of atomic charges =     0.000000',
+              '',
+              ' ' + '-' * 65,
+              '                    Cartesian Multipole Moments',
+              ' ' + '-' * 65,
+              '    Charge (ESU x 10^10)',
+              '                 0.0000',
+              '    Dipole Moment (Debye)',
+              '         X       0.0000      Y       0.0000      Z      -0.0100',
+              '       Tot       0.0100',
+              '    Quadrupole Moments (Debye-Ang)',
+              '        XX      -1.8954     XY       0.0000     YY      -1.8954',
+              '        XZ       0.0000     YZ       0.0000     ZZ      -1.0027',
+              '    Octopole Moments (Debye-Ang^2)',
+              '       XXX       0.0000    XXY       0.0000    XYY       0.0000',
+              '       YYY       0.0000    XXZ      -0.0000    XYZ       0.0000',
+              '       YYZ      -0.0000    XZZ       0.0000    YZZ       0.0000',
+              '       ZZZ      -0.0000',
+              ' ' + '-' * 65,
+              '']
+
+    return '\n'.join(lines)
+
+
+# benchmark cases: generator, parser, parameters of the parser, sizes (arguments of the generator)
+CASES = {'rasci': {'generator': generate_rasci,
+                   'parser': parser_rasci,
+                   'parameters': {},
+                   'sizes': [(10, 100), (50, 400), (100, 1000)],
+                   'large_sizes': [(200, 4000)]},
+         # basic_rasci reads at most 10000 characters of each state (about 150 configurations)
+         'rasci_basic': {'generator': generate_rasci,
+                         'parser': basic_rasci,
+                         'parameters': {},
+                         'sizes': [(10, 50), (100, 50), (1000, 50)],
+                         'large_sizes': [(2000, 100)]},
+         # configurations returned as a ConfigurationTable (columns of arrays instead of a dictionary per row)
+         'rasci_table': {'generator': generate_rasci,
+                         'parser': parser_rasci,
+                         'parameters': {'configuration_table': True},
+                         'sizes': [(10, 100), (50, 400), (100, 1000)],
+                         'large_sizes': [(200, 4000)]},
+         'rasci_energies': {'generator': generate_rasci,
+                            'parser': parser_rasci,
+                            'parameters': {'fields': ['excited_states.total_energy']},
+                            'sizes': [(10, 100), (50, 400), (100, 1000)],
+                            'large_sizes': [(200, 4000)]},
+         'cis': {'generator': generate_cis,
+                 'parser': basic_cis,
+                 'parameters': {},
+                 'sizes': [(100,), (500,), (2000,)],
+                 'large_sizes': [(10000,)]},
+         'optimization': {'generator': generate_optimization,
+                          'parser': basic_optimization,
+                          'parameters': {},
+                          'sizes': [(10,), (100,), (500,)],
+                          'large_sizes': [(2000, 50)]},
+         'scf': {'generator': generate_scf,
+                 'parser': basic_parser_qchem,
+                 'parameters': {},
+                 'sizes': [(100,), (1000,), (10000,)],
+                 'large_sizes': [(50000,)]},
+         'frequencies': {'generator': generate_frequencies,
+                         'parser': basic_frequencies,
+                         'parameters': {},
+                         'sizes': [(10,), (40,), (100,)],
+                         'large_sizes': [(300,)]},
+         # generate_fchk uses 10 basis functions per atom (size: nbas/10)
+         'fchk': {'generator': generate_fchk,
+                  'parser': parser_fchk,
+                  'parameters': {},
+                  'sizes': [(10,), (50,), (100,)],
+                  'large_sizes': [(300,)]},
+         'fchk_arrays': {'generator': generate_fchk,
+                         'parser': parser_fchk,
+                         'parameters': {'as_arrays': True},
+                         'sizes': [(10,), (50,), (100,)],
+                         'large_sizes': [(300,)]}}
+
+
+def measure(parser, output, parameters, repeat=3):
+    """
+    measure the time and the memory used by a parser
+
+    :param parser: parser function
+    :param output: output to parse
+    :param parameters: parameters of the parser
+    :param repeat: number of repetitions (the minimum time is used)
+    :return: time in seconds, peak of memory allocated during the parsing in bytes (None if not available)
+    """
+    times = []
+    for _ in range(repeat):
+        t = default_timer()
+        parser(output, **parameters)
+        times.append(default_timer() - t)
+
+    # memory is measured in a separated run (tracing the allocations slows down the parser)
+    peak_memory = None
+    if tracemalloc is not None:
+        tracemalloc.start()
+        parser(output, **parameters)
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    return min(times), peak_memory
+
+
+def get_machine():
+    """
+    get a description of the machine (the baselines are only meaningful in the machine they were recorded)
+
+    :return: description in plain text
+    """
+    return '{} {} ({} cores, python {})'.format(platform.node(), platform.machine(), multiprocessing.cpu_count(),
+                                               platform.python_version())
+
+
+def run_benchmark(cases=None, large=False, repeat=3, baselines=None, tolerance=1.5, min_delta=0.01,
+                  min_memory_delta=1e6):
+    """
+    run the benchmark cases and compare the results with the baselines
+
+    :param cases: list of case names (None: all)
+    :param large: if True include the large sizes
+    :param repeat: number of repetitions of each measure
+    :param baselines: dictionary of baselines ({key: {'time': t, 'peak_memory': m}})
+    :param tolerance: maximum ratio with respect to the baselines
+    :param min_delta: minimum increase of time (seconds) to report a regression
+    :param min_memory_delta: minimum increase of peak memory (bytes) to report a regression
+    :return: dictionary of results ({key: {'size': bytes, 'time': t, 'peak_memory': m}}), list of regressions
+    """
+    if baselines is None:
+        baselines = {}
+
+    results = {}
+    regressions = []
+
+    print('{:16} {:>12} {:>9} {:>10} {:>10} {:>7} {:>10}  {}'.format('case', 'arguments', 'MB', 'time(s)', 'base(s)',
+                                                                   'ratio', 'peak(MB)', 'status'))
+    for name in sorted(CASES) if cases is None else cases:
+        case = CASES[name]
+        for size in case['sizes'] + (case['large_sizes'] if large else []):
+            key = '{}:{}'.format(name, 'x'.join([str(s) for s in size]))
+            output = case['generator'](*size)
+            time, peak_memory = measure(case['parser'], output, case['parameters'], repeat=repeat)
+            results[key] = {'size': len(output), 'time': time, 'peak_memory': peak_memory}
+
+            status = 'ok'
+            ratio = None
+            if key in baselines:
+                ratio = time / baselines[key]['time']
+                if ratio > tolerance and time - baselines[key]['time'] > min_delta:
+                    status = 'SLOWER'
+                base_memory = baselines[key].get('peak_memory')
+                if (peak_memory is not None and base_memory and peak_memory / float(base_memory) > tolerance and
+                        peak_memory - base_memory > min_memory_delta):
+                    status = 'MORE MEMORY' if status == 'ok' else status + ', MORE MEMORY'
+                if status != 'ok':
+                    regressions.append(key)
+            else:
+                status = 'no baseline'
+
+            print('{:16} {:>12} {:9.2f} {:10.4f} {:>10} {:>7} {:>10}  {}'.format(
+                name, 'x'.join([str(s) for s in size]), len(output) / 1e6, time,
+                '{:.4f}'.format(baselines[key]['time']) if key in baselines else '-',
+                '{:.2f}'.format(ratio) if ratio is not None else '-',
+                '{:.2f}'.format(peak_memory / 1e6) if peak_memory is not None else '-',
+                status))
+
+    return results, regressions
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description='Benchmark of the parsers using synthetic outputs')
+    parser.add_argument('--cases', nargs='+', choices=sorted(CASES), help='cases to run (default: all)')
+    parser.add_argument('--large', action='store_true', help='include the large outputs')
+    parser.add_argument('--repeat', type=int, default=3, help='number of repetitions of each measure')
+    parser.add_argument('--tolerance', type=float, default=1.5,
+                        help='maximum ratio of time/memory with respect to the baselines')
+    parser.add_argument('--min-delta', type=float, default=0.01,
+                        help='minimum increase of time (seconds) to report a regression')
+    parser.add_argument('--baselines', default=BASELINES_FILE, help='baselines file (JSON)')
+    parser.add_argument('--save', action='store_true', help='save the results as baselines')
+    args = parser.parse_args()
+
+    baselines = {}
+    if os.path.isfile(args.baselines):
+        with open(args.baselines) as f:
+            baselines = json.load(f)
+
+    machine = baselines.pop(MACHINE_KEY, None)
+    if not args.save and machine != get_machine():
+        print('Warning: baselines recorded in a different machine ({}), record them first with --save\n'.format(
+            machine if machine is not None else 'unknown'))
+
+    results, regressions = run_benchmark(cases=args.cases, large=args.large, repeat=args.repeat,
+                                         baselines=None if args.save else baselines,
+                                         tolerance=args.tolerance, min_delta=args.min_delta)
+
+    if args.save:
+        if machine != get_machine():
+            # baselines of other machines are not comparable
+            baselines = {}
+        baselines.update(results)
+        baselines[MACHINE_KEY] = get_machine()
+        with open(args.baselines, 'w') as f:
+            json.dump(baselines, f, indent=1, sort_keys=True)
+        print('baselines written to {}'.format(args.baselines))
+    elif regressions:
+        print('Regressions found: {}'.format(', '.join(regressions)))
+        sys.exit(1)
@@ -0,0 +1,36 @@
+from pyqchem import QchemInput, Structure
+from pyqchem.qchem_core import run_batch
+from pyqchem.parsers.basic import basic_parser_qchem
+import numpy as np
+
+
+# define a scan of the H-H distance
+distances = np.arange(0.5, 2.0, 0.1)
+
+input_list = []
+for distance in distances:
+    molecule = Structure(coordinates=[[0.0, 0.0, 0.0],
+                                      [0.0, 0.0, distance]],
+                         symbols=['H', 'H'],
+                         charge=0,
+                         multiplicity=1)
+
+    input_list.append(QchemInput(molecule,
+                                 jobtype='sp',
+                                 exchange='hf',
+                                 basis='6-31G'))
+
+# run 4 calculations at a time using 2 threads each
+data_list = run_batch(input_list,
+                      max_workers=4,
+                      processors_per_job=2,
+                      parser=basic_parser_qchem)
+
+print('  distance   scf energy (H)')
+for distance, data in zip(distances, data_list):
+    print('{:10.3f} {:15.8f}'.format(distance, data['scf_energy']))
+
+# get the outputs as they finish
+for i, data in run_batch(input_list, max_workers=4, processors_per_job=2,
+                         parser=basic_parser_qchem, ordered=False):
+    print('calculation {} finished: {:15.8f}'.format(i, data['scf_energy']))
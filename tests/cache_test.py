@@ -0,0 +1,196 @@
+from pyqchem.cache import CalculationData
+from collections import defaultdict, OrderedDict
+import tempfile
+import shutil
+import pickle
+import unittest
+import time
+import multiprocessing
+import os
+
+
+class _Properties(dict):
+    pass
+
+
+def _write_entries(directory, index):
+    calculation_data = CalculationData(directory)
+    for i in range(20):
+        calculation_data[(1000 + index, 'fullout')] = ['output {}'.format(i) * 1000, '']
+        calculation_data[(0, 'fullout')] = ['output {}'.format(index) * 1000, '']
+
+
+class CalculationDataTest(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.directory = os.path.join(self.work_dir, 'calculation_data.cache')
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir)
+
+    def test_store_retrieve(self):
+        calculation_data = CalculationData(self.directory)
+
+        self.assertFalse((123456, 'basic_parser_qchem') in calculation_data)
+        self.assertIsNone(calculation_data.get((123456, 'basic_parser_qchem')))
+
+        calculation_data[(123456, 'basic_parser_qchem')] = {'scf_energy': -1.1}
+        calculation_data[(123456, 'fullout')] = ['output', '']
+        calculation_data[(654321, 'basic_parser_qchem')] = {'scf_energy': -2.2}
+
+        self.assertTrue((123456, 'basic_parser_qchem') in calculation_data)
+        self.assertDictEqual(calculation_data[(123456, 'basic_parser_qchem')], {'scf_energy': -1.1})
+        self.assertListEqual(calculation_data[(123456, 'fullout')], ['output', ''])
+        self.assertEqual(len(calculation_data), 3)
+
+        # data is shared between objects using the same directory
+        calculation_data_2 = CalculationData(self.directory)
+        self.assertDictEqual(calculation_data_2[(654321, 'basic_parser_qchem')], {'scf_energy': -2.2})
+
+        del calculation_data[(654321, 'basic_parser_qchem')]
+        self.assertFalse((654321, 'basic_parser_qchem') in calculation_data_2)
+
+    def test_migration(self):
+        legacy_filename = os.path.join(self.work_dir, 'calculation_data.pkl')
+        legacy_data = {(123456, 'basic_parser_qchem'): {'scf_energy': -1.1},
+                       (123456, 'fchk'): {'coefficients': {'alpha': [[1.0, 0.0], [0.0, 1.0]]}}}
+
+        with open(legacy_filename, 'wb') as f:
+            pickle.dump(legacy_data, f, pickle.HIGHEST_PROTOCOL)
+
+        calculation_data = CalculationData(self.directory, legacy_filename=legacy_filename)
+        # nothing is imported until the data is accessed
+        self.assertFalse(os.path.isdir(self.directory))
+
+        self.assertEqual(sorted(calculation_data.keys()), sorted(legacy_data.keys()))
+        for key, value in legacy_data.items():
+            self.assertDictEqual(calculation_data[key], value)
+
+        # migration is only done once
+        calculation_data[(123456, 'basic_parser_qchem')] = {'scf_energy': -3.3}
+        calculation_data = CalculationData(self.directory, legacy_filename=legacy_filename)
+        self.assertDictEqual(calculation_data[(123456, 'basic_parser_qchem')], {'scf_energy': -3.3})
+
+        # unless the file is modified after the migration
+        legacy_data[(654321, 'basic_parser_qchem')] = {'scf_energy': -2.2}
+        with open(legacy_filename, 'wb') as f:
+            pickle.dump(legacy_data, f, pickle.HIGHEST_PROTOCOL)
+        os.utime(legacy_filename, (time.time() + 10, time.time() + 10))
+
+        calculation_data = CalculationData(self.directory, legacy_filename=legacy_filename)
+        self.assertDictEqual(calculation_data[(654321, 'basic_parser_qchem')], {'scf_energy': -2.2})
+        self.assertDictEqual(calculation_data[(123456, 'basic_parser_qchem')], {'scf_energy': -1.1})
+
+    def test_concurrent_write(self):
+        processes = [multiprocessing.Process(target=_write_entries, args=(self.directory, i)) for i in range(4)]
+        for process in processes:
+            process.start()
+
+        # entries read while being written are always complete
+        calculation_data = CalculationData(self.directory)
+        while any([process.is_alive() for process in processes]):
+            output = calculation_data.get((0, 'fullout'))
+            if output is not None:
+                self.assertEqual(len(output[0]), 8000)
+
+        for process in processes:
+            process.join()
+
+        self.assertEqual(len(calculation_data), 5)
+        self.assertEqual(len(os.listdir(os.path.join(self.directory, '0'))), 1)
+
+    def test_eviction(self):
+        calculation_data = CalculationData(self.directory, max_size=55000, keep=['parser_rasci'], compression=None)
+
+        calculation_data[(1, 'parser_rasci')] = 'x' * 10000
+        for i in range(2, 6):
+            calculation_data[(i, 'fullout')] = ['x' * 10000, '']
+            time.sleep(0.01)
+
+        # access the oldest fullout entry (3 and 4 become the least recently used)
+        calculation_data[(2, 'fullout')]
+        calculation_data[(6, 'fullout')] = ['x' * 10000, '']
+
+        self.assertTrue((1, 'parser_rasci') in calculation_data)
+        self.assertTrue((2, 'fullout') in calculation_data)
+        self.assertFalse((3, 'fullout') in calculation_data)
+        self.assertFalse((4, 'fullout') in calculation_data)
+        self.assertTrue((5, 'fullout') in calculation_data)
+        self.assertTrue((6, 'fullout') in calculation_data)
+
+        stats = calculation_data.get_stats()
+        self.assertLessEqual(stats['bytes'], 55000 * 0.9)
+        self.assertEqual(stats['evictions'], 2)
+        self.assertEqual(stats['keywords']['parser_rasci']['entries'], 1)
+
+    def test_size(self):
+        calculation_data = CalculationData(self.directory, max_size=55000, compression=None)
+
+        # replaced entries are only counted once
+        for i in range(10):
+            calculation_data[(1, 'fullout')] = ['x' * 10000, '']
+            calculation_data[(2, 'fullout')] = ['y' * 10000, '']
+        del calculation_data[(2, 'fullout')]
+
+        stats = calculation_data.get_stats()
+        self.assertEqual(stats['evictions'], 0)
+        self.assertEqual(stats['entries'], 1)
+        self.assertEqual(calculation_data._size, stats['bytes'])
+
+    def test_ttl(self):
+        calculation_data = CalculationData(self.directory, ttl={'fullout': 60})
+        calculation_data[(1, 'fullout')] = ['output', '']
+        calculation_data[(1, 'basic_parser_qchem')] = {'scf_energy': -1.1}
+
+        # set modification time to 2 minutes ago
+        entry_path = calculation_data._get_entry_path((1, 'fullout'))
+        os.utime(entry_path, (time.time() - 120, time.time() - 120))
+
+        self.assertFalse((1, 'fullout') in calculation_data)
+        self.assertIsNone(calculation_data.get((1, 'fullout')))
+        self.assertEqual(calculation_data[(1, 'basic_parser_qchem')], {'scf_energy': -1.1})
+
+        calculation_data.evict()
+        self.assertFalse(os.path.isfile(entry_path))
+
+        stats = calculation_data.get_stats()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['hit_rate'], 0.5)
+
+    def test_compression(self):
+        calculation_data = CalculationData(self.directory)
+
+        output = ''.join(['  {:3d}  {:15.10f}  converged\n'.format(i, -i * 0.1) for i in range(2000)])
+        electronic_structure = {'coefficients': {'alpha': [[0.1 * i + j for i in range(20)] for j in range(20)]},
+                                'mo_energies': {'alpha': [-0.5 * i for i in range(20)]},
+                                'number_of_electrons': {'alpha': 5, 'beta': 5},
+                                'basis': {'atoms': [{'symbol': 'O', 'shells': []}]}}
+
+        calculation_data[(1, 'fullout')] = [output, '']
+        calculation_data[(1, 'fchk')] = electronic_structure
+
+        entry_path = calculation_data._get_entry_path((1, 'fullout'))
+        self.assertLess(os.path.getsize(entry_path), len(output) / 10)
+
+        self.assertListEqual(calculation_data[(1, 'fullout')], [output, ''])
+        self.assertDictEqual(calculation_data[(1, 'fchk')], electronic_structure)
+        self.assertIsInstance(calculation_data[(1, 'fchk')]['coefficients']['alpha'][0][0], float)
+
+        # dictionary subclasses
+        data = defaultdict(list, {'energies': [-0.1 * i for i in range(100)]})
+        data['states'].append(OrderedDict([('b', 1), ('a', [0.5] * 100)]))
+        data['properties'] = _Properties(dipole=[0.1] * 100)
+        calculation_data[(1, 'basic_parser_qchem')] = data
+        data_loaded = calculation_data[(1, 'basic_parser_qchem')]
+        self.assertIsInstance(data_loaded, defaultdict)
+        self.assertIsInstance(data_loaded['states'][0], OrderedDict)
+        self.assertIsInstance(data_loaded['properties'], _Properties)
+        self.assertEqual(data_loaded, data)
+
+        # uncompressed entries can be read
+        calculation_data = CalculationData(self.directory, compression=None)
+        calculation_data[(2, 'fchk')] = electronic_structure
+        calculation_data = CalculationData(self.directory)
+        self.assertDictEqual(calculation_data[(2, 'fchk')], electronic_structure)
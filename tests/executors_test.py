@@ -0,0 +1,79 @@
+from pyqchem import Structure, QchemInput
+from pyqchem.qchem_core import get_output_from_qchem, run_batch
+from pyqchem.executors import QueueExecutor
+from pyqchem.errors import OutputError
+import fake_qchem
+import tempfile
+import shutil
+import unittest
+import sys
+import os
+
+
+class QueueExecutorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        fake_qchem.use_temporary_calculation_data(self)
+
+        # calculations with sto-3g basis are killed (see fake_qchem)
+        qchem_dir = os.path.join(self.work_dir, 'qchem')
+        fake_qchem.install(qchem_dir)
+        bin_dir = os.path.join(qchem_dir, 'bin')
+
+        scheduler_dir = os.path.join(self.work_dir, 'scheduler')
+        os.mkdir(scheduler_dir)
+        scheduler = 'FAKE_SCHEDULER_DIR={} {} {}'.format(scheduler_dir, sys.executable,
+                                                         os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                                                      'fake_scheduler.py')))
+
+        self.executor = QueueExecutor('slurm', precommand=['export PATH={}:$PATH'.format(bin_dir)],
+                                      poll_interval=0.1,
+                                      submit_command=scheduler + ' submit',
+                                      status_command=scheduler + ' status {job_id}',
+                                      cancel_command=scheduler + ' cancel {job_id}')
+
+        molecule = Structure(coordinates=[[0.0, 0.0, 0.0],
+                                          [0.0, 0.0, 0.74]],
+                             symbols=['H', 'H'])
+        self.inputs = [QchemInput(molecule, jobtype='sp', exchange='hf', basis=basis)
+                       for basis in ['6-31g', 'cc-pvdz', 'def2-svp', 'sto-3g']]
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir)
+
+    def test_job_script(self):
+        jobs = [('job_{}.inp'.format(i), '/scratch/job_{}'.format(i), 'job_{}.fchk'.format(i)) for i in range(3)]
+
+        job_script = QueueExecutor('pbs', options=['-q short']).get_job_script(jobs, processors=4)
+        self.assertIn('#PBS -J 0-2', job_script)
+        self.assertIn('#PBS -q short', job_script)
+        self.assertIn('#PBS -l ncpus=4', job_script)
+        self.assertIn('TASK_ID=${PBS_ARRAY_INDEX:-0}', job_script)
+
+        job_script = QueueExecutor('slurm').get_job_script(jobs[:1])
+        self.assertNotIn('--array', job_script)
+
+    def test_array_job(self):
+        outputs = run_batch(self.inputs[:3], executor=self.executor, scratch=self.work_dir,
+                            parser=fake_qchem.energy_parser, force_recalculation=True)
+        self.assertListEqual(outputs, [{'scf_energy': -5.0}, {'scf_energy': -7.0}, {'scf_energy': -8.0}])
+
+        output = get_output_from_qchem(self.inputs[0], executor=self.executor, scratch=self.work_dir,
+                                       force_recalculation=True)
+        self.assertIn(self.inputs[0].get_txt(), output)
+
+        # killed calculation (the other calculations of the array job finish)
+        finished = []
+        with self.assertRaises(OutputError):
+            for i, output in run_batch(self.inputs, executor=self.executor, scratch=self.work_dir,
+                                       parser=fake_qchem.energy_parser, force_recalculation=True, ordered=False):
+                finished.append(i)
+        self.assertListEqual(sorted(finished), [0, 1, 2])
+
+        with self.assertRaises(ValueError):
+            run_batch(self.inputs, executor=self.executor, scratch=self.work_dir, force_recalculation=True,
+                      read_fchk=True, fchk_file='electronic_structure.fchk')
+
+        # the work directories and job scripts are removed
+        self.assertListEqual(sorted(os.listdir(self.work_dir)), ['qchem', 'scheduler'])
@@ -0,0 +1,118 @@
+# Local stand-in of the Q-Chem binary ($QC/exe/qcprog.exe) to test the local calculations without Q-Chem.
+# The fake binary prints the input, the number of threads, the SCF energy and the final message of Q-Chem:
+#
+# - the energy is minus the number of characters of the basis name (e.g. 6-31g: -5.0)
+# - the FCHK file of H2 is written in $GUIFILE if the input requests it (gui)
+# - calculations with sto-3g basis fail
+# - calculations with 6-311g basis wait until they are killed (the pid of the sleep process is logged)
+# - calculations with 3-21g basis report that SCF failed to converge and finish 2 seconds later
+#
+# The qchem command of the compute nodes (bin/qchem -nt n input) runs the fake binary. It kills the job task
+# that calls it if the basis is sto-3g (the calculation does not finish).
+#
+# If $FAKE_QCHEM_LOG is defined, the start and the end of each calculation are written in this file.
+# If $FAKE_QCHEM_DELAY is defined, each calculation takes this time (seconds)
+from pyqchem import Structure
+from pyqchem.file_io import build_fchk
+from pyqchem.qchem_core import redefine_calculation_data_filename
+import tempfile
+import shutil
+import os
+
+
+qcprog = """#!/bin/sh
+log() {{ if [ -n "$FAKE_QCHEM_LOG" ]; then echo "$1 $$" >> "$FAKE_QCHEM_LOG"; fi; }}
+log start
+if [ -n "$FAKE_QCHEM_DELAY" ]; then sleep "$FAKE_QCHEM_DELAY"; fi
+if grep -q 'basis sto-3g' "$1"; then echo ' Q-Chem fatal error occurred in module scf'; log end; exit 1; fi
+if grep -q 'basis 6-311g' "$1"; then
+    sleep 60 &
+    if [ -n "$FAKE_QCHEM_LOG" ]; then echo "sleep $!" >> "$FAKE_QCHEM_LOG"; fi
+    wait
+fi
+cat "$1"
+echo " Number of threads: $QCTHREADS"
+if grep -q 'basis 3-21g' "$1"; then echo ' SCF failed to converge'; sleep 2; fi
+basis=$(grep '^basis ' "$1" | cut -d' ' -f2)
+echo " SCF   energy in the final basis set =     -${{#basis}}.0 "
+echo " Total energy in the final basis set =     -${{#basis}}.0 "
+if grep -q '^gui ' "$1"; then cp '{fchk}' "$GUIFILE"; fi
+log end
+echo "        *  Thank you very much for using Q-Chem.  Have a nice day.  *"
+"""
+
+qchem_command = """#!/bin/sh
+if [ "$1" = "-nt" ] || [ "$1" = "-np" ]; then export QCTHREADS="$2"; shift 2; fi
+if grep -q 'basis sto-3g' "$1"; then kill -9 $PPID; exit; fi
+exec '{qcprog}' "$1" "$(pwd)"
+"""
+
+electronic_structure = {'structure': Structure(coordinates=[[0.0, 0.0, 0.0],
+                                                            [0.0, 0.0, 0.74]],
+                                               symbols=['H', 'H']),
+                        'basis': {'name': 'STO-3G',
+                                  'primitive_type': 'gaussian',
+                                  'atoms': [{'symbol': 'H', 'atomic_number': 1,
+                                             'shells': [{'shell_type': 's',
+                                                         'functions': 1,
+                                                         'p_exponents': [3.42525091, 0.62391373, 0.1688554],
+                                                         'con_coefficients': [0.15432897, 0.53532814, 0.44463454],
+                                                         'p_con_coefficients': [0.0, 0.0, 0.0]}]}] * 2},
+                        'coefficients': {'alpha': [[0.54884227, 0.54884227],
+                                                   [1.21245192, -1.21245192]]},
+                        'mo_energies': {'alpha': [-0.57855386, 0.67114349]}}
+
+
+def install(directory):
+    """
+    write the fake Q-Chem installation in directory (use it as $QC, the qchem command is in directory/bin)
+
+    :param directory: directory
+    """
+    os.makedirs(os.path.join(directory, 'exe'))
+    os.makedirs(os.path.join(directory, 'bin'))
+
+    fchk = os.path.join(directory, 'h2.fchk')
+    with open(fchk, 'w') as f:
+        f.write(build_fchk(electronic_structure))
+
+    binary = os.path.join(directory, 'exe', 'qcprog.exe')
+    with open(binary, 'w') as f:
+        f.write(qcprog.format(fchk=fchk))
+    os.chmod(binary, 0o755)
+
+    command = os.path.join(directory, 'bin', 'qchem')
+    with open(command, 'w') as f:
+        f.write(qchem_command.format(qcprog=binary))
+    os.chmod(command, 0o755)
+
+
+def use_temporary_calculation_data(test_case):
+    """
+    store the calculation data of a test in a temporary directory (removed at the end of the test)
+
+    :param test_case: unittest TestCase
+    """
+    directory = tempfile.mkdtemp()
+    redefine_calculation_data_filename(os.path.join(directory, 'calculation_data.pkl'))
+    test_case.addCleanup(shutil.rmtree, directory)
+    test_case.addCleanup(redefine_calculation_data_filename, 'calculation_data.pkl')
+
+
+def energy_parser(output):
+    enum = output.find('Total energy in the final basis set')
+    return {'scf_energy': float(output[enum:enum+100].split()[8])}
+
+
+def is_running(pid):
+    try:
+        os.kill(pid, 0)
+    except OSError:
+        return False
+
+    # finished processes that have not been reaped (zombies)
+    try:
+        with open('/proc/{}/stat'.format(pid)) as f:
+            return f.read().split(')')[-1].split()[0] != 'Z'
+    except (IOError, OSError):
+        return True
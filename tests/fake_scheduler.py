@@ -0,0 +1,76 @@
+# Local stand-in of a SLURM batch scheduler to test the queue executor without a queue.
+# The tasks of the submitted jobs run immediately in background processes of this machine.
+#
+# usage:
+#   python fake_scheduler.py submit job_script.sh    (prints "Submitted batch job <job id>")
+#   python fake_scheduler.py status <job id>         (prints the job id if any task is running)
+#   python fake_scheduler.py cancel <job id>
+#
+# The state of the jobs is stored in the directory $FAKE_SCHEDULER_DIR
+import subprocess
+import signal
+import json
+import sys
+import os
+import re
+
+
+def _state_file(job_id):
+    return os.path.join(os.environ['FAKE_SCHEDULER_DIR'], '{}.json'.format(job_id))
+
+
+def _is_running(pid):
+    try:
+        os.kill(pid, 0)
+    except OSError:
+        return False
+
+    # finished processes that have not been reaped (zombies)
+    try:
+        with open('/proc/{}/stat'.format(pid)) as f:
+            return f.read().split(')')[-1].split()[0] != 'Z'
+    except (IOError, OSError):
+        return True
+
+
+def submit(script_file_name):
+    with open(script_file_name) as f:
+        script = f.read()
+
+    match = re.search('#SBATCH --array=0-([0-9]+)', script)
+    n_tasks = int(match.group(1)) + 1 if match is not None else 1
+
+    job_id = len(os.listdir(os.environ['FAKE_SCHEDULER_DIR'])) + 1000
+    pids = []
+    for task_id in range(n_tasks):
+        environment = dict(os.environ, SLURM_ARRAY_TASK_ID=str(task_id), SLURM_JOB_ID=str(job_id))
+        with open('slurm-{}_{}.out'.format(job_id, task_id), 'w') as log:
+            process = subprocess.Popen(['bash', script_file_name], stdout=log, stderr=log, env=environment,
+                                       preexec_fn=os.setsid)
+        pids.append(process.pid)
+
+    with open(_state_file(job_id), 'w') as f:
+        json.dump(pids, f)
+
+    print('Submitted batch job {}'.format(job_id))
+
+
+def status(job_id):
+    with open(_state_file(job_id)) as f:
+        pids = json.load(f)
+
+    if any([_is_running(pid) for pid in pids]):
+        print('{} fake pyqchem R'.format(job_id))
+
+
+def cancel(job_id):
+    with open(_state_file(job_id)) as f:
+        pids = json.load(f)
+
+    for pid in pids:
+        if _is_running(pid):
+            os.killpg(pid, signal.SIGKILL)
+
+
+if __name__ == '__main__':
+    {'submit': submit, 'status': status, 'cancel': cancel}[sys.argv[1]](sys.argv[2])
@@ -0,0 +1,166 @@
+from pyqchem import Structure
+from pyqchem.file_io import build_fchk, get_array_txt, write_electronic_structure, read_electronic_structure
+from pyqchem.parsers.parser_fchk import parser_fchk, FchkFile, _get_fchk_index, _read_fchk_section
+import numpy as np
+import tempfile
+import pickle
+import unittest
+import shutil
+import os
+
+try:
+    import h5py
+except ImportError:
+    h5py = None
+
+
+class FchkTest(unittest.TestCase):
+
+    def setUp(self):
+        molecule = Structure(coordinates=[[0.0, 0.0, 0.0],
+                                          [0.0, 0.0, 0.74]],
+                             symbols=['H', 'H'],
+                             charge=0,
+                             multiplicity=1)
+
+        basis = {'name': 'STO-3G',
+                 'primitive_type': 'gaussian',
+                 'atoms': [{'symbol': 'H', 'atomic_number': 1,
+                            'shells': [{'shell_type': 's',
+                                        'functions': 1,
+                                        'p_exponents': [3.42525091, 0.62391373, 0.1688554],
+                                        'con_coefficients': [0.15432897, 0.53532814, 0.44463454],
+                                        'p_con_coefficients': [0.0, 0.0, 0.0]}]}] * 2}
+
+        self.electronic_structure = {'structure': molecule,
+                                     'basis': basis,
+                                     'coefficients': {'alpha': [[0.54884227, 0.54884227],
+                                                                [1.21245192, -1.21245192]]},
+                                     'mo_energies': {'alpha': [-0.57855386, 0.67114349]}}
+
+    def test_parser_fchk(self):
+        txt_fchk = build_fchk(self.electronic_structure)
+        txt_fchk += get_array_txt('Overlap Matrix', 'R', [1.0, 0.6593, 1.0])
+
+        parsed_data = parser_fchk(txt_fchk)
+
+        np.testing.assert_allclose(parsed_data['structure'].get_coordinates(),
+                                   self.electronic_structure['structure'].get_coordinates(), atol=1e-7)
+        for key in ['coefficients', 'mo_energies']:
+            np.testing.assert_allclose(parsed_data[key]['alpha'], self.electronic_structure[key]['alpha'])
+
+        self.assertEqual(parsed_data['basis']['atoms'][1]['shells'][0]['p_exponents'],
+                         [3.42525091, 0.62391373, 0.1688554])
+        self.assertDictEqual(parsed_data['number_of_electrons'], {'alpha': 1, 'beta': 1})
+        self.assertListEqual(parsed_data['overlap'], [[1.0, 0.6593], [0.6593, 1.0]])
+
+        parsed_arrays = parser_fchk(txt_fchk, as_arrays=True)
+        for key in ['coefficients', 'mo_energies']:
+            self.assertIsInstance(parsed_arrays[key]['alpha'], np.ndarray)
+            self.assertEqual(parsed_arrays[key]['alpha'].dtype, np.float64)
+            np.testing.assert_array_equal(parsed_arrays[key]['alpha'], parsed_data[key]['alpha'])
+        np.testing.assert_array_equal(parsed_arrays['overlap'], parsed_data['overlap'])
+        self.assertEqual(parsed_arrays['basis'], parsed_data['basis'])
+
+    def test_empty_section(self):
+        # arrays without elements (N= 0) are not scalar values
+        txt_fchk = build_fchk(self.electronic_structure)
+        txt_fchk += get_array_txt('Empty array', 'R', [])
+        txt_fchk += get_array_txt('Overlap Matrix', 'R', [1.0, 0.6593, 1.0])
+
+        lines = txt_fchk.split('\n')
+        index = _get_fchk_index(lines)
+        empty_array = _read_fchk_section(lines, index['Empty array'][0])
+        self.assertIsInstance(empty_array, np.ndarray)
+        self.assertEqual(empty_array.size, 0)
+        self.assertEqual(_read_fchk_section(lines, index['Charge'][0]), 0)
+        self.assertListEqual(parser_fchk(txt_fchk)['overlap'], [[1.0, 0.6593], [0.6593, 1.0]])
+
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.fchk', delete=False) as f:
+            f.write(txt_fchk)
+        try:
+            with FchkFile(f.name) as fchk_file:
+                self.assertEqual(fchk_file.get_section('Empty array').size, 0)
+        finally:
+            os.remove(f.name)
+
+    def test_write_fchk(self):
+        electronic_structure = dict(self.electronic_structure)
+        electronic_structure['coefficients'] = {'alpha': np.array(self.electronic_structure['coefficients']['alpha']),
+                                                'beta': [[0.5, 0.5], [1.2, -1.2]]}
+        electronic_structure['mo_energies'] = {'alpha': self.electronic_structure['mo_energies']['alpha'],
+                                               'beta': [-0.5, 0.6]}
+        electronic_structure['overlap'] = [[1.0, 0.6593], [0.6593, 1.0]]
+        electronic_structure['scf_density'] = [[0.6, 0.6], [0.6, 0.6]]
+
+        txt_fchk = build_fchk(electronic_structure)
+        self.assertIn('Total SCF Density                          R   N=           3\n'
+                      '  6.00000000e-01  6.00000000e-01  6.00000000e-01\n', txt_fchk)
+
+        parsed_data = parser_fchk(txt_fchk)
+        self.assertListEqual(parsed_data['coefficients']['beta'], [[0.5, 0.5], [1.2, -1.2]])
+        self.assertListEqual(parsed_data['mo_energies']['beta'], [-0.5, 0.6])
+        self.assertListEqual(parsed_data['overlap'], [[1.0, 0.6593], [0.6593, 1.0]])
+
+    def test_fchk_file(self):
+        txt_fchk = build_fchk(self.electronic_structure)
+        txt_fchk += get_array_txt('Overlap Matrix', 'R', [1.0, 0.6593, 1.0])
+
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.fchk', delete=False) as f:
+            f.write(txt_fchk)
+
+        try:
+            parsed_data = parser_fchk(txt_fchk)
+            with FchkFile(f.name) as fchk_file:
+                self.assertListEqual(sorted(fchk_file.keys()), sorted(parsed_data.keys()))
+                for key in ['basis', 'coefficients', 'mo_energies', 'number_of_electrons', 'overlap']:
+                    self.assertEqual(fchk_file[key], parsed_data[key])
+                self.assertEqual(fchk_file['structure'].get_xyz(), parsed_data['structure'].get_xyz())
+
+                np.testing.assert_array_equal(fchk_file.get_section('Shell types'), [0, 0])
+                self.assertEqual(fchk_file.get_section('Number of basis functions'), 2)
+
+                with FchkFile(f.name, as_arrays=True) as fchk_arrays:
+                    np.testing.assert_array_equal(fchk_arrays['coefficients']['alpha'],
+                                                  parsed_data['coefficients']['alpha'])
+
+                with pickle.loads(pickle.dumps(fchk_file)) as fchk_file_copy:
+                    self.assertEqual(fchk_file_copy['mo_energies'], parsed_data['mo_energies'])
+
+            # the file is closed at the end of the with statement
+            self.assertTrue(fchk_file._file.closed)
+            self.assertTrue(fchk_file_copy._file.closed)
+        finally:
+            os.remove(f.name)
+
+    def _check_binary_round_trip(self, filename):
+        txt_fchk = build_fchk(self.electronic_structure)
+        txt_fchk += get_array_txt('Overlap Matrix', 'R', [1.0, 0.6593, 1.0])
+        parsed_data = parser_fchk(txt_fchk)
+        parsed_data['nato_occupancies_multi'] = [{'alpha': [2.0, 0.0]}, {'alpha': [1.9, 0.1]}]
+
+        # empty dictionaries and None values are kept
+        parsed_data['nato_coefficients'] = {}
+        parsed_data['nato_occupancies'] = None
+        parsed_data['nato_coefficients_multi'] = [{'alpha': [[1.0, 0.0], [0.0, 1.0]], 'beta': None}, {}, None]
+
+        work_dir = tempfile.mkdtemp()
+        try:
+            write_electronic_structure(os.path.join(work_dir, filename), parsed_data)
+            electronic_structure = read_electronic_structure(os.path.join(work_dir, filename))
+        finally:
+            shutil.rmtree(work_dir)
+
+        self.assertListEqual(sorted(electronic_structure.keys()), sorted(parsed_data.keys()))
+        for key in parsed_data:
+            if key != 'structure':
+                self.assertEqual(electronic_structure[key], parsed_data[key])
+        self.assertListEqual(electronic_structure['structure'].get_coordinates(),
+                             parsed_data['structure'].get_coordinates())
+
+    def test_binary_npz(self):
+        self._check_binary_round_trip('electronic_structure.npz')
+
+    @unittest.skipIf(h5py is None, 'h5py not installed')
+    def test_binary_hdf5(self):
+        self._check_binary_round_trip('electronic_structure.h5')
@@ -0,0 +1,53 @@
+from pyqchem.output_stream import OutputStream
+from pyqchem.parsers.parser_rasci import parser_rasci
+import unittest
+import pickle
+import io
+import os
+
+
+class OutputStreamTest(unittest.TestCase):
+
+    def setUp(self):
+        # stored output of a RAS-CI calculation (H2, 2 states)
+        with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'test_data_py3.pkl'), 'rb') as f:
+            calculation_data = pickle.load(f)
+
+        self.output = [value[0] for (_, keyword), value in sorted(calculation_data.items(), key=lambda item: item[0])
+                       if keyword == 'fullout' and 'RAS-CI total energy for state' in value[0]][0]
+
+    def test_sections(self):
+        sections = {'scf': [], 'rasci_state': []}
+        output_file = io.StringIO()
+        stream = OutputStream(output_file, callbacks={name: sections[name].append for name in sections})
+
+        for line in self.output.splitlines(True):
+            self.assertFalse(stream.feed(line))
+
+        self.assertEqual(output_file.getvalue(), self.output)
+        self.assertEqual(len(sections['scf']), 1)
+        self.assertIn('SCF   energy in the final basis set', sections['scf'][0])
+
+        # one section for each state with its energy and configurations
+        excited_states = parser_rasci(self.output)['excited_states']
+        self.assertEqual(len(sections['rasci_state']), len(excited_states))
+        for section, state in zip(sections['rasci_state'], excited_states):
+            self.assertTrue(section.startswith(' RAS-CI total energy for state'))
+            self.assertAlmostEqual(float(section.split('\n')[0].split()[-1]), state['total_energy'])
+            self.assertIn('AMPLITUDE', section)
+            self.assertTrue(section.rstrip('\n').endswith('*' * 50))
+
+        self.assertRaises(KeyError, OutputStream, io.StringIO(), callbacks={'cis_state': print})
+
+    def test_scf_failure(self):
+        lines = [' Cycle       Energy         DIIS error\n',
+                 '    1      -1.0911426742      7.63e-02\n',
+                 '   50      -1.0911426742      7.63e-02\n',
+                 ' SCF failed to converge\n',
+                 ' Q-Chem fatal error occurred in module scf\n']
+
+        stream = OutputStream(io.StringIO())
+        self.assertListEqual([stream.feed(line) for line in lines], [False, False, False, True, True])
+
+        stream = OutputStream(io.StringIO(), abort_on_scf_failure=False)
+        self.assertFalse(any([stream.feed(line) for line in lines]))
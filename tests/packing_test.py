@@ -0,0 +1,103 @@
+from pyqchem import Structure, QchemInput
+from pyqchem.qchem_core import run_packed, split_multijob_output
+from pyqchem.executors import Executor
+from pyqchem.errors import OutputError
+import fake_qchem
+import tempfile
+import shutil
+import unittest
+import re
+import os
+
+
+class FakeQchemExecutor(Executor):
+    """
+    stand-in of Q-Chem that runs multi-job inputs (Q-Chem stops at calculations with sto-3g basis).
+    The output of each job is the same as the one of the fake Q-Chem binary (see fake_qchem)
+    """
+
+    def __init__(self, log_file):
+        self._log_file = log_file
+
+    def run(self, input_file_name, work_dir, fchk_file, use_mpi=False, processors=1):
+        with open(self._log_file, 'a') as f:
+            f.write('{}\n'.format(input_file_name))
+
+        with open(os.path.join(work_dir, input_file_name)) as f:
+            jobs = f.read().split('@@@')
+
+        output = 'Welcome to Q-Chem\n'
+        for i, job in enumerate(jobs):
+            if i > 0:
+                output += '\n   Running Job {} of {} {}\n'.format(i + 1, len(jobs), input_file_name)
+            output += job
+            if 'sto-3g' in job:
+                return output + ' Q-Chem fatal error occurred in module scf\n', ''
+            basis = re.search('basis +(\\S+)', job, re.IGNORECASE).group(1)
+            output += ' Total energy in the final basis set =     -{}.0 \n'.format(len(basis))
+            output += ' Total job time:  0.01s(wall), 0.01s(cpu)\n'
+
+        output += '        *  Thank you very much for using Q-Chem.  Have a nice day.  *\n'
+        return output, ''
+
+
+class PackingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        fake_qchem.use_temporary_calculation_data(self)
+        self.log_file = os.path.join(self.work_dir, 'runs.log')
+        self.executor = FakeQchemExecutor(self.log_file)
+
+        molecule = Structure(coordinates=[[0.0, 0.0, 0.0],
+                                          [0.0, 0.0, 0.73]],
+                             symbols=['H', 'H'])
+        self.inputs = [QchemInput(molecule, jobtype='sp', exchange='hf', basis=basis)
+                       for basis in ['6-31g', 'cc-pvdz', 'sto-3g', 'def2-svp', 'def2-tzvp']]
+        self.energies = [{'scf_energy': -float(len(basis))}
+                         for basis in ['6-31g', 'cc-pvdz', 'sto-3g', 'def2-svp', 'def2-tzvp']]
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir)
+
+    def _n_runs(self):
+        if not os.path.isfile(self.log_file):
+            return 0
+        with open(self.log_file) as f:
+            return len(f.readlines())
+
+    def _write_input(self, input_list):
+        with open(os.path.join(self.work_dir, 'packed.inp'), 'w') as f:
+            f.write('@@@\n\n'.join([input_qchem.get_txt() for input_qchem in input_list]))
+        return 'packed.inp', self.work_dir, 'packed.fchk'
+
+    def test_split_output(self):
+        output, _ = self.executor.run(*self._write_input(self.inputs[:3]))
+        outputs = split_multijob_output(output, 4)
+
+        self.assertIsNone(outputs[3])
+        for job_output, input_qchem in zip(outputs[:2], self.inputs):
+            self.assertIn(input_qchem.get_txt(), job_output)
+            self.assertTrue(job_output.endswith('Have a nice day.  *\n'))
+        self.assertIn('fatal error', outputs[2])
+
+    def test_run_packed(self):
+        # calculations after the failed one run in a new pack
+        with self.assertRaises(OutputError):
+            run_packed(self.inputs, scratch=self.work_dir, executor=self.executor,
+                       parser=fake_qchem.energy_parser, force_recalculation=True)
+        self.assertEqual(self._n_runs(), 2)
+
+        # each calculation is stored separately (including those that finished before the failed one)
+        inputs = self.inputs[:2] + self.inputs[3:]
+        outputs = run_packed(inputs, scratch=self.work_dir, executor=self.executor, parser=fake_qchem.energy_parser)
+        self.assertListEqual(outputs, self.energies[:2] + self.energies[3:])
+        self.assertEqual(self._n_runs(), 2)
+
+        outputs = run_packed(inputs, pack_size=3, scratch=self.work_dir, executor=self.executor,
+                             parser=fake_qchem.energy_parser, force_recalculation=True)
+        self.assertListEqual(outputs, self.energies[:2] + self.energies[3:])
+        self.assertEqual(self._n_runs(), 4)
+
+        # the work directories are removed
+        self.assertListEqual(sorted(os.listdir(self.work_dir)), ['runs.log'])
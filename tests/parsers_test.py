@@ -0,0 +1,143 @@
+from pyqchem.parsers.support import OutputIndex, ConfigurationTable
+from pyqchem.parsers.batch import parse_outputs, ParsedOutputs
+from pyqchem.errors import ParserError
+from pyqchem.utils import search_bars
+import numpy as np
+import tempfile
+import shutil
+import pickle
+import unittest
+import os
+
+
+def _states_parser(output):
+    # minimal parser for the outputs written in ParseOutputsTest
+    enum = output.find('Total energy')
+    if enum < 0:
+        raise ParserError('_states_parser', 'Total energy not found')
+
+    return {'scf_energy': float(output[enum:].split()[2]),
+            'excited_states': [{'excitation_energy': float(line.split()[1])}
+                               for line in output.split('\n') if line.startswith('State')]}
+
+
+class OutputIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.output = ('header\n'
+                       ' --------------\n'
+                       ' State 1: energy 1.0\n'
+                       ' State 2: energy 2.0\n'
+                       ' **************\n'
+                       ' State 3: energy 3.0\n'
+                       ' --------------\n')
+
+    def test_find(self):
+        index = OutputIndex(self.output, ['State', '****', 'missing'])
+
+        self.assertEqual(index.find('State'), self.output.find('State'))
+        self.assertEqual(index.find('State', 50), self.output.find('State', 50))
+        self.assertEqual(index.find('****'), self.output.find('****'))
+        self.assertEqual(index.find('missing'), -1)
+        self.assertEqual(len(index.positions('State')), 3)
+
+    def test_sections(self):
+        index = OutputIndex(self.output, ['State', '****'])
+
+        sections = [self.output[ini:end].split()[0] for ini, end in index.sections('State', end_markers=['****'])]
+        self.assertListEqual(sections, ['1:', '2:', '3:'])
+
+        ini, end = index.sections('State', end_markers=['****'])[1]
+        self.assertEqual(self.output[ini:end], ' 2: energy 2.0\n ')
+
+    def test_search_bars(self):
+        bars = search_bars(self.output)
+        self.assertEqual(len(bars), 2)
+        self.assertListEqual(search_bars(self.output, n_bars=1), bars[:1])
+        self.assertListEqual(search_bars(self.output, from_position=bars[0] + 1), bars[1:])
+
+
+class ConfigurationTableTest(unittest.TestCase):
+
+    def setUp(self):
+        # 70 orbitals (2 words per spin)
+        self.configurations = []
+        for hole, alpha, beta, part, amplitude in [('', '1100', '1100', '', 0.9),
+                                                   ('3', '1100', '1110', '', -0.3),
+                                                   ('', '1010', '1100', '69', 0.1)]:
+            occupations = {'alpha': [1, 1, 1] + [int(c) for c in alpha] + [0] * 63,
+                           'beta': [1, 1, 1] + [int(c) for c in beta] + [0] * 63}
+            occupations['beta'][-2] = 1 if part != '' else 0
+            self.configurations.append({'hole': hole, 'alpha': alpha, 'beta': beta, 'part': part,
+                                        'amplitude': amplitude, 'occupations': occupations})
+
+    def test_list_access(self):
+        table = ConfigurationTable.from_list(self.configurations)
+
+        self.assertEqual(len(table), 3)
+        self.assertEqual(table.occupations_alpha.shape, (3, 2))
+        self.assertDictEqual(table[1], self.configurations[1])
+        self.assertDictEqual(table[-1], self.configurations[-1])
+        self.assertListEqual(list(table), self.configurations)
+        self.assertEqual(table[1:], self.configurations[1:])
+        self.assertListEqual(table.get_occupations('beta').tolist(),
+                             [c['occupations']['beta'] for c in self.configurations])
+        np.testing.assert_array_equal(table.amplitude, [0.9, -0.3, 0.1])
+
+        table = pickle.loads(pickle.dumps(table))
+        del table[0]
+        self.assertEqual(table, self.configurations[1:])
+
+
+class ParseOutputsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.filenames = []
+        for i, output in enumerate(['Total energy -1.0\nState 2.0\nState 3.0\n',
+                                    'Total energy -2.0\nState 4.0\n',
+                                    'Error: SCF failed\n']):
+            self.filenames.append(os.path.join(self.work_dir, 'output_{}.out'.format(i)))
+            with open(self.filenames[-1], 'w') as f:
+                f.write(output)
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir)
+
+    def test_parse_outputs(self):
+        filename = os.path.join(self.work_dir, 'parsed.npz')
+        parsed_outputs = parse_outputs(self.filenames, _states_parser, workers=2, filename=filename,
+                                       print_stats=False)
+
+        self.assertListEqual(parsed_outputs.filenames, self.filenames[:2])
+        self.assertListEqual(list(parsed_outputs.errors.keys()), [self.filenames[2]])
+        self.assertIsInstance(parsed_outputs.errors[self.filenames[2]], ParserError)
+        self.assertEqual(parsed_outputs.stats['files'], 3)
+
+        np.testing.assert_array_equal(parsed_outputs['scf_energy'], [-1.0, -2.0])
+        self.assertListEqual([float(e) if e is not None else None
+                              for e in parsed_outputs['excited_states/#1/excitation_energy']], [3.0, None])
+
+        parsed_outputs = ParsedOutputs.load(filename)
+        np.testing.assert_array_equal(parsed_outputs['excited_states/#0/excitation_energy'], [2.0, 4.0])
+        self.assertEqual(parsed_outputs['excited_states/#1/excitation_energy'][1], None)
+        self.assertEqual(parsed_outputs.errors[self.filenames[2]].message, 'Total energy not found')
+
+    def test_save_mixed_columns(self):
+        # fields with different number of dimensions or types in each output (e.g. irregular data kept as text)
+        parsed_outputs = ParsedOutputs()
+        parsed_outputs.append('a.out', {'value': np.array('[1.0, null]'), 'matrix': np.ones((2, 2))})
+        parsed_outputs.append('b.out', {'value': np.array([1.0, 2.0]), 'matrix': np.ones(3)})
+        parsed_outputs.append('c.out', {'matrix': np.ones((1, 3))})
+
+        filename = os.path.join(self.work_dir, 'parsed.npz')
+        parsed_outputs.save(filename)
+        loaded = ParsedOutputs.load(filename)
+
+        for name in ['value', 'matrix']:
+            for original, array in zip(parsed_outputs[name], loaded[name]):
+                if original is None:
+                    self.assertIsNone(array)
+                else:
+                    self.assertEqual(array.dtype.kind, original.dtype.kind)
+                    np.testing.assert_array_equal(array, original)
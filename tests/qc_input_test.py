@@ -0,0 +1,74 @@
+from pyqchem import Structure, QchemInput
+import numpy as np
+from copy import deepcopy
+import unittest
+
+
+class QchemInputHashTest(unittest.TestCase):
+
+    def setUp(self):
+        self.molecule = Structure(coordinates=[[0.0, 0.0, 0.0],
+                                               [0.0, 0.0, 0.74]],
+                                  symbols=['H', 'H'],
+                                  charge=0,
+                                  multiplicity=1)
+
+    def test_hash_invalidation(self):
+        qc_input = QchemInput(self.molecule, jobtype='sp', exchange='hf', basis='sto-3g')
+        input_hash = hash(qc_input)
+
+        # parameters that do not affect the results
+        qc_input.gui = 2
+        self.assertEqual(hash(qc_input), input_hash)
+
+        qc_input.update_input({'basis': '6-31G'})
+        self.assertNotEqual(hash(qc_input), input_hash)
+
+        # changes in the molecule
+        qc_input = QchemInput(self.molecule, jobtype='sp', exchange='hf', basis='sto-3g')
+        self.molecule.set_coordinates([[0.0, 0.0, 0.0],
+                                       [0.0, 0.0, 0.80]])
+        self.assertNotEqual(hash(qc_input), input_hash)
+
+        self.molecule.set_coordinates([[0.0, 0.0, 0.0],
+                                       [0.0, 0.0, 0.74]])
+        self.assertEqual(hash(qc_input), input_hash)
+
+    def test_hash_guess(self):
+        guess = {'alpha': np.identity(2).tolist(), 'beta': np.identity(2).tolist()}
+
+        qc_input = QchemInput(self.molecule, jobtype='sp', exchange='hf', basis='sto-3g', scf_guess=guess)
+        qc_input_array = QchemInput(self.molecule, jobtype='sp', exchange='hf', basis='sto-3g',
+                                    scf_guess={'alpha': np.identity(2), 'beta': np.identity(2)})
+        self.assertEqual(hash(qc_input), hash(qc_input_array))
+
+        guess_2 = {'alpha': [[0.0, 1.0], [1.0, 0.0]], 'beta': np.identity(2).tolist()}
+        qc_input_2 = QchemInput(self.molecule, jobtype='sp', exchange='hf', basis='sto-3g', scf_guess=guess_2)
+        self.assertNotEqual(hash(qc_input), hash(qc_input_2))
+
+        # the input keeps its own copy of the guess and basis (the stored hash is always valid)
+        input_hash = hash(qc_input)
+        guess['alpha'][0][0] = 0.5
+        self.assertEqual(hash(qc_input), input_hash)
+        with self.assertRaises(ValueError):
+            qc_input.mo_coefficients['alpha'][0][0] = 0.5
+        qc_input.mo_coefficients['alpha'] = guess['alpha']
+        self.assertEqual(hash(qc_input), input_hash)
+        self.assertEqual(hash(qc_input.get_copy()), input_hash)
+
+        qc_input.update_input({'mo_coefficients': guess})
+        self.assertNotEqual(hash(qc_input), input_hash)
+
+        basis = {'name': 'custom', 'primitive_type': 'gaussian', 'atoms': []}
+        qc_input = QchemInput(self.molecule, jobtype='sp', exchange='hf', basis=basis)
+        input_hash = hash(qc_input)
+        basis['name'] = 'custom_2'
+        self.assertEqual(hash(qc_input), input_hash)
+        self.assertNotEqual(hash(QchemInput(self.molecule, jobtype='sp', exchange='hf', basis=basis)), input_hash)
+
+        # the coordinates of the structure can only change through set_coordinates
+        with self.assertRaises(ValueError):
+            self.molecule._coordinates[0, 0] = 1.0
+        copy_molecule = deepcopy(self.molecule)
+        with self.assertRaises(ValueError):
+            copy_molecule._coordinates[0, 0] = 1.0
@@ -0,0 +1,88 @@
+from pyqchem import Structure, QchemInput
+from pyqchem.qchem_async import aget_output_from_qchem
+import fake_qchem
+import asyncio
+import tempfile
+import shutil
+import unittest
+import time
+import os
+
+
+class AsyncRunTest(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        fake_qchem.use_temporary_calculation_data(self)
+        fake_qchem.install(os.path.join(self.work_dir, 'qchem'))
+        self.log_file = os.path.join(self.work_dir, 'runs.log')
+
+        self._environment = {key: os.environ.get(key, None) for key in ['QC', 'FAKE_QCHEM_LOG', 'FAKE_QCHEM_DELAY']}
+        os.environ['QC'] = os.path.join(self.work_dir, 'qchem')
+        os.environ['FAKE_QCHEM_LOG'] = self.log_file
+
+        self.scratch = os.path.join(self.work_dir, 'scratch')
+        os.mkdir(self.scratch)
+
+        self.molecule = Structure(coordinates=[[0.0, 0.0, 0.0],
+                                               [0.0, 0.0, 0.71]],
+                                  symbols=['H', 'H'])
+        self.inputs = [QchemInput(self.molecule, jobtype='sp', exchange='hf', basis=basis)
+                       for basis in ['6-31g', 'cc-pvdz', 'def2-svp', 'def2-tzvp']]
+
+    def tearDown(self):
+        for key, value in self._environment.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+        shutil.rmtree(self.work_dir)
+
+    def _read_log(self):
+        if not os.path.isfile(self.log_file):
+            return []
+        with open(self.log_file) as f:
+            return [line.split() for line in f.readlines()]
+
+    def test_concurrent_calculations(self):
+        os.environ['FAKE_QCHEM_DELAY'] = '0.3'
+
+        async def run_all():
+            semaphore = asyncio.Semaphore(2)
+            return await asyncio.gather(*[aget_output_from_qchem(input_qchem, scratch=self.scratch,
+                                                                 parser=fake_qchem.energy_parser,
+                                                                 force_recalculation=True,
+                                                                 semaphore=semaphore)
+                                          for input_qchem in self.inputs])
+
+        outputs = asyncio.run(run_all())
+        self.assertListEqual(outputs, [{'scf_energy': -5.0}, {'scf_energy': -7.0},
+                                       {'scf_energy': -8.0}, {'scf_energy': -9.0}])
+
+        # maximum number of Q-Chem processes running at the same time
+        running = []
+        for event, _ in self._read_log():
+            running.append((running[-1] if running else 0) + (1 if event == 'start' else -1))
+        self.assertEqual(max(running), 2)
+        self.assertListEqual(os.listdir(self.scratch), [])
+
+    def test_cancel(self):
+        qc_input = QchemInput(self.molecule, jobtype='sp', exchange='hf', basis='6-311g')
+
+        async def run_and_cancel():
+            task = asyncio.ensure_future(aget_output_from_qchem(qc_input, scratch=self.scratch,
+                                                                force_recalculation=True))
+            while not any([event == 'sleep' for event, _ in self._read_log()]):
+                await asyncio.sleep(0.05)
+            task.cancel()
+            await task
+
+        start = time.time()
+        with self.assertRaises(asyncio.CancelledError):
+            asyncio.run(run_and_cancel())
+        self.assertLess(time.time() - start, 30)
+
+        # all the processes of the calculation are killed and the work directory is removed
+        for event, pid in self._read_log():
+            self.assertFalse(fake_qchem.is_running(int(pid)))
+        self.assertListEqual(os.listdir(self.scratch), [])
@@ -0,0 +1,171 @@
+from pyqchem import Structure, QchemInput
+from pyqchem.qchem_core import get_output_from_qchem, run_batch, store_calculation_data, retrieve_calculation_data
+from pyqchem.qchem_core import local_run
+from pyqchem.utils import reorder_coefficients
+import numpy as np
+import fake_qchem
+import tempfile
+import warnings
+import time
+import shutil
+from unittest import mock
+import unittest
+import os
+
+
+class LocalRunTest(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        fake_qchem.use_temporary_calculation_data(self)
+        fake_qchem.install(os.path.join(self.work_dir, 'qchem'))
+        self.log_file = os.path.join(self.work_dir, 'runs.log')
+
+        self._environment = {key: os.environ.get(key, None) for key in ['QC', 'FAKE_QCHEM_LOG', 'FAKE_QCHEM_DELAY']}
+        os.environ['QC'] = os.path.join(self.work_dir, 'qchem')
+        os.environ['FAKE_QCHEM_LOG'] = self.log_file
+
+        self.scratch = os.path.join(self.work_dir, 'scratch')
+        os.mkdir(self.scratch)
+
+        self.molecule = Structure(coordinates=[[0.0, 0.0, 0.0],
+                                               [0.0, 0.0, 0.72]],
+                                  symbols=['H', 'H'])
+
+    def tearDown(self):
+        for key, value in self._environment.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+        shutil.rmtree(self.work_dir)
+
+    def _read_log(self):
+        if not os.path.isfile(self.log_file):
+            return []
+        with open(self.log_file) as f:
+            return [line.split() for line in f.readlines()]
+
+    def test_read_fchk_as_arrays(self):
+        qc_input = QchemInput(self.molecule, jobtype='sp', exchange='hf', basis='6-31g')
+        coefficients = fake_qchem.electronic_structure['coefficients']['alpha']
+
+        output, electronic_structure = get_output_from_qchem(qc_input, scratch=self.scratch, read_fchk=True,
+                                                             parser=fake_qchem.energy_parser,
+                                                             force_recalculation=True)
+        self.assertIsInstance(electronic_structure['coefficients']['alpha'], list)
+
+        # the stored data is converted to the requested format (without running the calculation again)
+        n_runs = len(self._read_log())
+        for _ in range(2):
+            output, electronic_structure = get_output_from_qchem(qc_input, scratch=self.scratch, read_fchk=True,
+                                                                 parser=fake_qchem.energy_parser, as_arrays=True)
+            self.assertDictEqual(output, {'scf_energy': -5.0})
+            self.assertIsInstance(electronic_structure['coefficients']['alpha'], np.ndarray)
+            self.assertIsInstance(electronic_structure['mo_energies']['alpha'], np.ndarray)
+            np.testing.assert_allclose(electronic_structure['coefficients']['alpha'], coefficients)
+
+        output, electronic_structure = get_output_from_qchem(qc_input, scratch=self.scratch, read_fchk=True,
+                                                             parser=fake_qchem.energy_parser)
+        self.assertIsInstance(electronic_structure['coefficients']['alpha'], list)
+        self.assertEqual(len(self._read_log()), n_runs)
+
+        # data parsed as arrays is also returned as lists
+        get_output_from_qchem(qc_input, scratch=self.scratch, read_fchk=True, parser=fake_qchem.energy_parser,
+                              as_arrays=True, force_recalculation=True)
+        output, electronic_structure = get_output_from_qchem(qc_input, scratch=self.scratch, read_fchk=True,
+                                                             parser=fake_qchem.energy_parser)
+        self.assertListEqual(electronic_structure['coefficients']['alpha'], coefficients)
+
+        fchk_file = os.path.join(self.work_dir, 'h2.fchk')
+        _, electronic_structure = get_output_from_qchem(qc_input, scratch=self.scratch, read_fchk=True,
+                                                        fchk_file=fchk_file, as_arrays=True,
+                                                        force_recalculation=True)
+        with electronic_structure:
+            self.assertIsInstance(electronic_structure['coefficients']['alpha'], np.ndarray)
+
+        # the coefficients of the caller are not modified
+        coefficients = {'alpha': np.array(fake_qchem.electronic_structure['coefficients']['alpha'])}
+        reordered = reorder_coefficients({'alpha': [0, 1], 'beta': [1, 0]}, coefficients)
+        self.assertListEqual(list(coefficients.keys()), ['alpha'])
+        np.testing.assert_array_equal(reordered['alpha'], coefficients['alpha'][::-1])
+
+    def _write_input(self, basis):
+        qc_input = QchemInput(self.molecule, jobtype='sp', exchange='hf', basis=basis)
+        with open(os.path.join(self.scratch, 'qchem.inp'), 'w') as f:
+            f.write(qc_input.get_txt())
+        return 'qchem.inp'
+
+    def test_local_run_stream(self):
+        fchk_file = os.path.join(self.scratch, 'qchem.fchk')
+        scf_sections = []
+        output, err = local_run(self._write_input('6-31g'), self.scratch, fchk_file, stream_output=True,
+                                stream_callbacks={'scf': scf_sections.append})
+        self.assertEqual(fake_qchem.energy_parser(output), {'scf_energy': -5.0})
+        self.assertIn('Thank you very much', output)
+        self.assertEqual(len(scf_sections), 1)
+        self.assertIn('-5.0', scf_sections[0])
+
+        # the complete output is written in the work directory
+        with open(os.path.join(self.scratch, 'qchem.out')) as f:
+            self.assertEqual(f.read(), output)
+
+        # the calculation is aborted when SCF does not converge
+        start = time.time()
+        output, err = local_run(self._write_input('3-21g'), self.scratch, fchk_file, stream_output=True)
+        self.assertLess(time.time() - start, 1.5)
+        self.assertIn('SCF failed to converge', output)
+        self.assertNotIn('Thank you very much', output)
+
+        # unless it is requested to continue
+        output, err = local_run(self._write_input('3-21g'), self.scratch, fchk_file, stream_output=True,
+                                abort_on_scf_failure=False)
+        self.assertIn('SCF failed to converge', output)
+        self.assertIn('Thank you very much', output)
+
+    def test_run_batch(self):
+        os.environ['FAKE_QCHEM_DELAY'] = '0.3'
+        inputs = [QchemInput(self.molecule, jobtype='sp', exchange='hf', basis=basis)
+                  for basis in ['6-31g', 'cc-pvdz', 'def2-svp', 'def2-tzvp']]
+        energies = [{'scf_energy': -5.0}, {'scf_energy': -7.0}, {'scf_energy': -8.0}, {'scf_energy': -9.0}]
+
+        # the cores are shared by the calculations running at the same time
+        with mock.patch('multiprocessing.cpu_count', return_value=8):
+            outputs = run_batch(inputs, max_workers=2, scratch=self.scratch, force_recalculation=True)
+        for output in outputs:
+            self.assertIn('Number of threads: 4', output)
+
+        with mock.patch('multiprocessing.cpu_count', return_value=8):
+            outputs = run_batch(inputs[:2], processors_per_job=8, scratch=self.scratch, force_recalculation=True)
+        for output in outputs:
+            self.assertIn('Number of threads: 8', output)
+
+        # maximum number of Q-Chem processes running at the same time
+        running = []
+        for event, _ in self._read_log():
+            running.append((running[-1] if running else 0) + (1 if event == 'start' else -1))
+        self.assertEqual(max(running[:8]), 2)
+        self.assertEqual(max(running[8:]), 1)
+
+        # outputs in the same order as the inputs
+        outputs = run_batch(inputs[:3], max_workers=3, scratch=self.scratch, parser=fake_qchem.energy_parser,
+                            force_recalculation=True)
+        self.assertListEqual(outputs, energies[:3])
+        n_runs = len(self._read_log())
+
+        # the stored calculations are not submitted
+        outputs = dict(run_batch(inputs, max_workers=2, scratch=self.scratch, parser=fake_qchem.energy_parser,
+                                 ordered=False))
+        self.assertDictEqual(outputs, dict(enumerate(energies)))
+        self.assertEqual(len(self._read_log()), n_runs + 2)
+        self.assertListEqual(os.listdir(self.scratch), [])
+
+    def test_store_protocol(self):
+        qc_input = QchemInput(self.molecule, jobtype='sp', exchange='hf', basis='cc-pvtz')
+
+        # protocol is accepted (and ignored) for compatibility
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            store_calculation_data(qc_input, 'energy_parser', {'scf_energy': -8.0}, protocol=2)
+        self.assertTrue(issubclass(caught[0].category, DeprecationWarning))
+        self.assertDictEqual(retrieve_calculation_data(qc_input, 'energy_parser'), {'scf_energy': -8.0})
@@ -1,17 +1,30 @@
 from pyqchem.qchem_core import get_output_from_qchem, create_qchem_input, redefine_calculation_data_filename
 from pyqchem.parsers.parser_rasci_basic import basic_rasci
 from pyqchem.parsers.parser_optimization import basic_optimization
+from pyqchem.parsers.parser_rasci import parser_rasci
+from pyqchem.parsers.support import select_fields, ConfigurationTable
+from pyqchem.errors import ParserError
 from pyqchem.structure import Structure
 from pyqchem.test import standardize_dictionary
 import yaml
+import tempfile
+import shutil
 import unittest
 import os, sys
 
 
-if sys.version_info[0] == 2:
-    redefine_calculation_data_filename('test_data_py2.pkl')
-else:
-    redefine_calculation_data_filename('test_data_py3.pkl')
+def setUpModule():
+    # the stored calculations are imported in a temporary directory (the test data files are not modified)
+    global calculation_data_directory
+    calculation_data_directory = tempfile.mkdtemp()
+    test_data_file = 'test_data_py2.pkl' if sys.version_info[0] == 2 else 'test_data_py3.pkl'
+    redefine_calculation_data_filename(os.path.join(os.path.dirname(os.path.abspath(__file__)), test_data_file),
+                                       directory=calculation_data_directory)
+
+
+def tearDownModule():
+    redefine_calculation_data_filename('calculation_data.pkl')
+    shutil.rmtree(calculation_data_directory)
 
 if 'USER' in os.environ and os.environ['USER'] == 'travis':
     recalculate = False
@@ -116,6 +129,68 @@ class HydrogenTest(unittest.TestCase):
 
         self.assertDictEqual(data, data_loaded)
 
+    def test_rasci_fields(self):
+        # create qchem input
+        txt_input = create_qchem_input(self.molecule,
+                                       jobtype='sp',
+                                       exchange='hf',
+                                       correlation='rasci',
+                                       basis='sto-3g',
+                                       ras_act=2,
+                                       ras_elec=2,
+                                       ras_spin_mult=0,
+                                       ras_roots=2,
+                                       ras_print=5,
+                                       ras_do_hole=True,
+                                       ras_sts_tm=True)
+
+        output = get_output_from_qchem(txt_input,
+                                       processors=4,
+                                       force_recalculation=recalculate,
+                                       store_full_output=True)
+
+        fields = ['scf_energy', 'excited_states.total_energy', 'excited_states.transition_moment']
+        data = parser_rasci(output, fields=fields)
+
+        self.assertListEqual(sorted(data.keys()), ['excited_states', 'scf_energy'])
+        self.assertListEqual(sorted(data['excited_states'][1].keys()), ['total_energy', 'transition_moment'])
+        self.assertDictEqual(data, select_fields(parser_rasci(output), fields))
+
+        self.assertRaises(ParserError, parser_rasci, output, fields=['energies'])
+
+    def test_rasci_configurations(self):
+        # create qchem input
+        txt_input = create_qchem_input(self.molecule,
+                                       jobtype='sp',
+                                       exchange='hf',
+                                       correlation='rasci',
+                                       basis='sto-3g',
+                                       ras_act=2,
+                                       ras_elec=2,
+                                       ras_spin_mult=0,
+                                       ras_roots=2,
+                                       ras_print=5,
+                                       ras_do_hole=True,
+                                       ras_sts_tm=True)
+
+        output = get_output_from_qchem(txt_input,
+                                       processors=4,
+                                       force_recalculation=recalculate,
+                                       store_full_output=True)
+
+        data = parser_rasci(output)
+        data_table = parser_rasci(output, configuration_table=True)
+        for state, state_table in zip(data['excited_states'], data_table['excited_states']):
+            self.assertIsInstance(state['configurations'], list)
+            self.assertIsInstance(state_table['configurations'], ConfigurationTable)
+            self.assertEqual(state_table['configurations'], state['configurations'])
+
+        # the configurations can be modified and serialized as before
+        data = standardize_dictionary(data)
+        amplitudes = [configuration['amplitude'] for configuration in data['excited_states'][0]['configurations']]
+        self.assertListEqual(amplitudes, [35540, 93471])
+        self.assertListEqual(yaml.safe_load(yaml.safe_dump(data['excited_states'])), data['excited_states'])
+
 
 class WaterTest(unittest.TestCase):
 
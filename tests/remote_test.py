@@ -0,0 +1,121 @@
+from pyqchem import Structure, QchemInput
+from pyqchem.qchem_core import get_output_from_qchem, run_batch, remote_run
+from pyqchem.remote import SSHConnectionPool
+from fake_qchem import use_temporary_calculation_data
+import tempfile
+import shutil
+import unittest
+import os
+
+try:
+    from ssh_server import SSHServer
+    import paramiko
+    paramiko_available = True
+except ImportError:
+    paramiko_available = False
+
+
+# stand-in of the qchem script in the remote machine
+fake_qchem = """#!/bin/sh
+cat $3
+echo "files: `ls`"
+echo "fchk of $3" > $3.fchk
+echo " Total energy in the final basis set =     -1.1 "
+echo "        *  Thank you very much for using Q-Chem.  Have a nice day.  *"
+"""
+
+
+@unittest.skipIf(not paramiko_available, 'paramiko is not installed')
+class RemoteRunTest(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        use_temporary_calculation_data(self)
+        self.server = SSHServer()
+
+        bin_dir = os.path.join(self.work_dir, 'bin')
+        os.mkdir(bin_dir)
+        with open(os.path.join(bin_dir, 'qchem'), 'w') as f:
+            f.write(fake_qchem)
+        os.chmod(os.path.join(bin_dir, 'qchem'), 0o755)
+
+        self.remote = dict(self.server.remote_params,
+                           precommand=['export PATH={}:\\$PATH'.format(bin_dir)],
+                           remote_scratch=self.work_dir)
+
+        molecule = Structure(coordinates=[[0.0, 0.0, 0.0],
+                                          [0.0, 0.0, 0.74]],
+                             symbols=['H', 'H'])
+        self.inputs = [QchemInput(molecule, jobtype='sp', exchange='hf', basis=basis)
+                       for basis in ['sto-3g', '6-31g', 'cc-pvdz']]
+
+    def tearDown(self):
+        self.server.close()
+        shutil.rmtree(self.work_dir)
+
+    def test_connection_pool(self):
+        for qc_input in self.inputs:
+            output = get_output_from_qchem(qc_input, scratch=self.work_dir, remote=self.remote,
+                                           force_recalculation=True)
+            self.assertIn(qc_input.get_txt(), output)
+
+        # one connection for all the calculations
+        self.assertEqual(self.server.n_connections, 1)
+        self.assertIn('precommand', self.remote)
+
+        # connection closed by the server
+        self.server.drop_connections()
+        output = get_output_from_qchem(self.inputs[0], scratch=self.work_dir, remote=self.remote,
+                                       force_recalculation=True)
+        self.assertIn(self.inputs[0].get_txt(), output)
+        self.assertEqual(self.server.n_connections, 2)
+
+    def test_connection_credentials(self):
+        pool = SSHConnectionPool()
+        try:
+            pool.get_client(self.server.remote_params)
+
+            # the connection opened with other credentials is not used
+            wrong_password = dict(self.server.remote_params, password='wrong')
+            self.assertRaises(paramiko.AuthenticationException, pool.get_client, wrong_password)
+
+            pool.get_client(dict(self.server.remote_params))
+            self.assertEqual(pool.n_connections, 1)
+        finally:
+            pool.close()
+
+    def test_concurrent_jobs(self):
+        server_2 = SSHServer()
+        remote_2 = dict(self.remote, **server_2.remote_params)
+
+        input_list = self.inputs[:2] * 2
+        outputs = run_batch(input_list, max_workers=4, remote=[self.remote, remote_2],
+                            scratch=self.work_dir, force_recalculation=True)
+
+        for qc_input, output in zip(input_list, outputs):
+            self.assertIn(qc_input.get_txt(), output)
+            # each calculation runs in its own remote directory with only the input file
+            files = output[output.find('files:'):].split('\n')[0].split()[1:]
+            self.assertEqual(len(files), 1)
+            self.assertTrue(files[0].endswith('.inp'))
+
+        # calculations are distributed in both hosts and the remote directories are removed
+        self.assertEqual(len([c for c in self.server.commands if c.startswith('bash')]), 2)
+        self.assertEqual(len([c for c in server_2.commands if c.startswith('bash')]), 2)
+        self.assertListEqual([f for f in os.listdir(self.work_dir) if f.startswith('temp_pyqchem_remote')], [])
+
+        server_2.close()
+
+    def test_compressed_fchk(self):
+        work_dir = os.path.join(self.work_dir, 'qchem_compress')
+        os.mkdir(work_dir)
+        with open(os.path.join(work_dir, 'job.inp'), 'w') as f:
+            f.write(self.inputs[0].get_txt())
+
+        for compression in ['gzip', 'xz']:
+            remote_run('job.inp', work_dir, 'job.fchk', dict(self.remote, compress=compression))
+
+            with open(os.path.join(work_dir, 'job.fchk')) as f:
+                self.assertEqual(f.read(), 'fchk of job.inp\n')
+            self.assertIn('{} -f -1 job.inp.fchk'.format(compression), self.server.commands[-2])
+            self.assertListEqual(sorted(os.listdir(work_dir)), ['job.fchk', 'job.inp'])
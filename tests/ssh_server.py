@@ -0,0 +1,181 @@
+# Local stand-in of a SSH/SFTP server to test the remote calculations without a remote machine.
+# Commands are executed in the local machine and SFTP sessions access the local file system.
+import paramiko
+import subprocess
+import threading
+import socket
+import os
+
+
+class _SFTPHandle(paramiko.SFTPHandle):
+
+    def stat(self):
+        try:
+            return paramiko.SFTPAttributes.from_stat(os.fstat(self.readfile.fileno()))
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+
+    def chattr(self, attr):
+        return paramiko.SFTP_OK
+
+
+class _SFTPServerInterface(paramiko.SFTPServerInterface):
+
+    def list_folder(self, path):
+        try:
+            return [paramiko.SFTPAttributes.from_stat(os.stat(os.path.join(path, filename)), filename)
+                    for filename in os.listdir(path)]
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+
+    def stat(self, path):
+        try:
+            return paramiko.SFTPAttributes.from_stat(os.stat(path))
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+
+    def lstat(self, path):
+        try:
+            return paramiko.SFTPAttributes.from_stat(os.lstat(path))
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+
+    def open(self, path, flags, attr):
+        try:
+            fd = os.open(path, flags, 0o644)
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+
+        if flags & os.O_WRONLY:
+            mode = 'ab' if flags & os.O_APPEND else 'wb'
+        elif flags & os.O_RDWR:
+            mode = 'a+b' if flags & os.O_APPEND else 'r+b'
+        else:
+            mode = 'rb'
+
+        handle = _SFTPHandle(flags)
+        handle.filename = path
+        handle.readfile = handle.writefile = os.fdopen(fd, mode)
+        return handle
+
+    def _call(self, function, *args):
+        try:
+            function(*args)
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+        return paramiko.SFTP_OK
+
+    def remove(self, path):
+        return self._call(os.remove, path)
+
+    def rename(self, old_path, new_path):
+        return self._call(os.rename, old_path, new_path)
+
+    def mkdir(self, path, attr):
+        return self._call(os.mkdir, path)
+
+    def rmdir(self, path):
+        return self._call(os.rmdir, path)
+
+    def chattr(self, path, attr):
+        return paramiko.SFTP_OK
+
+
+class _ServerInterface(paramiko.ServerInterface):
+
+    def __init__(self, server):
+        self._server = server
+
+    def get_allowed_auths(self, username):
+        return 'password'
+
+    def check_auth_password(self, username, password):
+        if (username, password) == (self._server.username, self._server.password):
+            return paramiko.AUTH_SUCCESSFUL
+        return paramiko.AUTH_FAILED
+
+    def check_channel_request(self, kind, chanid):
+        if kind == 'session':
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def check_channel_pty_request(self, channel, term, width, height, pixelwidth, pixelheight, modes):
+        return True
+
+    def check_channel_exec_request(self, channel, command):
+        thread = threading.Thread(target=self._server.execute, args=(channel, command.decode()))
+        thread.daemon = True
+        thread.start()
+        return True
+
+
+class SSHServer:
+    """
+    SSH/SFTP server listening in localhost (random port) that accepts the password authentication
+    of one user. Use remote_params to connect.
+    """
+
+    def __init__(self, username='pyqchem', password='pyqchem'):
+        self.username = username
+        self.password = password
+        self.n_connections = 0
+        self.commands = []
+
+        self._host_key = paramiko.RSAKey.generate(1024)
+        self._transports = []
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._socket.bind(('127.0.0.1', 0))
+        self._socket.listen(10)
+        self.port = self._socket.getsockname()[1]
+
+        thread = threading.Thread(target=self._accept)
+        thread.daemon = True
+        thread.start()
+
+    @property
+    def remote_params(self):
+        return {'hostname': '127.0.0.1',
+                'port': self.port,
+                'username': self.username,
+                'password': self.password,
+                'look_for_keys': False,
+                'allow_agent': False}
+
+    def _accept(self):
+        while True:
+            try:
+                client, _ = self._socket.accept()
+            except (OSError, socket.error):
+                return
+
+            transport = paramiko.Transport(client)
+            transport.add_server_key(self._host_key)
+            transport.set_subsystem_handler('sftp', paramiko.SFTPServer, _SFTPServerInterface)
+            transport.start_server(server=_ServerInterface(self))
+            self._transports.append(transport)
+            self.n_connections += 1
+
+    def execute(self, channel, command):
+        self.commands.append(command)
+        process = subprocess.Popen(command, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        output, error = process.communicate()
+        channel.sendall(output)
+        channel.sendall_stderr(error)
+        channel.send_exit_status(process.returncode)
+        channel.close()
+
+    def drop_connections(self):
+        """
+        close the connections from the server side (as a network error or a server restart)
+        """
+        for transport in self._transports:
+            transport.close()
+        self._transports = []
+
+    def close(self):
+        try:
+            self._socket.shutdown(socket.SHUT_RDWR)
+        except (OSError, socket.error):
+            pass
+        self._socket.close()
+        self.drop_connections()